@@ -3,6 +3,7 @@ from PyQt5.QtCore import Qt, QSize
 from PyQt5.QtWidgets import QSlider, QLabel, QMainWindow, QWidget, \
     QPushButton, QGridLayout, QMessageBox, QSizePolicy, QFileDialog
 from PyQt5.QtGui import QIcon
+from presets import load_preset, save_preset
 from button_styles import BUTTON_BORDER_COLOR, BUTTON_BORDER_COLOR_2, button_style_sheet
 
 
@@ -11,26 +12,21 @@ class LogoWidget(QMainWindow):
     # class if another one is already in existence
     instance_count = 0
 
-    def __init__(self, original_img, main_window):
+    def __init__(self, main_window):
         super().__init__()
         # Update class variable upon initialization
         LogoWidget.instance_count += 1
-        # Connect the signal that comes from main_window whenever a new image is open
-        main_window.image_changed.signal.connect(self.update_original_image)
         # Create lists of buttons, sliders, and clicks for easier management
         self.button_tiles = []
         self.clicks = []
         self.sliders = []
-        # Set the path for the original_img
-        self.original_img = original_img
-        # Make a 'copy' of the path. Since the original_image will change we need this copy when we reset
-        self.clear_pic = original_img
-        # Set logo_img to None
+        # Set logo_img and the path of the logo to None
         self.logo_img = None
-        # Set watermarked_img to None
-        self.watermarked_img = None
+        self.logo_path = None
         # Set the main_window. We need this in order to update and display our image in main_window QLabel preview
         self.main_window = main_window
+        # The logo is drawn as a layer of the main_window layer stack, it is added once the logo image is opened
+        self.layer_id = None
         # Set the self.warning_displayed to False. this is needed since the pyqt5 loops over and over and would show
         # QMessageBox multiple times if we don't restrict it like this
         self.warning_displayed = False
@@ -38,12 +34,11 @@ class LogoWidget(QMainWindow):
         # Initialize method for creating GUI
         self.initUI()
 
-    def update_original_image(self, file_path):
-        self.original_img = file_path
-
     def closeEvent(self, event):
-        """Here I override closeEvent in order to update instance_count when the close event happens"""
+        """Here I override closeEvent in order to update instance_count when the close event happens. The logo is
+        removed from the image together with the widget"""
         LogoWidget.instance_count = 0
+        self.remove_logo_layer()
 
     def initUI(self):
         """Method responsible for creating program's GUI"""
@@ -111,6 +106,11 @@ class LogoWidget(QMainWindow):
         self.save_image_btn = QPushButton("Save Image")
         self.save_image_btn.setEnabled(False)
 
+        # Preset buttons. The preset can only be saved once the logo is opened
+        self.save_preset_btn = QPushButton("Save Preset")
+        self.save_preset_btn.setEnabled(False)
+        self.load_preset_btn = QPushButton("Load Preset")
+
         # Create spacers
         self.spacer_widget_1 = QWidget()
         self.spacer_widget_1.setSizePolicy(QSizePolicy.Minimum, QSizePolicy.Expanding)
@@ -203,8 +203,10 @@ class LogoWidget(QMainWindow):
         self.top_buttons_layout.addWidget(self.add_logo_image, 1, 1, 1, 5)
 
         # Add preview, save and reset button to buttons layout
-        self.buttons_layout.addWidget(self.reset_btn, 1, 1, 1, 5)
-        self.buttons_layout.addWidget(self.save_image_btn, 2, 1, 1, 5)
+        self.buttons_layout.addWidget(self.save_preset_btn, 1, 1, 1, 2)
+        self.buttons_layout.addWidget(self.load_preset_btn, 1, 3, 1, 3)
+        self.buttons_layout.addWidget(self.reset_btn, 2, 1, 1, 5)
+        self.buttons_layout.addWidget(self.save_image_btn, 3, 1, 1, 5)
 
         self.buttons_layout.setVerticalSpacing(10)
 
@@ -264,6 +266,10 @@ class LogoWidget(QMainWindow):
         # Connecting Save button
         self.save_image_btn.clicked.connect(self.save_image)
 
+        # Connecting preset buttons
+        self.save_preset_btn.clicked.connect(self.save_logo_preset)
+        self.load_preset_btn.clicked.connect(self.load_logo_preset)
+
     # # # ------------------------------------------- FUNCTIONALITIES -------------------------------------------------# # #
     def numb_tiles(self, tile_button):
         """This method updates the clicks list based on the argument tile_button it receives"""
@@ -328,104 +334,79 @@ class LogoWidget(QMainWindow):
         file_dialog = QFileDialog()
         self.file_path, _ = file_dialog.getOpenFileName(self, "Open Image", "", "Image Files (*.jpg *.jpeg *.png)")
         if self.file_path:
-            self.logo_img = Image.open(self.file_path).convert("RGBA")
+            self.set_logo(self.file_path)
             self.tile_one.click()
-            for slider in self.sliders:
-                slider.setEnabled(True)
-                slider.setStyleSheet("QSlider::handle:horizontal { background: 1F6E8C; }")
-            self.save_image_btn.setEnabled(True)
-
-    def space_between_logos(self, coef_x, coef_y, lg_img):
-        """Calculates space between logos on horizontal and vertical axis and returns those values """
-        if coef_x == 0:
-            space_x = lg_img.width
-        else:
-            space_x = lg_img.width + round(lg_img.width * coef_x / 10)
 
-        if coef_y == 0:
-            space_y = lg_img.height
-        else:
-            space_y = lg_img.height + round(lg_img.height * coef_y / 10)
-
-        return space_x, space_y
-
-    def number_of_repetitions(self, org_img, lg_image, spacing_x, spacing_y):
-        """Calculates number of time logo will be drawn on horizontal and vertical axis"""
-        if spacing_x != 0:
-            number_horizontal_rep = round(org_img.width / spacing_x)
-        else:
-            number_horizontal_rep = round(org_img.width / lg_image.width)
+    def set_logo(self, logo_path):
+        """Opens the logo image from logo_path. Enables sliders, save and save preset buttons and sets their style"""
+        self.logo_img = Image.open(logo_path).convert("RGBA")
+        self.logo_path = logo_path
+        for slider in self.sliders:
+            slider.setEnabled(True)
+            slider.setStyleSheet("QSlider::handle:horizontal { background: 1F6E8C; }")
+        self.save_image_btn.setEnabled(True)
+        self.save_preset_btn.setEnabled(True)
+
+    def logo_preset(self):
+        """Returns the 'logo' section of the preset (see presets module) with the current values of the sliders"""
+        return {
+            "path": self.logo_path,
+            "size": self.size.value(),
+            "opacity": self.opacity.value(),
+            "rotation": self.rotation.value(),
+            "spacing_x": self.spacing_x.value(),
+            "spacing_y": self.spacing_y.value(),
+            "tile": self.clicks[0],
+        }
+
+    def save_logo_preset(self):
+        """Displays the save dialog and saves the current values of the sliders and the path of the logo into the preset
+        file. If the preset file already has the text settings they are kept"""
+        file_name, _ = QFileDialog.getSaveFileName(self, "Save Preset", filter="Watermark Presets (*.json)")
 
-        if spacing_y != 0:
-            number_vertical_rep = round(org_img.height / spacing_y)
-        else:
-            number_vertical_rep = round(org_img.height / lg_image.height)
-
-        return number_horizontal_rep, number_vertical_rep
-
-    def logo_patterns(self, logo_img, overlay_img, lg_spacing_x, lg_spacing_y, tile_sig, hr_rep, ver_rep):
-        """Draws logo onto the overlay_img based on the patterns chosen by the user"""
-        # These are x and y-axis starting points of logo for checker and romb patterns
-        starting_point_x = 0
-        starting_point_y = 0
-
-        if tile_sig == 1:
-            overlay_img.paste(logo_img, (round(overlay_img.width / 2) - round(logo_img.width / 2),
-                                         round(overlay_img.height / 2) - round(logo_img.height / 2)), mask=logo_img)
-
-        elif tile_sig == 4:
-            # Initial values of spacing between logo. This will be incremented by a value of lg_spacing
-            spacing_x = 0
-            spacing_y = 0
-            for v_numb in range(ver_rep + 1):
-                for numb in range(hr_rep + 1):
-                    overlay_img.paste(logo_img, (starting_point_x + spacing_x, starting_point_y + spacing_y),
-                                      mask=logo_img)
-                    spacing_x += lg_spacing_x
-                # Increase the y value so that we display the same on the new y column
-                spacing_y += lg_spacing_y
-                # Reset the value of x for new y column
-                spacing_x = 0
-
-        elif tile_sig == 5:
-            # Initial values of spacing between logo. This will be incremented by a value of lg_spacing
-            spacing_x = 0
-            spacing_y = 0
-            # This line sets the starting horizontal displacement. If True it shifts the horizontal position
-            # of the first logo and consequentially of each following logo by determined value
-            displacement = False
-            # This determines the starting horizontal point of the logo when displacement = True
-            displacement_starting_point = starting_point_x + (round(lg_spacing_x / 2))
-
-            for v_numb in range(ver_rep + 1):
-                # We want first line to always be shifted thus displacement = not displacement. By setting it this way
-                # the displacement value will change form after each iteration making one line of text shifted and
-                # other 'normal', thus creating the romb-like pattern
-                displacement = not displacement
-                for numb in range(hr_rep + 1):
-                    if displacement:
-                        overlay_img.paste(logo_img,
-                                          (displacement_starting_point + spacing_x, starting_point_y +
-                                           spacing_y), mask=logo_img)
-                    else:
-                        overlay_img.paste(logo_img,
-                                          (starting_point_x + spacing_x, starting_point_y + spacing_y),
-                                          mask=logo_img)
-                    spacing_x += lg_spacing_x
-                spacing_y += lg_spacing_y
-                spacing_x = 0
+        if file_name:
+            if not file_name.endswith(".json"):
+                file_name += ".json"
+            try:
+                save_preset(file_name, logo=self.logo_preset())
+            except (OSError, ValueError) as error:
+                QMessageBox.warning(self, "Warning", f"Could not save the preset. {error}")
+
+    def load_logo_preset(self):
+        """Displays the open dialog for user to choose the preset file. Opens the logo from its 'logo' section and sets
+        the sliders to the values from it"""
+        file_name, _ = QFileDialog.getOpenFileName(self, "Load Preset", "", "Watermark Presets (*.json)")
+        if not file_name:
+            return
+
+        try:
+            preset = load_preset(file_name)
+            if "logo" not in preset:
+                raise ValueError("This preset has no logo settings.")
+            self.set_logo(preset["logo"]["path"])
+        except (OSError, ValueError) as error:
+            QMessageBox.warning(self, "Warning", f"Could not load the preset. {error}")
+            return
+
+        logo_preset = preset["logo"]
+        self.size.setValue(logo_preset["size"])
+        self.opacity.setValue(logo_preset["opacity"])
+        self.rotation.setValue(logo_preset["rotation"])
+        self.spacing_x.setValue(logo_preset["spacing_x"])
+        self.spacing_y.setValue(logo_preset["spacing_y"])
+        tile_buttons = {1: self.tile_one, 4: self.tile_four, 5: self.tile_four_ver}
+        tile_buttons[logo_preset["tile"]].click()
 
     def reset(self):
-        """Resets all sliders and buttons to default state. Clears the logo_image and updates the image to the clear
-        copy of the original_img"""
-        # Set logo_img to None
+        """Resets all sliders and buttons to default state. Clears the logo_image and removes the logo from the image,
+        the other watermarks stay"""
+        # Set logo_img and the path of the logo to None
         self.logo_img = None
+        self.logo_path = None
 
-        # Take the 'copy' of the original_img
-        img = self.clear_pic
-        # Create 'copied' image and update main_window preview label
-        edited_image = Image.open(img).convert("RGBA")
-        self.main_window.update_image(edited_image)
+        # Remove the logo layer. The image without it goes through the render_scheduler, so the renders which are
+        # still pending can't overwrite it
+        self.remove_logo_layer()
 
         # Set sliders and buttons states to default
         self.opacity.setValue(255)
@@ -439,89 +420,38 @@ class LogoWidget(QMainWindow):
         self.spacing_y.setValue(10)
         self.spacing_y.setEnabled(False)
         self.save_image_btn.setEnabled(False)
+        self.save_preset_btn.setEnabled(False)
 
     def update_image(self):
-        """Updates the image and sends it to main_window to be displayed. If there is no logo_img selected it will
-         show warning"""
+        """Updates the logo layer of main_window, which renders the image with all the watermarks and displays it. If
+        there is no logo_img selected it will show warning"""
         if self.logo_img:
-            edited_image = self.main()
-            self.main_window.update_image(edited_image)
+            # The image is rendered at the size of the preview label, full resolution is rendered only on save. Values
+            # of the sliders are collected here, on the GUI thread, and the image is rendered on the render worker
+            self.layer_id = self.main_window.set_layer(self.layer_id, "logo", self.logo_settings())
         else:
             if not self.warning_displayed:
                 QMessageBox.warning(self, "Warning", "Please open the logo image you want to add.")
                 self.warning_displayed = True
 
-    def save_image(self):
-        """Displays the save dialog for user to save image. If user doesn't provide image format during the save
-        it will assign it .jpg format"""
-        options = QFileDialog.Options()
-        options |= QFileDialog.DontUseNativeDialog
-        file_filter = "JPEG Files (*.jpg);;PNG Files (*.png)"
-        file_name, _ = QFileDialog.getSaveFileName(self, "Save Image", filter=file_filter,
-                                                   options=options)
-
-        if file_name:
-            extension = "jpg"
-            if not file_name.endswith(extension):
-                file_name += "." + extension
-            rgb_img = self.watermarked_img.convert("RGB")
-            rgb_img.save(file_name, "JPEG" if file_name.endswith('.jpg') else "PNG")
-
-    def main(self):
-        """Main method that encompasses most of the other methods. Gets all the values, creates image to be combined
-        with the original_img, combines them using alpha_composite and returns watermarked image"""
-        # Open original img
-        original_img = Image.open(self.original_img).convert("RGBA")
-
-        # Set logo img
-        logo_image = self.logo_img
+    def logo_settings(self):
+        """Collects the values of all the sliders into a dictionary. Rendering only uses this dictionary, so it can run
+        outside the GUI thread"""
+        return {
+            "logo": self.logo_img,
+            "size": self.size.value(),
+            "opacity": self.opacity.value(),
+            "rotation": self.rotation.value(),
+            "spacing_x": self.spacing_x.value(),
+            "spacing_y": self.spacing_y.value(),
+            "tile": self.clicks[0],
+        }
+
+    def remove_logo_layer(self):
+        """Removes the logo layer from the main_window layer stack"""
+        self.main_window.remove_layer(self.layer_id)
+        self.layer_id = None
 
-        # Create new RGBA image with same dimensions as logo_image
-        logo_image_alpha = Image.new("RGBA", logo_image.size)
-
-        # Paste logo_image onto logo_image_alpha
-        logo_image_alpha.paste(logo_image, (0, 0), mask=logo_image)
-
-        # Get opacity value from opacity slider
-        logo_opacity = int(self.opacity.value())
-
-        # Apply opacity to logo_image_alpha
-        logo_image_alpha.putalpha(logo_opacity)
-
-        # Get size value from size slider
-        logo_size = self.size.value() / 10
-
-        # Once we get size value we can change the width and the size of logo_image_alpa
-        new_width = logo_image_alpha.width * logo_size
-        new_height = logo_image_alpha.height * logo_size
-        resized_logo_image = logo_image_alpha.resize((int(new_width), int(new_height)))
-
-        # Get horizontal and vertical spacing coefficient between logos from spacing_x and spacing_y sliders
-        logo_spacing_x = float(self.spacing_x.value() / 10)
-        logo_spacing_y = float(self.spacing_y.value() / 10)
-
-        # Get rotation value from rotation slider
-        logo_rotation = int(self.rotation.value())
-
-        # Rotate the resized_logo_image
-        rotated_logo_img = resized_logo_image.rotate(logo_rotation, expand=True)
-
-        # Create an overlay image with the same dimensions as the original_img and fully opaque
-        overlay_image = Image.new("RGBA", (original_img.width, original_img.height), (255, 255, 255, 0))
-        overlay_image = overlay_image.point(lambda p: p * logo_opacity // 255)
-
-        # This tells us which tile button was clicked
-        tile_signal = self.clicks[0]
-
-        # Get the values of horizontal and vertical spacing between logos
-        gap_x, gap_y = self.space_between_logos(logo_spacing_x, logo_spacing_y, rotated_logo_img)
-
-        # Get the number of horizontal and vertical repetitions of logo
-        horizontal_rep, vertical_rep = self.number_of_repetitions(original_img, rotated_logo_img, gap_x, gap_y)
-
-        # Determine the pattern and display the logo in that pattern on original_img
-        self.logo_patterns(rotated_logo_img, overlay_image, gap_x, gap_y, tile_signal, horizontal_rep, vertical_rep)
-
-        # Create watermarked image using alpha_composite method
-        self.watermarked_img = Image.alpha_composite(original_img, overlay_image)
-        return self.watermarked_img
+    def save_image(self):
+        """Displays the save dialog for user to save image with all the watermarks, see MainWindow.save_image"""
+        self.main_window.save_image(self)
@@ -1,10 +1,12 @@
-from PIL import Image, ImageFont, ImageDraw
 from PyQt5.QtCore import Qt, QSize
 from PyQt5.QtWidgets import QSlider, QLineEdit, QLabel, QComboBox, QMainWindow, QVBoxLayout, QWidget, \
-    QPushButton, QGridLayout, QFileDialog
+    QPushButton, QGridLayout, QFileDialog, QMessageBox
 from PyQt5.QtGui import QIcon
-from color_palette import colors
-from font_families import available_fonts, fonts_dictionary
+from color_palette import colors, parse_color, color_to_hex
+from font_catalog import font_catalog
+from font_pool import font_pool, WARM_UP_SIZE_VALUES
+from presets import load_preset, save_preset, DEFAULT_TEXT_PRESET
+from watermark_renderer import DEFAULT_TEXT_SIZE
 from button_styles import BUTTON_BORDER_COLOR, BUTTON_BORDER_COLOR_2, button_style_sheet
 
 
@@ -13,18 +15,16 @@ class TextWidget(QMainWindow):
     # instance of the TextWidget class if one already exists
     instance_count = 0
 
-    def __init__(self, original_img, main_window):
+    # If True the default font is loaded in the most common sizes as soon as the widget opens, so the first renders
+    # don't have to wait for the font file to be parsed
+    warm_up_fonts = True
+
+    def __init__(self, main_window):
         super().__init__()
 
         # Here we change the instance_count variable as soon as the class is instantiated
         TextWidget.instance_count += 1
 
-        # Connect the signal that comes from main_window whenever a new image is open
-        main_window.image_changed.signal.connect(self.update_original_image)
-
-        # Creating variable for image
-        self.img = original_img
-
         # Creating the lists of tiles and buttons and clicks so that it's easier to work with them
         self.button_tiles = []
         self.clicks = []
@@ -32,12 +32,12 @@ class TextWidget(QMainWindow):
         # Creating variable for main window
         self.main_window = main_window
 
+        # The text is drawn as a layer of the main_window layer stack, it is added with the first update of the image
+        self.layer_id = None
+
         # Instantiating our method for creating GUI
         self.initUI()
 
-        # Creating watermarked_image variable and setting it to None
-        self.watermarked_image = None
-
 # ------------------------------------------ SETTING UP GUI -----------------------------------------------------------
 
     # This is the method in which we will create GUI, widgets, labels, etc
@@ -111,16 +111,26 @@ class TextWidget(QMainWindow):
         self.reset_btn = QPushButton("Reset")
         self.save_btn = QPushButton("Save")
 
+        # Preset buttons
+        self.save_preset_btn = QPushButton("Save Preset")
+        self.load_preset_btn = QPushButton("Load Preset")
+
         # SET UP WIDGETS
 
         # Add colors to the color combobox
         for key, value in colors.items():
             self.color.addItem(key)
 
-        # Add fonts to font combobox
-        self.fonts_dic = fonts_dictionary(av_fonts=available_fonts)
-        for key, value in self.fonts_dic.items():
-            self.font.addItem(key)
+        # Add fonts to font combobox. They come from the font catalog index, the font files aren't read here
+        for name in font_catalog.names():
+            self.font.addItem(name)
+        # Start with the same font as the presets without a font
+        self.select_default_font()
+
+        # Load the default font in the background
+        if TextWidget.warm_up_fonts and self.font.count() > 0:
+            font_pool.warm_up_in_background(font_catalog.path(self.font.currentText()),
+                                            [round(DEFAULT_TEXT_SIZE * value / 10) for value in WARM_UP_SIZE_VALUES])
 
         # Add starting text to input_txt
         self.input_txt.setText("Your Text")
@@ -213,6 +223,8 @@ class TextWidget(QMainWindow):
         self.layout.addWidget(self.color)
         self.layout.addLayout(self.sliders_layout) # This is where we add sliders_layout to QVBoxLayout
         self.layout.addLayout(self.tiles_layout) # This is where we add tiles_layout to QVBoxLayout
+        self.layout.addWidget(self.save_preset_btn)
+        self.layout.addWidget(self.load_preset_btn)
         self.layout.addWidget(self.reset_btn)
         self.layout.addWidget(self.save_btn)
 
@@ -257,6 +269,10 @@ class TextWidget(QMainWindow):
         self.reset_btn.clicked.connect(self.reset)
         self.save_btn.clicked.connect(self.save_image)
 
+        # Connect preset buttons with their functionalities
+        self.save_preset_btn.clicked.connect(self.save_text_preset)
+        self.load_preset_btn.clicked.connect(self.load_text_preset)
+
         # This is to set first button tile as clicked when starting program
         self.one_tile.click()
 
@@ -319,129 +335,101 @@ class TextWidget(QMainWindow):
         size_value = self.size.value() / 10
         self.size_value.setText(str(size_value) + "x")
 
-    def filter_coeficient(self, coeficient_x, coeficient_y, txt_mask_width, txt_mask_height):
-        """ This method takes four arguments: coeficient_x (spacing_x slider value), coeficient_y
-        (spacing_y slider value), txt_mask_width and txt_mask_height. It then determines the space between text on x
-        and y-axis and returns those two values"""
-        if coeficient_x == 0:
-            word_gap_x = txt_mask_width
-        else:
-            word_gap_x = txt_mask_width + round(txt_mask_width * coeficient_x / 10)
-        if coeficient_y == 0:
-            word_gap_y = txt_mask_height
-        else:
-            word_gap_y = txt_mask_height + round(txt_mask_height * coeficient_y / 10)
-        return word_gap_x, word_gap_y
-
-    def calculate_numb_text_repetitions(self, word_space_x, word_space_y, canvas_width, canvas_height, mask_width,
-                                        mask_height):
-        """This method takes six arguments: word_space_x (space between text x-axis),
-         word_space_y (space between text y-axis),  canvas_width (width of image), canvas_height (height of image)
-         mask_width (width of text) mask_height (height of text). It then calculates how many times should the text
-         be repeated across the image on x and y-axis and returns those two values"""
-
-        if word_space_x != 0:
-            number_of_horizontal_repetitions = round(canvas_width / word_space_x)
-        else:
-            number_of_horizontal_repetitions = round(canvas_width / mask_width)
-        if word_space_y != 0:
-            number_of_vertical_repetitions = round(canvas_height / word_space_y)
-        else:
-            number_of_vertical_repetitions = round(canvas_height / mask_height)
-
-        return number_of_horizontal_repetitions, number_of_vertical_repetitions
-
-    def text_patterns(self, numb_tiles, canv_overlay, rot_txt_mask, horizontal_rep, vertical_rep, word_gap_x,
-                      word_gap_y):
-        """ This method takes seven arguments: numb-tiles (which tile the user clicked),
-        canv_overlay (overlay image on which we will place our text), rot_txt_mask (rotated text),
-        horizontal_rep (numb of times text should be repeated across x-axis),
-        vertical_rep (numb of times text should be repeated across y-axis), word_gap_x (space between text x-axis),
-        word_gap_y (space between text y-axis)"""
-
-        # These are x and y-axis starting points of text for checker and romb patterns
-        starting_point_x = 0
-        starting_point_y = 0
-
-        # If user wants only one text displayed on image
-        if numb_tiles == 1:
-            # Calculate the center position of the rotated_text_mask on overlay
-            center_x = round((canv_overlay.width / 2)) - round((rot_txt_mask.width / 2))
-            center_y = round((canv_overlay.height / 2)) - round((rot_txt_mask.height / 2))
-            # Paste rotated_text_mask to overlay
-            canv_overlay.paste(rot_txt_mask, (center_x, center_y), mask=rot_txt_mask)
-        # If user wants checker pattern text displayed on image
-        elif numb_tiles == 4:
-            # Initial values of spacing between text. This will be incremented by a value of word_gap
-            spacing_x = 0
-            spacing_y = 0
-            for v_numb in range(vertical_rep + 1):
-                for numb in range(horizontal_rep + 1):
-                    canv_overlay.paste(rot_txt_mask, (starting_point_x + spacing_x, starting_point_y + spacing_y),
-                                       mask=rot_txt_mask)
-                    spacing_x += word_gap_x
-                # Increase the y value so that we display the same on the new y column
-                spacing_y += word_gap_y
-                # Reset the value of x for new y column
-                spacing_x = 0
-        # If user wants romb pattern text displayed on image
-        elif numb_tiles == 5:
-            # Initial values of spacing between text. This will be incremented by a value of word_gap
-            spacing_x = 0
-            spacing_y = 0
-            # This line sets the starting horizontal displacement. If True it shifts the horizontal position
-            # of the first text and consequentially of each following text by determined value
-            displacement = False
-            # This determines the starting horizontal point of the text when displacement = True
-            displacement_starting_point = starting_point_x + (round(word_gap_x / 2))
-
-            for v_numb in range(vertical_rep + 1):
-                # We want first line to always be shifted thus displacement = not displacement. By setting it this way
-                # the displacement value will change form after each iteration making one line of text shifted and
-                # other 'normal', thus creating the romb-like pattern
-                displacement = not displacement
-                for numb in range(horizontal_rep + 1):
-                    if displacement:
-                        canv_overlay.paste(rot_txt_mask,
-                                           (displacement_starting_point + spacing_x, starting_point_y +
-                                            spacing_y), mask=rot_txt_mask)
-                    else:
-                        canv_overlay.paste(rot_txt_mask,
-                                           (starting_point_x + spacing_x, starting_point_y + spacing_y),
-                                           mask=rot_txt_mask)
-                    spacing_x += word_gap_x
-                spacing_y += word_gap_y
-                spacing_x = 0
-
-    def update_original_image(self, file_path):
-        """This method is called when the clas receives image_changed.signal, takes file_path of that signal as an
-        argument and updates the self.img variable """
-        self.img = file_path
-
-    # Here we override the class closeEvent in order to reset the instance_count variable
+    # Here we override the class closeEvent in order to reset the instance_count variable. The text is removed from
+    # the image together with the widget
     def closeEvent(self, event):
         TextWidget.instance_count = 0
+        self.main_window.remove_layer(self.layer_id)
+        self.layer_id = None
 
     def update_image(self):
-        """Updates the image and sends it to main_window to be displayed."""
-        edited_image = self.add_text_to_img()
-        self.main_window.update_image(edited_image)
+        """Updates the text layer of main_window, which renders the image with all the watermarks and displays it. The
+        image is rendered at the size of the preview label, the full resolution image is rendered only when the user
+        saves it"""
+        # Values of the widgets are collected here, on the GUI thread, and the image is rendered on the render worker
+        self.layer_id = self.main_window.set_layer(self.layer_id, "text", self.text_settings())
+
+    def text_settings(self):
+        """Collects the user's input from all the widgets into a dictionary. Rendering only uses this dictionary, so it
+        can run outside the GUI thread"""
+        return {
+            "font": font_catalog.path(self.font.currentText()),
+            "text": self.input_txt.text(),
+            "color": parse_color(self.color.currentText()),
+            "size": self.size.value(),
+            "opacity": self.opacity.value(),
+            "rotation": self.rotation.value(),
+            "spacing_x": self.spacing_x.value(),
+            "spacing_y": self.spacing_y.value(),
+            "tile": self.clicks[0],
+        }
 
     def save_image(self):
-        """Displays the save dialog for user to save image. If user doesn't provide image format during the save
-        it will assign it .jpg format"""
-        options = QFileDialog.Options()
-        options |= QFileDialog.DontUseNativeDialog
-        file_filter = "JPEG Files (*.jpg);;PNG Files (*.png)"
-        file_name, _ = QFileDialog.getSaveFileName(self, "Save Image", filter=file_filter,
-                                                   options=options)
+        """Displays the save dialog for user to save image with all the watermarks, see MainWindow.save_image"""
+        self.main_window.save_image(self)
+
+    def text_preset(self):
+        """Returns the 'text' section of the preset (see presets module) with the current values of the widgets"""
+        return {
+            "text": self.input_txt.text(),
+            "font": self.font.currentText(),
+            "color": self.color.currentText(),
+            "size": self.size.value(),
+            "opacity": self.opacity.value(),
+            "rotation": self.rotation.value(),
+            "spacing_x": self.spacing_x.value(),
+            "spacing_y": self.spacing_y.value(),
+            "tile": self.clicks[0],
+        }
+
+    def save_text_preset(self):
+        """Displays the save dialog and saves the current values of the widgets into the preset file. If the preset
+        file already has the logo settings they are kept"""
+        file_name, _ = QFileDialog.getSaveFileName(self, "Save Preset", filter="Watermark Presets (*.json)")
 
         if file_name:
-            extension = "jpg"
-            if not file_name.endswith(extension):
-                file_name += "." + extension
-            rgb_img = self.watermarked_image.convert("RGB")
-            rgb_img.save(file_name, "JPEG" if file_name.endswith('.jpg') else "PNG")
+            if not file_name.endswith(".json"):
+                file_name += ".json"
+            try:
+                save_preset(file_name, text=self.text_preset())
+            except (OSError, ValueError) as error:
+                QMessageBox.warning(self, "Warning", f"Could not save the preset. {error}")
+
+    def load_text_preset(self):
+        """Displays the open dialog for user to choose the preset file and sets the widgets to the values from its
+        'text' section"""
+        file_name, _ = QFileDialog.getOpenFileName(self, "Load Preset", "", "Watermark Presets (*.json)")
+        if not file_name:
+            return
+
+        try:
+            preset = load_preset(file_name)
+        except (OSError, ValueError) as error:
+            QMessageBox.warning(self, "Warning", f"Could not load the preset. {error}")
+            return
+        if "text" not in preset:
+            QMessageBox.warning(self, "Warning", "This preset has no text settings.")
+            return
+
+        text_preset = preset["text"]
+        self.input_txt.setText(text_preset["text"])
+        # Font is only set if it exists in the combobox
+        if self.font.findText(text_preset["font"]) != -1:
+            self.font.setCurrentText(text_preset["font"])
+        # Hex or RGB color of the preset that isn't in the color combobox is added to it as hex
+        color = text_preset["color"]
+        if not isinstance(color, str):
+            color = color_to_hex(color)
+        if self.color.findText(color) == -1:
+            self.color.addItem(color)
+        self.color.setCurrentText(color)
+        self.size.setValue(text_preset["size"])
+        self.opacity.setValue(text_preset["opacity"])
+        self.rotation.setValue(text_preset["rotation"])
+        self.spacing_x.setValue(text_preset["spacing_x"])
+        self.spacing_y.setValue(text_preset["spacing_y"])
+        tile_buttons = {1: self.one_tile, 4: self.four_tiles, 5: self.four_tiles_ver}
+        tile_buttons[text_preset["tile"]].click()
 
     def reset(self):
         """Resets all sliders and buttons to default state. Clears the current text_image and updates the image to the
@@ -450,7 +438,7 @@ class TextWidget(QMainWindow):
         # Set sliders and buttons states to default
         self.input_txt.setText("Your Text")
         self.color.setCurrentIndex(0)
-        self.font.setCurrentIndex(0)
+        self.select_default_font()
         self.opacity.setValue(255)
         self.size.setValue(10)
         self.rotation.setValue(0)
@@ -458,78 +446,7 @@ class TextWidget(QMainWindow):
         self.spacing_y.setValue(10)
         self.one_tile.click()
 
-# --------------------------------------- CREATING MAIN METHOD --------------------------------------------------------
-    def add_text_to_img(self):
-        """This is the main method that encompasses all other methods in this class"""
-
-        # Collect data from user's input
-        font = self.fonts_dic[self.font.currentText()]
-        text_to_write = self.input_txt.text()
-        color = colors[self.color.currentText()]
-        size_coef = self.size.value() / 10
-        default_size = 70
-        size = round(default_size * size_coef)
-        opacity = int(self.opacity.value())
-        rotation = int(self.rotation.value())
-        spacing_coeficient_x = float(self.spacing_x.value())
-        spacing_coeficient_y = float(self.spacing_y.value())
-
-        # Create font object
-        font = ImageFont.truetype(font, size)
-
-        # Get width and length of text
-        txt_img = Image.new("RGB", (1, 1))
-        txt_draw = ImageDraw.Draw(txt_img)
-        text_bbox = txt_draw.textbbox((0, 0), text=text_to_write, font=font)
-        text_width = text_bbox[2] - text_bbox[0]
-        text_height = text_bbox[3] - text_bbox[1]
-
-        # Open the image that we want to watermark and convert it to RGBA so that we can change text transparency
-        opened_image = Image.open(self.img).convert("RGBA")
-
-        # Create an overlay image for text transparency
-        overlay = Image.new("RGBA", (opened_image.width, opened_image.height), (255, 255, 255, 0))
-
-        # Draw the overlay image
-        draw = ImageDraw.Draw(overlay)
-
-        # Create text mask
-        text_mask = Image.new("RGBA", (text_width, text_height), (0, 0, 0, 0))
-        text_mask_draw = ImageDraw.Draw(text_mask)
-        text_mask_draw.text((0, 0), text=text_to_write, fill=(int(color[0]), int(color[1]),
-                                                              int(color[2]), opacity), font=font, anchor='lt')
-        rotated_text_mask = text_mask.rotate(rotation, expand=True)
-
-        # Get user's choice for text pattern
-        tile_sig = self.clicks[0]
-
-        # Determine the area in which the checker and romb pattern text will be written.We leave 50px free on all sides
-        target_width = opened_image.width - 50
-        target_height = opened_image.height - 50
-
-        # Determine the width of the text mask. We take this value as the length of the text when we calculate number of
-        # text repetitions
-        rotated_text_mask_width = text_mask.width
-        rotated_text_mask_height = text_mask.height
-
-        # Determine the value of gap between text in checker and romb pattern
-        word_spacing_x_axis, word_spacing_y_axis = self.filter_coeficient(spacing_coeficient_x, spacing_coeficient_y,
-                                                                          rotated_text_mask_width,
-                                                                          rotated_text_mask_height)
-
-        # Determine how many times the text will be written over the image both vertically and horizontally
-        horizontal_repetitions, vertical_repetitions = self.calculate_numb_text_repetitions(word_spacing_x_axis,
-                                                                                            word_spacing_y_axis,
-                                                                                            target_width,
-                                                                                            target_height,
-                                                                                            rotated_text_mask_width,
-                                                                                            rotated_text_mask_height)
-
-        # Determine in which pattern the text will be displayed on the image
-        self.text_patterns(tile_sig, overlay, rotated_text_mask, horizontal_repetitions, vertical_repetitions,
-                           word_spacing_x_axis, word_spacing_y_axis)
-
-        # Combine overlay and opened_image using alpha_composite
-        self.watermarked_image = Image.alpha_composite(opened_image, overlay)
-
-        return self.watermarked_image
+    def select_default_font(self):
+        """Selects the default font of the presets in the font combobox, or the first font if it isn't installed"""
+        index = self.font.findText(DEFAULT_TEXT_PRESET["font"])
+        self.font.setCurrentIndex(max(index, 0))
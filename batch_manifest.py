@@ -0,0 +1,123 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+from font_catalog import resolve_font
+from presets import load_preset, preset_hash
+
+# Manifest is kept in the output directory of the batch, next to the images it describes
+MANIFEST_FILENAME = ".watermarker-manifest.json"
+MANIFEST_VERSION = 1
+# While the batch runs the manifest is saved at most this often, so an interrupted batch only does the images of the
+# last few seconds again
+SAVE_INTERVAL_SECONDS = 5
+CHECKSUM_BLOCK_SIZE = 1024 * 1024
+
+
+def file_checksum(path):
+    """Returns SHA-256 of the file content as a hex string"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(CHECKSUM_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def render_hash(settings_path, output_format=None, encode_options=None):
+    """Returns the hash of everything the saved images depend on besides their sources: the preset (see
+    presets.preset_hash), the path and modification time of its font file, the content of its logo image, the output
+    format and the encoder options"""
+    preset = load_preset(settings_path)
+    digest = hashlib.sha256(preset_hash(preset).encode("utf-8"))
+    if "text" in preset:
+        # Font of the same name can be another file, e.g. when a font is added to the Fonts directory, and the file can
+        # be replaced by a new version of the font
+        font_path = os.path.abspath(resolve_font(preset["text"]["font"]))
+        digest.update(json.dumps([font_path, os.stat(font_path).st_mtime_ns]).encode("utf-8"))
+    if "logo" in preset:
+        # The preset only has the path of the logo, the logo can be changed without changing the preset
+        digest.update(file_checksum(preset["logo"]["path"]).encode("utf-8"))
+    digest.update(json.dumps([output_format, encode_options], sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class BatchManifest:
+    """Record of the images a batch saved into output_dir. Every saved image has the entry with the path, size and
+    modification time of its source, the render_hash of the settings it was watermarked with and the size and
+    modification time of the saved file. The next batch into the same directory skips the images whose entries are
+    current, so only new or changed sources are watermarked again, also after a batch that was interrupted"""
+
+    def __init__(self, output_dir, render_hash):
+        self.output_dir = output_dir
+        self.path = os.path.join(output_dir, MANIFEST_FILENAME)
+        self.render_hash = render_hash
+        self.entries = self.load()
+        # Stats of the sources taken by is_current, so the entry describes the source the way it was before it was read
+        self.source_stats = {}
+        self.last_saved = time.monotonic()
+
+    def load(self):
+        """Returns the entries of the manifest file keyed by the names of the saved images. Missing, damaged or old
+        manifest has no entries, so all the images are watermarked again"""
+        try:
+            with open(self.path) as manifest_file:
+                manifest = json.load(manifest_file)
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(manifest, dict) or manifest.get("version") != MANIFEST_VERSION:
+            return {}
+        return manifest.get("entries", {})
+
+    def key(self, output_path):
+        """Returns the key of the entry of the image saved at output_path"""
+        return os.path.relpath(output_path, self.output_dir)
+
+    def is_current(self, input_path, output_path):
+        """Returns True if the image saved at output_path was watermarked from the source at input_path as it is now
+        and with the same settings, and wasn't changed since"""
+        stat = os.stat(input_path)
+        self.source_stats[input_path] = stat
+        entry = self.entries.get(self.key(output_path))
+        source = (os.path.abspath(input_path), stat.st_size, stat.st_mtime_ns, self.render_hash)
+        if entry is None or (entry.get("source"), entry.get("size"), entry.get("mtime_ns"),
+                                  entry.get("render_hash")) != source:
+            return False
+
+        try:
+            output_stat = os.stat(output_path)
+        except OSError:
+            return False
+        # The saved image was changed or written again by something else if its size or modification time differ. Its
+        # content isn't hashed, so a batch over an unchanged catalog doesn't read any of the saved images
+        return (output_stat.st_size, output_stat.st_mtime_ns) == (entry.get("output_size"),
+                                                                  entry.get("output_mtime_ns"))
+
+    def record(self, input_path, output_path):
+        """Adds the entry of the image that was just saved at output_path. The manifest file is saved if it wasn't saved
+        for SAVE_INTERVAL_SECONDS"""
+        stat = self.source_stats.pop(input_path, None) or os.stat(input_path)
+        output_stat = os.stat(output_path)
+        self.entries[self.key(output_path)] = {
+            "source": os.path.abspath(input_path),
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "render_hash": self.render_hash,
+            "output_size": output_stat.st_size,
+            "output_mtime_ns": output_stat.st_mtime_ns,
+        }
+        if time.monotonic() - self.last_saved >= SAVE_INTERVAL_SECONDS:
+            self.save()
+
+    def save(self):
+        """Writes the manifest file. It is written under a temporary name and renamed, so an interrupted batch never
+        leaves a half written manifest"""
+        file_descriptor, temporary_path = tempfile.mkstemp(suffix=".tmp", dir=self.output_dir)
+        try:
+            with os.fdopen(file_descriptor, "w") as manifest_file:
+                json.dump({"version": MANIFEST_VERSION, "entries": self.entries}, manifest_file, indent=1)
+            os.replace(temporary_path, self.path)
+        except BaseException:
+            os.remove(temporary_path)
+            raise
+        self.last_saved = time.monotonic()
@@ -0,0 +1,160 @@
+import queue
+import threading
+import time
+
+# Put into the input queue of a stage once for every thread of the stage when there is nothing more to take
+STOP = object()
+# Images waiting between two stages. Every decoded or rendered image in a queue holds its pixels, about 96 MB for
+# a 24 MP image, so the queues are kept short
+DEFAULT_QUEUE_SIZE = 2
+# Threads of the stages. Decoding and encoding are mostly done by the codecs, which release the GIL, so the readers and
+# the writers overlap with each other and with the compositing of the renderers
+DEFAULT_READERS = 2
+DEFAULT_RENDERERS = 1
+DEFAULT_WRITERS = 2
+
+
+class DepthQueue(queue.Queue):
+    """Queue that keeps the depth it had after every put, so it can be told how full it was on average"""
+
+    def _init(self, maxsize):
+        super()._init(maxsize)
+        self.puts = 0
+        self.depth_sum = 0
+        self.max_depth = 0
+
+    def _put(self, item):
+        # Called by put with the lock of the queue held
+        super()._put(item)
+        depth = len(self.queue)
+        self.puts += 1
+        self.depth_sum += depth
+        self.max_depth = max(self.max_depth, depth)
+
+    def depth_stats(self):
+        """Returns tuple (average depth after a put, maximum depth)"""
+        with self.mutex:
+            return (self.depth_sum / self.puts if self.puts else 0), self.max_depth
+
+
+class PipelineStage:
+    """One stage of the BatchPipeline. Its threads take (path, value, error) items from input_queue, replace value with
+    function(path, value) and put the items into output_queue. An item that failed in an earlier stage is passed on
+    without calling function, and an exception of function becomes the error of the item. Once all the threads got
+    STOP, the last one puts next_stops STOPs into output_queue, one for each thread of the next stage"""
+
+    def __init__(self, name, function, threads, input_queue, output_queue, next_stops):
+        self.name = name
+        self.function = function
+        self.threads = threads
+        self.input_queue = input_queue
+        self.output_queue = output_queue
+        self.next_stops = next_stops
+        # Seconds the threads spent in function and the number of the items it was called with
+        self.busy_seconds = 0
+        self.items = 0
+        self.running = threads
+        self.lock = threading.Lock()
+
+    def start(self):
+        """Starts the threads of the stage"""
+        for number in range(self.threads):
+            threading.Thread(target=self.work, name=f"{self.name}-{number + 1}", daemon=True).start()
+
+    def work(self):
+        """Runs in the thread of the stage until it gets STOP"""
+        while True:
+            item = self.input_queue.get()
+            if item is STOP:
+                break
+            path, value, error = item
+            if error is None:
+                start = time.perf_counter()
+                try:
+                    value = self.function(path, value)
+                except Exception as exception:
+                    value, error = None, f"{type(exception).__name__}: {exception}"
+                with self.lock:
+                    self.busy_seconds += time.perf_counter() - start
+                    self.items += 1
+            self.output_queue.put((path, value, error))
+
+        with self.lock:
+            self.running -= 1
+            last = self.running == 0
+        if last:
+            for _ in range(self.next_stops):
+                self.output_queue.put(STOP)
+
+
+class BatchPipeline:
+    """Watermarks the images in three stages that run at the same time: reader threads decode the images, renderer
+    threads draw the watermarks and writer threads encode and save them. The stages are connected by queues of
+    queue_size images, so a stage that is ahead waits for the next one instead of filling the memory. read(path)
+    returns the image, render(path, image) returns the watermarked image and write(path, image) returns the result the
+    image is yielded with by run. After the run stats tells how busy every stage was and how full the queues were, a
+    stage that is always busy with a full queue before it is the one to give more threads"""
+
+    def __init__(self, read, render, write, readers=DEFAULT_READERS, renderers=DEFAULT_RENDERERS,
+                 writers=DEFAULT_WRITERS, queue_size=DEFAULT_QUEUE_SIZE):
+        # Stage without threads would never take its images and queue of size 0 wouldn't be bounded at all
+        for name, value in (("readers", readers), ("renderers", renderers), ("writers", writers),
+                            ("queue_size", queue_size)):
+            if value < 1:
+                raise ValueError(f"{name} must be at least 1, not {value}")
+        self.paths_queue = DepthQueue(queue_size)
+        self.decoded_queue = DepthQueue(queue_size)
+        self.rendered_queue = DepthQueue(queue_size)
+        # Results are taken by run as soon as they are put, the writers never wait for it
+        self.results_queue = queue.Queue()
+        self.stages = [
+            PipelineStage("read", read, readers, self.paths_queue, self.decoded_queue, renderers),
+            PipelineStage("render", render, renderers, self.decoded_queue, self.rendered_queue, writers),
+            PipelineStage("write", write, writers, self.rendered_queue, self.results_queue, 1),
+        ]
+        self.seconds = 0
+
+    def run(self, paths):
+        """Runs the images from paths through the stages and yields tuple (path, result, error) for every image as it
+        is written, which isn't the order of paths. result is the value returned by write, or None if a stage raised
+        an exception, which is then described by error. paths can also be a generator, it is read by its own thread
+        only as fast as the readers take the images"""
+        start = time.perf_counter()
+        for stage in self.stages:
+            stage.start()
+        threading.Thread(target=self.feed, args=(paths,), name="feed", daemon=True).start()
+
+        while True:
+            item = self.results_queue.get()
+            if item is STOP:
+                break
+            yield item
+        self.seconds = time.perf_counter() - start
+
+    def feed(self, paths):
+        """Puts the paths into the queue of the readers, followed by a STOP for every reader"""
+        for path in paths:
+            self.paths_queue.put((path, None, None))
+        for _ in range(self.stages[0].threads):
+            self.paths_queue.put(STOP)
+
+    def stats(self):
+        """Returns the list of dictionaries with the name, threads, items and utilization of every stage, the part of
+        the run its threads were busy, together with the average and maximum depth and the size of the queue the stage
+        takes the images from"""
+        stats = []
+        for stage in self.stages:
+            average_depth, max_depth = stage.input_queue.depth_stats()
+            utilization = stage.busy_seconds / (stage.threads * self.seconds) if self.seconds else 0
+            stats.append({"name": stage.name, "threads": stage.threads, "items": stage.items,
+                          "utilization": utilization, "average_depth": average_depth, "max_depth": max_depth,
+                          "queue_size": stage.input_queue.maxsize})
+        return stats
+
+
+def format_stats(stats):
+    """Returns one line per stage of BatchPipeline.stats, e.g. 'render  1 thread   97% busy, queue average 1.8, max 2
+    of 2'"""
+    return "\n".join(f"{stage['name']:<6} {stage['threads']:>2} thread{'s' if stage['threads'] > 1 else ' '} "
+                     f"{stage['utilization'] * 100:>4.0f}% busy, queue average {stage['average_depth']:.1f}, "
+                     f"max {stage['max_depth']} of {stage['queue_size']}" for stage in stats)
@@ -0,0 +1,244 @@
+import glob
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from PIL import Image
+from batch_manifest import BatchManifest, render_hash
+from batch_pipeline import BatchPipeline, format_stats, DEFAULT_READERS, DEFAULT_RENDERERS, DEFAULT_WRITERS, \
+    DEFAULT_QUEUE_SIZE
+from color_palette import parse_color
+from decode_cache import DecodeCache, DEFAULT_MAX_BYTES
+from font_catalog import resolve_font
+from image_encoder import encode_image, FORMAT_EXTENSIONS
+from presets import load_preset
+from watermark_renderer import watermark_image, text_tile, logo_tile
+
+# Extensions of the images that are picked up when the input is a directory
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
+
+# Images submitted to the worker processes per worker and not finished yet. Paths are only submitted as the workers
+# finish the images before them, so a batch of any size only keeps this many images in flight
+IN_FLIGHT_PER_WORKER = 2
+
+# Settings of the current worker process, they are loaded once by init_worker
+worker_settings = {}
+
+
+def find_images(input_path):
+    """Returns sorted list of images to watermark. input_path is either a directory, in which case all the images in it
+    are returned, or a glob pattern such as 'photos/**/*.jpg'"""
+    if os.path.isdir(input_path):
+        return sorted(os.path.join(input_path, filename) for filename in os.listdir(input_path)
+                      if filename.lower().endswith(IMAGE_EXTENSIONS))
+    return sorted(path for path in glob.glob(input_path, recursive=True) if os.path.isfile(path))
+
+
+def input_root(input_path):
+    """Returns the directory the images found by find_images are saved relative to, so that the images with the same
+    name in different folders of a glob pattern don't overwrite each other. It is input_path itself if it is a
+    directory, otherwise the part of the glob pattern before the first wildcard, e.g. 'photos' of 'photos/**/*.jpg'"""
+    if os.path.isdir(input_path):
+        return input_path
+    root = os.path.dirname(input_path)
+    while glob.has_magic(root):
+        root = os.path.dirname(root)
+    return root or os.curdir
+
+
+def text_render_settings(text_preset):
+    """Turns the 'text' section of the preset into the settings render_text_watermark expects"""
+    return {**text_preset, "font": resolve_font(text_preset["font"]), "color": parse_color(text_preset["color"])}
+
+
+def logo_render_settings(logo_preset):
+    """Turns the 'logo' section of the preset into the settings render_logo_watermark expects"""
+    return {**logo_preset, "logo": Image.open(logo_preset["path"]).convert("RGBA")}
+
+
+def load_settings(settings_path):
+    """Reads the preset file (see presets module) and returns text and logo settings in the form render functions of
+    watermark_renderer expect. Section that is missing in the preset is returned as None"""
+    preset = load_preset(settings_path)
+
+    text_settings = None
+    if "text" in preset:
+        text_settings = text_render_settings(preset["text"])
+
+    logo_settings = None
+    if "logo" in preset:
+        logo_settings = logo_render_settings(preset["logo"])
+
+    return text_settings, logo_settings
+
+
+def output_path_for(input_path, output_dir, output_format=None, root=None):
+    """Returns the path the watermarked image is saved at. It has the same path relative to output_dir as the input
+    image has relative to root (see input_root), or the same name if root is None, with the extension of output_format
+    if it is given (e.g. 'WEBP')"""
+    filename = os.path.basename(input_path) if root is None else os.path.relpath(input_path, root)
+    if output_format is not None:
+        filename = os.path.splitext(filename)[0] + FORMAT_EXTENSIONS[output_format]
+    return os.path.join(output_dir, filename)
+
+
+def init_worker(settings_path, output_dir, decode_cache_dir=None, decode_cache_bytes=DEFAULT_MAX_BYTES,
+                output_format=None, encode_options=None, root=None):
+    """Loads the settings once per worker process, so the logo and the settings file aren't read for every image. If
+    decode_cache_dir is given, the images are decoded through the DecodeCache in that directory. output_format, root
+    and encode_options tell how and where the images are saved (see output_path_for and image_encoder.save_arguments)"""
+    worker_settings["text"], worker_settings["logo"] = load_settings(settings_path)
+    worker_settings["output_dir"] = output_dir
+    worker_settings["root"] = root
+    worker_settings["output_format"] = output_format
+    worker_settings["encode_options"] = encode_options
+    worker_settings["decode_cache"] = None
+    if decode_cache_dir is not None:
+        worker_settings["decode_cache"] = DecodeCache(decode_cache_dir, decode_cache_bytes)
+
+    # Load the font and render the text and the logo tiles now. They don't depend on the image, so every image of the
+    # worker takes them from the tile cache
+    if worker_settings["text"] is not None:
+        text_tile(worker_settings["text"])
+    if worker_settings["logo"] is not None:
+        logo_tile(worker_settings["logo"])
+
+
+def read_image(input_path, _=None):
+    """Returns the RGBA image at input_path, taken from the decode cache of the worker if it has one. Takes the unused
+    second argument as a stage of BatchPipeline"""
+    if worker_settings["decode_cache"] is not None:
+        return worker_settings["decode_cache"].get(input_path)
+    return Image.open(input_path).convert("RGBA")
+
+
+def render_image(input_path, image):
+    """Returns the image from read_image with the watermarks of the worker"""
+    if worker_settings["decode_cache"] is not None:
+        # Image mapped from the decode cache is read-only, so the watermark is drawn onto its copy
+        return watermark_image(image, worker_settings["text"], worker_settings["logo"])
+    return watermark_image(image, worker_settings["text"], worker_settings["logo"], in_place=True)
+
+
+def write_image(input_path, image):
+    """Saves the watermarked image of the image at input_path into the output directory of the worker. Returns tuple
+    (seconds the encoding took, size of the saved file in bytes)"""
+    output_path = output_path_for(input_path, worker_settings["output_dir"], worker_settings["output_format"],
+                                  worker_settings["root"])
+    # Images from the subfolders of the input are saved into the same subfolders of the output directory
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    return encode_image(image, output_path, worker_settings["encode_options"])
+
+
+def watermark_file(input_path):
+    """Watermarks one image with the settings of the worker and saves it into the output directory under the same
+    name. Returns tuple (input_path, error, encode_seconds, file_size), where error is None if the image was
+    watermarked successfully, encode_seconds is the time its encoding took and file_size the size of the saved file in
+    bytes"""
+    try:
+        image = read_image(input_path)
+        encode_seconds, file_size = write_image(input_path, render_image(input_path, image))
+        return input_path, None, encode_seconds, file_size
+    except Exception as error:
+        return input_path, f"{type(error).__name__}: {error}", None, None
+
+
+def watermark_in_pool(paths, jobs, initargs):
+    """Watermarks the images from paths with jobs worker processes and yields the results of watermark_file as the
+    images are finished, which isn't the order of paths. At most jobs * IN_FLIGHT_PER_WORKER images are submitted at
+    once, the next path is only taken once an image is finished, so paths can also be a generator"""
+    max_in_flight = jobs * IN_FLIGHT_PER_WORKER
+    with ProcessPoolExecutor(max_workers=jobs, initializer=init_worker, initargs=initargs) as executor:
+        in_flight = set()
+        for path in paths:
+            if len(in_flight) >= max_in_flight:
+                # Wait for the workers before submitting more
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+            in_flight.add(executor.submit(watermark_file, path))
+
+        while in_flight:
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+
+def watermark_in_pipeline(paths, pipeline):
+    """Watermarks the images from paths with the BatchPipeline of read_image, render_image and write_image in this
+    process and yields the results as the images are finished, the same way watermark_in_pool does"""
+    for path, result, error in pipeline.run(paths):
+        encode_seconds, file_size = result if error is None else (None, None)
+        yield path, error, encode_seconds, file_size
+
+
+def run_batch(input_path, settings_path, output_dir, jobs=1, decode_cache_dir=None,
+              decode_cache_bytes=DEFAULT_MAX_BYTES, output_format=None, encode_options=None, readers=DEFAULT_READERS,
+              renderers=DEFAULT_RENDERERS, writers=DEFAULT_WRITERS, queue_size=DEFAULT_QUEUE_SIZE, force=False):
+    """Watermarks all the images found by input_path with the settings from settings_path and saves them to output_dir.
+    If jobs is bigger than 1 the images are processed by that many worker processes, 0 means one worker per CPU.
+    Otherwise they go through the BatchPipeline with readers, renderers and writers threads and queues of queue_size
+    images between them, so the decoding and the encoding of the images overlap with the rendering. If
+    decode_cache_dir is given the decoded images are kept there (see decode_cache), so the next batch over the same
+    images doesn't decode them again. Images are saved in output_format (e.g. 'PNG'), or in the format of the input
+    image if it is None, with the encoder options encode_options (see image_encoder.save_arguments).
+    Images are saved under the same paths relative to output_dir as they have relative to input_root(input_path).
+    Raises ValueError if two images would be saved into the same file, e.g. 'a.jpg' and 'a.png' with output_format.
+    The saved images are recorded in the BatchManifest of output_dir and the images already saved there from the same
+    sources with the same settings are skipped, unless force is True.
+    Returns the number of watermarked images, the number of skipped images, the list of (path, error) tuples for the
+    images that failed and the seconds the batch took"""
+    start = time.perf_counter()
+    all_paths = find_images(input_path)
+    os.makedirs(output_dir, exist_ok=True)
+    if jobs == 0:
+        jobs = os.cpu_count() or 1
+
+    root = input_root(input_path)
+    output_paths = {path: output_path_for(path, output_dir, output_format, root) for path in all_paths}
+    sources = {}
+    for path, output_path in output_paths.items():
+        if output_path in sources:
+            # Refuse to run rather than silently keeping only the last one of the images
+            raise ValueError(f"{sources[output_path]} and {path} would both be saved as {output_path}")
+        sources[output_path] = path
+
+    # Load the settings before starting the workers, so that the wrong settings file fails immediately
+    initargs = (settings_path, output_dir, decode_cache_dir, decode_cache_bytes, output_format, encode_options, root)
+    init_worker(*initargs)
+
+    manifest = BatchManifest(output_dir, render_hash(settings_path, output_format, encode_options))
+    paths = [path for path in all_paths if force or not manifest.is_current(path, output_paths[path])]
+    skipped = len(all_paths) - len(paths)
+    if skipped:
+        print(f"Skipping {skipped} images that are already watermarked with these settings")
+
+    pipeline = None
+    if jobs > 1:
+        results = watermark_in_pool(paths, jobs, initargs)
+    else:
+        pipeline = BatchPipeline(read_image, render_image, write_image, readers, renderers, writers, queue_size)
+        results = watermark_in_pipeline(paths, pipeline)
+
+    processed = 0
+    failed = []
+    try:
+        for number, (path, error, encode_seconds, file_size) in enumerate(results, start=1):
+            # Throughput of the whole batch so far, including the start of the workers
+            images_per_second = number / (time.perf_counter() - start)
+            if error is None:
+                processed += 1
+                manifest.record(path, output_paths[path])
+                print(f"[{number}/{len(paths)}] {path} ({file_size / 1024 / 1024:.1f} MB, "
+                      f"encoded in {encode_seconds * 1000:.0f} ms, {images_per_second:.2f} images/s)")
+            else:
+                failed.append((path, error))
+                print(f"[{number}/{len(paths)}] {path} failed: {error}", file=sys.stderr)
+    finally:
+        # Also when the batch is interrupted, so the next batch continues where this one stopped
+        manifest.save()
+
+    if pipeline is not None:
+        # Tells which stage holds the others up, e.g. the readers on a network drive
+        print(format_stats(pipeline.stats()))
+    return processed, skipped, failed, time.perf_counter() - start
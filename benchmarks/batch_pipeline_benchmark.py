@@ -0,0 +1,57 @@
+# Benchmark of the batch mode in one process, the images watermarked one after the other compared to the BatchPipeline
+# that overlaps reading, rendering and writing. Run it from the project directory:
+#
+#     python -m benchmarks.batch_pipeline_benchmark [--images N] [--readers R] [--renderers N] [--writers W]
+#
+# Test JPEGs, the logo and the preset are generated into a temporary directory (see batch_throughput_benchmark). The
+# serial loop reads, renders and writes every image with batch_processing.watermark_file before it takes the next one.
+# The pipeline runs with the given threads, and its busy time and queue depths of every stage are printed after it
+import argparse
+import os
+import tempfile
+import time
+from batch_pipeline import BatchPipeline, format_stats, DEFAULT_READERS, DEFAULT_RENDERERS, DEFAULT_WRITERS, \
+    DEFAULT_QUEUE_SIZE
+from batch_processing import find_images, init_worker, read_image, render_image, write_image, watermark_file
+from benchmarks.batch_throughput_benchmark import make_inputs
+
+IMAGES = 16
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch mode in one process, serial loop and the staged pipeline")
+    parser.add_argument("--images", type=int, default=IMAGES, help="number of the test images (default: %(default)s)")
+    parser.add_argument("--readers", type=int, default=DEFAULT_READERS)
+    parser.add_argument("--renderers", type=int, default=DEFAULT_RENDERERS)
+    parser.add_argument("--writers", type=int, default=DEFAULT_WRITERS)
+    parser.add_argument("--queue-size", type=int, default=DEFAULT_QUEUE_SIZE)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        images_dir, preset_path = make_inputs(directory, args.images)
+        paths = find_images(images_dir)
+        output_dir = os.path.join(directory, "output")
+        os.makedirs(output_dir)
+        init_worker(preset_path, output_dir)
+
+        start = time.perf_counter()
+        for path in paths:
+            _, error, _, _ = watermark_file(path)
+            if error is not None:
+                raise RuntimeError(error)
+        serial_seconds = time.perf_counter() - start
+
+        pipeline = BatchPipeline(read_image, render_image, write_image, args.readers, args.renderers, args.writers,
+                                 args.queue_size)
+        for _, _, error in pipeline.run(paths):
+            if error is not None:
+                raise RuntimeError(error)
+
+        print(f"{os.cpu_count()} CPUs, {args.images} images")
+        print(f"serial   {serial_seconds:>6.2f} s {len(paths) / serial_seconds:>6.2f} images/s")
+        print(f"pipeline {pipeline.seconds:>6.2f} s {len(paths) / pipeline.seconds:>6.2f} images/s")
+        print(format_stats(pipeline.stats()))
+
+
+if __name__ == "__main__":
+    main()
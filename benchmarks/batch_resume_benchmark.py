@@ -0,0 +1,58 @@
+# Benchmark of running the batch again over a mostly unchanged catalog. Run it from the project directory:
+#
+#     python -m benchmarks.batch_resume_benchmark [--images N] [--changed PERCENT]
+#
+# Test JPEGs, the logo and the preset are generated into a temporary directory (see batch_throughput_benchmark). The
+# batch is run three times into the same output directory: the first run watermarks all the images, the second one
+# finds all of them current in the manifest of the output directory, and the third one runs after PERCENT of the
+# sources were changed, so only those are watermarked again. The run with force shows the time of watermarking all
+# the images again the way the batch did it without the manifest
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+from batch_processing import find_images, run_batch
+from benchmarks.batch_throughput_benchmark import make_inputs
+
+IMAGES = 20
+CHANGED_PERCENT = 10
+
+
+def timed_batch(images_dir, preset_path, output_dir, force=False):
+    """Runs the batch and returns (seconds, watermarked images, skipped images)"""
+    # Progress of every image isn't interesting here
+    with contextlib.redirect_stdout(io.StringIO()):
+        processed, skipped, failed, seconds = run_batch(images_dir, preset_path, output_dir, force=force)
+    if failed:
+        raise RuntimeError(f"{len(failed)} images failed, the first one: {failed[0]}")
+    return seconds, processed, skipped
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch over a mostly unchanged catalog with the manifest")
+    parser.add_argument("--images", type=int, default=IMAGES, help="number of the test images (default: %(default)s)")
+    parser.add_argument("--changed", type=float, default=CHANGED_PERCENT,
+                        help="percent of the sources changed before the last run (default: %(default)s)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        images_dir, preset_path = make_inputs(directory, args.images)
+        output_dir = os.path.join(directory, "output")
+
+        print(f"{'run':>14} {'seconds':>8} {'watermarked':>12} {'skipped':>8}")
+        runs = [("first", timed_batch(images_dir, preset_path, output_dir)),
+                ("unchanged", timed_batch(images_dir, preset_path, output_dir))]
+        # Changing the modification time is enough, the manifest doesn't read the sources
+        paths = find_images(images_dir)
+        for path in paths[:round(len(paths) * args.changed / 100)]:
+            os.utime(path, ns=(time.time_ns(), time.time_ns()))
+        runs.append((f"{args.changed:g}% changed", timed_batch(images_dir, preset_path, output_dir)))
+        runs.append(("force", timed_batch(images_dir, preset_path, output_dir, force=True)))
+        for name, (seconds, processed, skipped) in runs:
+            print(f"{name:>14} {seconds:>8.2f} {processed:>12} {skipped:>8}")
+
+
+if __name__ == "__main__":
+    main()
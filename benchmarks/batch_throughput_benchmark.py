@@ -0,0 +1,85 @@
+# Benchmark of the batch mode throughput with a growing number of worker processes. Run it from the project directory:
+#
+#     python -m benchmarks.batch_throughput_benchmark [--images N] [--jobs J ...]
+#
+# Test JPEGs, the logo and the preset with a text and a logo watermark are generated into a temporary directory and the
+# batch is run with every number of jobs (by default 1, 2, 4, ... up to the number of CPUs). Images per second include
+# the start of the workers, the way the user waits for them. Speedup and efficiency are relative to one job, so the
+# efficiency stays close to 1 as long as the batch scales with the cores. The workers load the preset, the font and
+# the logo and render the tiles once, when they start, and only submitted images wait for them (see
+# batch_processing.IN_FLIGHT_PER_WORKER)
+import argparse
+import contextlib
+import io
+import json
+import os
+import tempfile
+from PIL import Image, ImageDraw
+from batch_processing import run_batch
+
+IMAGE_SIZE = (4000, 3000)
+IMAGES = 24
+LOGO_SIZE = (800, 400)
+PRESET = {
+    "text": {"text": "Your Text", "font": "Roboto-Bold", "color": "white", "tile": 5, "rotation": 30, "opacity": 128},
+    "logo": {"path": "logo.png", "tile": 4, "size": 5, "opacity": 160},
+}
+
+
+def make_inputs(directory, count):
+    """Saves count JPEGs with some detail in them, the logo and the preset. Returns (images directory, preset path)"""
+    images_dir = os.path.join(directory, "images")
+    os.makedirs(images_dir)
+    image = Image.new("RGB", IMAGE_SIZE, (40, 90, 160))
+    draw = ImageDraw.Draw(image)
+    for x in range(0, IMAGE_SIZE[0], 97):
+        draw.line((x, 0, IMAGE_SIZE[0] - x, IMAGE_SIZE[1]), fill=(230, 200, 60), width=9)
+    for number in range(count):
+        image.save(os.path.join(images_dir, f"{number:03}.jpg"), quality=90)
+
+    logo = Image.new("RGBA", LOGO_SIZE, (0, 0, 0, 0))
+    ImageDraw.Draw(logo).ellipse((0, 0, LOGO_SIZE[0] - 1, LOGO_SIZE[1] - 1), fill=(20, 90, 200, 255))
+    logo.save(os.path.join(directory, "logo.png"))
+    preset_path = os.path.join(directory, "preset.json")
+    with open(preset_path, "w") as preset_file:
+        json.dump(PRESET, preset_file)
+    return images_dir, preset_path
+
+
+def default_jobs():
+    """Returns 1, 2, 4, ... up to the number of CPUs, which is always included"""
+    cpus = os.cpu_count() or 1
+    jobs = [1]
+    while jobs[-1] * 2 < cpus:
+        jobs.append(jobs[-1] * 2)
+    if cpus > 1:
+        jobs.append(cpus)
+    return jobs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch mode throughput with a growing number of worker processes")
+    parser.add_argument("--images", type=int, default=IMAGES, help="number of the test images (default: %(default)s)")
+    parser.add_argument("--jobs", nargs="+", type=int, default=default_jobs(), help="numbers of worker processes")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        images_dir, preset_path = make_inputs(directory, args.images)
+        print(f"{os.cpu_count()} CPUs, {args.images} images of {IMAGE_SIZE[0]}x{IMAGE_SIZE[1]}")
+
+        print(f"{'jobs':>4} {'seconds':>8} {'images/s':>9} {'speedup':>8} {'efficiency':>11}")
+        base_rate = None
+        for jobs in args.jobs:
+            output_dir = os.path.join(directory, f"output-{jobs}")
+            # Progress of every image isn't interesting here
+            with contextlib.redirect_stdout(io.StringIO()):
+                processed, _, failed, seconds = run_batch(images_dir, preset_path, output_dir, jobs=jobs)
+            if failed:
+                raise RuntimeError(f"{len(failed)} images failed, the first one: {failed[0]}")
+            rate = processed / seconds
+            base_rate = base_rate or rate
+            print(f"{jobs:>4} {seconds:>8.2f} {rate:>9.2f} {rate / base_rate:>8.2f} {rate / base_rate / jobs:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
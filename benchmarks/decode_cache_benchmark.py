@@ -0,0 +1,59 @@
+# Benchmark of getting the source image for a render from the decode cache compared to decoding the JPEG. Run it from
+# the project directory:
+#
+#     python -m benchmarks.decode_cache_benchmark
+#
+# Test images and the cache directory are generated into a temporary directory. The first get of the cache decodes
+# the JPEG and writes the cache file, the later ones only map it. Every time includes one pass over the pixels, the way
+# the render reads them
+import os
+import tempfile
+import time
+from PIL import Image, ImageDraw
+from decode_cache import DecodeCache
+
+IMAGE_SIZES = ((4000, 3000), (6000, 4000), (8660, 5773))
+REPEATS = 3
+
+
+def make_jpeg(directory, size):
+    """Saves JPEG with some detail in it and returns its path"""
+    image = Image.new("RGB", size, (40, 90, 160))
+    draw = ImageDraw.Draw(image)
+    for x in range(0, size[0], 97):
+        draw.line((x, 0, size[0] - x, size[1]), fill=(230, 200, 60), width=9)
+    path = os.path.join(directory, f"{size[0]}x{size[1]}.jpg")
+    image.save(path, quality=90)
+    return path
+
+
+def best_time(function):
+    """Returns the best time in ms of REPEATS calls of function"""
+    best = None
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1000
+
+
+def main():
+    print(f"{'image':>12} {'decode ms':>10} {'first get ms':>13} {'mapped get ms':>14}")
+    with tempfile.TemporaryDirectory() as directory:
+        cache = DecodeCache(os.path.join(directory, "cache"))
+        for size in IMAGE_SIZES:
+            path = make_jpeg(directory, size)
+            decode_time = best_time(lambda: Image.open(path).convert("RGBA").getextrema())
+
+            start = time.perf_counter()
+            cache.get(path)
+            first_time = (time.perf_counter() - start) * 1000
+
+            # Mapped image is only read when it is used, so both times include reading all of the pixels once
+            mapped_time = best_time(lambda: cache.get(path).getextrema())
+            print(f"{size[0]}x{size[1]:<7} {decode_time:>10.1f} {first_time:>13.1f} {mapped_time:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
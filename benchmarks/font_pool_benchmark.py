@@ -0,0 +1,63 @@
+# Microbenchmark of the font cost per text render. Run it from the project directory:
+#
+#     python -m benchmarks.font_pool_benchmark
+#
+# It simulates typing: every render has a new text, so the tile cache misses and the font is needed on every render.
+# Renders are measured with ImageFont.truetype loading the font every time (as before the font pool) and with the font
+# pool
+import time
+from PIL import Image, ImageFont
+import watermark_renderer
+from font_catalog import font_catalog
+from font_pool import font_pool
+from tile_cache import tile_cache
+
+RENDERS = 200
+FONT_NAME = "Roboto-Regular"
+
+
+class UnpooledFonts:
+    """Stands in for the font pool and loads the font on every call, the way renders worked before the pool"""
+
+    @staticmethod
+    def get(path, size):
+        return ImageFont.truetype(path, size)
+
+
+def measure(fonts, settings, canvas):
+    """Renders RENDERS texts with the given font source and returns (font ms per render, total ms per render)"""
+    watermark_renderer.font_pool = fonts
+    font_time = 0
+    start = time.perf_counter()
+    for number in range(RENDERS):
+        font_start = time.perf_counter()
+        fonts.get(settings["font"], 70)
+        font_time += time.perf_counter() - font_start
+        tile_cache.clear()
+        watermark_renderer.render_text_watermark(canvas, {**settings, "text": f"Your Text {number}"})
+    total_time = time.perf_counter() - start
+    return font_time / RENDERS * 1000, total_time / RENDERS * 1000
+
+
+def main():
+    settings = {
+        "font": font_catalog.path(FONT_NAME),
+        "color": (255, 255, 255),
+        "size": 10,
+        "opacity": 255,
+        "rotation": 30,
+        "spacing_x": 10,
+        "spacing_y": 10,
+        "tile": 1,
+    }
+    canvas = Image.new("RGBA", (800, 600))
+
+    font_pool.clear()
+    for name, fonts in (("truetype per render", UnpooledFonts), ("font pool", font_pool)):
+        font_ms, total_ms = measure(fonts, settings, canvas)
+        print(f"{name:>20}: font {font_ms:.3f} ms/render, whole render {total_ms:.3f} ms/render")
+    watermark_renderer.font_pool = font_pool
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+# Benchmark of drawing the text and the logo watermark together. Run it from the project directory:
+#
+#     python -m benchmarks.layer_stack_benchmark
+#
+# The text size slider is dragged through RENDERS values while the logo stays as it is. Every frame is rendered three
+# ways: the way TextWidget and LogoWidget used to render, each drawing its own watermark over its own copy of the image
+# (so the user only ever saw one of them), both watermarks composited over one copy in one pass with
+# watermark_renderer.render_layers, and with the LayerStack of main_window, which also only renders the pattern of the
+# dirty text layer. The preview is 1600x1200 and the full resolution render is 24 MP. The one pass and the layer stack
+# renders are checked to be the same as compositing the text and then the logo one after the other
+import time
+from PIL import Image, ImageDraw
+from buffer_pool import buffer_pool
+from font_catalog import font_catalog
+from layer_stack import LayerStack
+from tile_cache import tile_cache
+from tile_layout import ROMB_PATTERN, scale_size
+from watermark_renderer import render_text_watermark, render_logo_watermark, render_layers
+
+FULL_SIZE = (6000, 4000)
+PREVIEW_SIZE = (1600, 1200)
+RENDERS = 20
+LOGO_SIZE = (1200, 600)
+
+
+def make_logo():
+    """Returns half transparent elliptic logo"""
+    logo = Image.new("RGBA", LOGO_SIZE, (0, 0, 0, 0))
+    ImageDraw.Draw(logo).ellipse((0, 0, LOGO_SIZE[0] - 1, LOGO_SIZE[1] - 1), fill=(20, 90, 200, 255))
+    return logo
+
+
+def render_separately(canvas, layers, full_size, scale):
+    """Renders the text and the logo each over its own copy of canvas, the way the widgets did. Returns the images"""
+    (_, text_settings), (_, logo_settings) = layers
+    return (render_text_watermark(canvas, text_settings, full_size, scale),
+            render_logo_watermark(canvas, logo_settings, full_size, scale))
+
+
+def render_one_by_one(canvas, layers, full_size, scale):
+    """Composites the text and then the logo over canvas, every watermark in its own pass over the image"""
+    (_, text_settings), (_, logo_settings) = layers
+    image = render_text_watermark(canvas, text_settings, full_size, scale)
+    return (render_logo_watermark(image, logo_settings, full_size, scale, in_place=True),)
+
+
+def measure(render, frames):
+    """Renders every frame, list of the layers, and returns (ms per frame, list of the hashes of the rendered images)"""
+    hashes = []
+    elapsed = 0
+    for layers in frames:
+        start = time.perf_counter()
+        images = render(layers)
+        elapsed += time.perf_counter() - start
+        hashes.append([hash(image.tobytes()) for image in images])
+        for image in images:
+            buffer_pool.release(image)
+    return elapsed / len(frames) * 1000, hashes
+
+
+def main():
+    text_settings = {"font": font_catalog.path("Roboto-Bold"), "text": "Your Text", "color": (255, 255, 255),
+                     "size": 10, "opacity": 160, "rotation": 30, "spacing_x": 10, "spacing_y": 10,
+                     "tile": ROMB_PATTERN}
+    logo_settings = {"logo": make_logo(), "size": 1, "opacity": 128, "rotation": 0, "spacing_x": 20, "spacing_y": 20,
+                     "tile": ROMB_PATTERN}
+    frames = [[("text", {**text_settings, "size": 5 + value}), ("logo", logo_settings)] for value in range(RENDERS)]
+
+    print(f"{'render':>8} {'separately ms':>14} {'one pass ms':>12} {'layer stack ms':>15}")
+    for name, scale in (("preview", PREVIEW_SIZE[0] / FULL_SIZE[0]), ("full", 1)):
+        canvas = Image.new("RGBA", scale_size(FULL_SIZE, scale), (40, 90, 160, 255))
+        # Every way starts with empty tile cache, so they all draw the same tiles
+        tile_cache.clear()
+        separate_time, _ = measure(lambda layers: render_separately(canvas, layers, FULL_SIZE, scale), frames)
+        tile_cache.clear()
+        one_pass_time, one_pass_hashes = measure(
+            lambda layers: (render_layers(canvas, layers, FULL_SIZE, scale),), frames)
+
+        layer_stack = LayerStack()
+        text_layer = layer_stack.add_layer("text", text_settings)
+        layer_stack.add_layer("logo", logo_settings)
+
+        def render_stack(layers):
+            layer_stack.update_layer(text_layer, layers[0][1])
+            return (layer_stack.render(canvas, FULL_SIZE, scale),)
+
+        stack_time, stack_hashes = measure(render_stack, frames)
+        _, one_by_one_hashes = measure(lambda layers: render_one_by_one(canvas, layers, FULL_SIZE, scale), frames)
+        if not one_by_one_hashes == one_pass_hashes == stack_hashes:
+            raise AssertionError(f"{name} renders differ")
+        print(f"{name:>8} {separate_time:>14.2f} {one_pass_time:>12.2f} {stack_time:>15.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+# Benchmark of the logo render on a 50 MP image. Run it from the project directory:
+#
+#     python -m benchmarks.logo_render_benchmark
+#
+# The render is measured with the full-frame pipeline LogoWidget.main used before (transparent overlay of the image
+# size, point() pass over it and alpha_composite of the whole image) and with watermark_renderer.render_logo_watermark,
+# which only composites the bands covered by the logos. Every measurement runs in its own process, so the peak RSS of
+# one pipeline doesn't hide the other. Peak RSS is reported above the RSS of the process with the image loaded
+import hashlib
+import resource
+import time
+from multiprocessing import get_context
+from PIL import Image, ImageDraw
+from buffer_pool import buffer_pool
+from overlay_builder import paste_tiles
+from tile_layout import CHECKER_PATTERN, ONE_TILE, ROMB_PATTERN, tile_gap, number_of_repetitions, rotated_size
+from tile_layout import tile_positions
+from watermark_renderer import logo_tile, render_logo_watermark
+
+IMAGE_SIZE = (8660, 5773)
+LOGO_SIZE = (400, 200)
+REPEATS = 3
+PATTERNS = ((ONE_TILE, "one"), (CHECKER_PATTERN, "checker"), (ROMB_PATTERN, "romb"))
+
+
+def make_settings(tile):
+    """Returns logo settings with an elliptic half transparent logo"""
+    logo = Image.new("RGBA", LOGO_SIZE, (0, 0, 0, 0))
+    ImageDraw.Draw(logo).ellipse((0, 0, LOGO_SIZE[0] - 1, LOGO_SIZE[1] - 1), fill=(20, 90, 200, 255))
+    return {"logo": logo, "opacity": 128, "size": 10, "rotation": 30, "spacing_x": 20, "spacing_y": 20, "tile": tile}
+
+
+def render_full_frame(canvas, settings):
+    """Renders the logo the way LogoWidget.main did it before, with the overlay of the whole image"""
+    tile = logo_tile(settings)
+    logo_opacity = int(settings["opacity"])
+    rotated_logo_size = rotated_size(tile.full_size[0], tile.full_size[1], int(settings["rotation"]))
+
+    overlay_image = Image.new("RGBA", (canvas.width, canvas.height), (255, 255, 255, 0))
+    overlay_image = overlay_image.point(lambda p: p * logo_opacity // 255)
+
+    gap_x = tile_gap(float(settings["spacing_x"] / 10), rotated_logo_size[0])
+    gap_y = tile_gap(float(settings["spacing_y"] / 10), rotated_logo_size[1])
+    horizontal_rep = number_of_repetitions(canvas.width, gap_x, rotated_logo_size[0])
+    vertical_rep = number_of_repetitions(canvas.height, gap_y, rotated_logo_size[1])
+    positions = tile_positions(settings["tile"], canvas.size, rotated_logo_size, gap_x, gap_y, horizontal_rep,
+                               vertical_rep)
+    paste_tiles(overlay_image, tile.image, positions)
+    return Image.alpha_composite(canvas, overlay_image)
+
+
+def measure(pipeline, tile):
+    """Runs in a new process. Returns (best ms per render, peak RSS in MB above the RSS with the image loaded, md5 of
+    the result, high-water mark of the render buffer pool in bytes)"""
+    render = render_full_frame if pipeline == "full frame" else render_logo_watermark
+    settings = make_settings(tile)
+    canvas = Image.new("RGBA", IMAGE_SIZE, (120, 140, 160, 255))
+    # Render the tile before measuring, so both pipelines take it from the tile cache
+    logo_tile(settings)
+    base_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    best = None
+    result = None
+    for _ in range(REPEATS):
+        # Result of the previous render is released first, so it doesn't count into the peak. Render buffer goes back
+        # to the pool the way MainWindow.update_image gives it back
+        buffer_pool.release(result)
+        result = None
+        start = time.perf_counter()
+        result = render(canvas, settings)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - base_rss
+    return best * 1000, peak_rss / 1024, hashlib.md5(result.tobytes()).hexdigest(), buffer_pool.high_water_bytes
+
+
+def main():
+    print(f"Logo render on {IMAGE_SIZE[0]}x{IMAGE_SIZE[1]} image ({IMAGE_SIZE[0] * IMAGE_SIZE[1] / 1e6:.0f} MP)")
+    print(f"{'pattern':>8} {'pipeline':>12} {'ms/render':>10} {'peak RSS MB':>12} {'buffer pool MB':>15}")
+    context = get_context("spawn")
+    for tile, name in PATTERNS:
+        checksums = set()
+        for pipeline in ("full frame", "bands"):
+            # New process for each measurement, ru_maxrss only grows
+            with context.Pool(1) as pool:
+                milliseconds, peak_rss, checksum, high_water_bytes = pool.apply(measure, (pipeline, tile))
+            checksums.add(checksum)
+            print(f"{name:>8} {pipeline:>12} {milliseconds:>10.1f} {peak_rss:>12.0f} "
+                  f"{high_water_bytes / 1024 / 1024:>15.0f}")
+        assert len(checksums) == 1, "pipelines give different images"
+
+
+if __name__ == "__main__":
+    main()
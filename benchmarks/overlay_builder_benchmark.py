@@ -0,0 +1,52 @@
+# Benchmark of building the tiled overlay with strips (overlay_builder.paste_tiles) compared to pasting the tiles one
+# by one, the way TextWidget.text_patterns and LogoWidget.logo_patterns did it. Run it from the project directory:
+#
+#     python -m benchmarks.overlay_builder_benchmark
+#
+# Tile is shrunk step by step, so the number of tiles on the 12 MP overlay grows from tens to tens of thousands
+import time
+from PIL import Image, ImageDraw
+from overlay_builder import paste_tiles, paste_tiles_one_by_one
+from tile_layout import CHECKER_PATTERN, ROMB_PATTERN, tile_positions, number_of_repetitions, tile_gap
+
+CANVAS_SIZE = (4000, 3000)
+TILE_WIDTHS = (800, 400, 200, 100, 50, 25)
+REPEATS = 3
+
+
+def make_tile(width):
+    """Returns rotated ellipse tile, which looks like a rotated text mask"""
+    tile = Image.new("RGBA", (width, width // 3), (0, 0, 0, 0))
+    ImageDraw.Draw(tile).ellipse((0, 0, tile.width - 1, tile.height - 1), fill=(255, 255, 255, 128))
+    return tile.rotate(30, expand=True)
+
+
+def measure(function, tile, positions):
+    """Returns the best time in ms of building the overlay with the given function"""
+    best = None
+    for _ in range(REPEATS):
+        overlay = Image.new("RGBA", CANVAS_SIZE, (255, 255, 255, 0))
+        start = time.perf_counter()
+        function(overlay, tile, positions)
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best, overlay
+
+
+def main():
+    print(f"{'pattern':>8} {'tiles':>7} {'one by one':>12} {'strips':>10} {'speedup':>8}")
+    for pattern in (CHECKER_PATTERN, ROMB_PATTERN):
+        for width in TILE_WIDTHS:
+            tile = make_tile(width)
+            gap_x, gap_y = tile_gap(5, tile.width), tile_gap(5, tile.height)
+            positions = tile_positions(pattern, CANVAS_SIZE, tile.size, gap_x, gap_y,
+                                       number_of_repetitions(CANVAS_SIZE[0], gap_x, tile.width),
+                                       number_of_repetitions(CANVAS_SIZE[1], gap_y, tile.height))
+            loop_ms, loop_overlay = measure(paste_tiles_one_by_one, tile, positions)
+            strips_ms, strips_overlay = measure(paste_tiles, tile, positions)
+            assert loop_overlay.tobytes() == strips_overlay.tobytes(), "Overlays are not identical"
+            print(f"{pattern:>8} {len(positions):>7} {loop_ms:>10.1f}ms {strips_ms:>8.1f}ms {loop_ms / strips_ms:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+# Benchmark of the time to the first preview of a large JPEG. Run it from the project directory:
+#
+#     python -m benchmarks.preview_decode_benchmark
+#
+# The preview is measured decoded at full resolution and resized to the preview label, the way the widgets got it
+# before, and with image_cache.get_scaled, which decodes the JPEG directly at 1/2, 1/4 or 1/8 of its size (draft mode).
+# Test images are generated into a temporary directory
+import os
+import tempfile
+import time
+from PIL import Image, ImageDraw
+from image_cache import DecodedImageCache
+from tile_layout import preview_scale, scale_size
+
+IMAGE_SIZES = ((4000, 3000), (6000, 4000), (8660, 5773))
+PREVIEW_SIZE = (882, 547)
+REPEATS = 3
+
+
+def make_jpeg(directory, size):
+    """Saves JPEG with some detail in it and returns its path"""
+    image = Image.new("RGB", size, (40, 90, 160))
+    draw = ImageDraw.Draw(image)
+    for x in range(0, size[0], 97):
+        draw.line((x, 0, size[0] - x, size[1]), fill=(230, 200, 60), width=9)
+    path = os.path.join(directory, f"{size[0]}x{size[1]}.jpg")
+    image.save(path, quality=90)
+    return path
+
+
+def full_decode_preview(path):
+    """Returns the preview decoded from the full resolution image"""
+    image = Image.open(path).convert("RGBA")
+    return image.resize(scale_size(image.size, preview_scale(image.size, PREVIEW_SIZE)), Image.BILINEAR,
+                        reducing_gap=2.0)
+
+
+def draft_preview(path):
+    """Returns the preview decoded by the empty image cache"""
+    cache = DecodedImageCache()
+    image_size = cache.image_size(path)
+    return cache.get_scaled(path, scale_size(image_size, preview_scale(image_size, PREVIEW_SIZE)))
+
+
+def measure(function, path):
+    """Returns the best time in ms of getting the preview with the given function"""
+    best = None
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        function(path)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1000
+
+
+def main():
+    print(f"Time to first preview at {PREVIEW_SIZE[0]}x{PREVIEW_SIZE[1]}")
+    print(f"{'image':>12} {'full decode ms':>15} {'draft ms':>10} {'speedup':>8}")
+    with tempfile.TemporaryDirectory() as directory:
+        for size in IMAGE_SIZES:
+            path = make_jpeg(directory, size)
+            full_time = measure(full_decode_preview, path)
+            draft_time = measure(draft_preview, path)
+            print(f"{size[0]}x{size[1]:<7} {full_time:>15.1f} {draft_time:>10.1f} {full_time / draft_time:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+# Benchmark of the full resolution render of the text and the logo watermark over a matrix of inputs. Run it from the
+# project directory:
+#
+#     python -m benchmarks.render_matrix_benchmark [--megapixels MP ...] [--output results.json]
+#     python -m benchmarks.render_matrix_benchmark --compare base.json new.json
+#
+# Every case of the matrix (pipeline x image megapixels x tile pattern x size x rotation x spacing) is rendered the way
+# the image is rendered on save: the generated RGB image is converted to RGBA, the pattern of the watermark is built
+# by the stages of its layer render graph (see watermark_renderer.text_layer_graph and logo_layer_graph) and
+# composited over the image. Images and the logo are generated, no files are needed. Every case runs in its own
+# process, REPEATS times with a new render graph, and the best time of every stage is reported together with the peak
+# RSS above the RSS of the process before the image was generated and the buffer_pool high-water mark.
+# With --output the results are written as JSON together with the commit and the versions they were measured with, and
+# --compare prints the time and memory of every case of two such files side by side, so commits can be compared
+import argparse
+import itertools
+import json
+import math
+import platform
+import resource
+import subprocess
+import sys
+import time
+from multiprocessing import get_context
+from PIL import Image, ImageDraw
+import PIL
+from buffer_pool import buffer_pool
+from font_catalog import font_catalog
+from overlay_builder import composite_patterns
+from watermark_renderer import LAYER_GRAPHS
+
+PIPELINES = ("text", "logo")
+MEGAPIXELS = (1, 12, 50, 100)
+PATTERNS = (1, 4, 5)
+SIZES = (5, 20)
+ROTATIONS = (0, 45)
+SPACINGS = (0, 20)
+REPEATS = 3
+# Images are 3:2 like the photos of most cameras
+ASPECT_RATIO = 3 / 2
+LOGO_SIZE = (800, 400)
+RESULTS_VERSION = 1
+# Fields that identify the case in the results, cases of two results files are matched by them
+CASE_FIELDS = ("pipeline", "megapixels", "tile", "size", "rotation", "spacing")
+
+
+def image_size(megapixels):
+    """Returns the (width, height) of the image with the given number of megapixels"""
+    height = round(math.sqrt(megapixels * 1e6 / ASPECT_RATIO))
+    return round(height * ASPECT_RATIO), height
+
+
+def make_image(size):
+    """Returns RGB image of the size with a gradient and some noise, the way a photo isn't one flat color"""
+    gradient = Image.linear_gradient("L").resize(size)
+    noise = Image.effect_noise((256, 256), 40).resize(size, Image.NEAREST)
+    return Image.merge("RGB", (gradient, gradient.transpose(Image.FLIP_LEFT_RIGHT), noise))
+
+
+def make_logo():
+    """Returns half transparent elliptic logo"""
+    logo = Image.new("RGBA", LOGO_SIZE, (0, 0, 0, 0))
+    ImageDraw.Draw(logo).ellipse((0, 0, LOGO_SIZE[0] - 1, LOGO_SIZE[1] - 1), fill=(20, 90, 200, 200))
+    return logo
+
+
+def case_settings(case):
+    """Returns the settings of the watermark of the case"""
+    settings = {"size": case["size"], "opacity": 160, "rotation": case["rotation"], "spacing_x": case["spacing"],
+                "spacing_y": case["spacing"], "tile": case["tile"]}
+    if case["pipeline"] == "text":
+        settings.update({"font": font_catalog.path("Roboto-Bold"), "text": "Your Text", "color": (255, 255, 255)})
+    else:
+        settings["logo"] = make_logo()
+    return settings
+
+
+def run_case(case, repeats):
+    """Runs in a new process. Renders the case repeats times and returns the dictionary with the best ms of every
+    stage, the best total ms, peak RSS in MB and the buffer_pool high-water mark in MB"""
+    base_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    image = make_image(image_size(case["megapixels"]))
+    settings = case_settings(case)
+    make_graph, graph_values = LAYER_GRAPHS[case["pipeline"]]
+
+    stages = {}
+    totals = []
+    for _ in range(repeats):
+        timings = {}
+        start = time.perf_counter()
+        canvas = image.convert("RGBA")
+        timings["source"] = time.perf_counter() - start
+
+        # New graph every time, so every stage is computed
+        graph = make_graph()
+        pattern = graph.run(graph_values(settings, canvas.size))
+        timings.update(graph.last_timings)
+
+        start = time.perf_counter()
+        output = composite_patterns(canvas, [pattern])
+        timings["composite"] = time.perf_counter() - start
+
+        buffer_pool.release(output)
+        del canvas, output
+        totals.append(sum(timings.values()))
+        for name, seconds in timings.items():
+            stages[name] = min(stages.get(name, seconds), seconds)
+
+    return {
+        "stages_ms": {name: round(seconds * 1000, 3) for name, seconds in stages.items()},
+        "total_ms": round(min(totals) * 1000, 3),
+        "peak_rss_mb": round((resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - base_rss) / 1024, 1),
+        "buffer_high_water_mb": round(buffer_pool.high_water_bytes / 1024 / 1024, 1),
+    }
+
+
+def environment():
+    """Returns the commit and the versions the results are measured with"""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {"commit": commit, "python": platform.python_version(), "pillow": PIL.__version__,
+            "platform": platform.platform(), "processor": platform.machine()}
+
+
+def case_key(case):
+    """Returns the tuple identifying the case"""
+    return tuple(case[field] for field in CASE_FIELDS)
+
+
+def run_matrix(args):
+    """Runs all the cases of the matrix given by args, prints them as they finish and returns the results"""
+    cases = [dict(zip(CASE_FIELDS, values)) for values in itertools.product(
+        args.pipelines, args.megapixels, args.patterns, args.sizes, args.rotations, args.spacings)]
+    results = {"version": RESULTS_VERSION, "environment": environment(), "repeats": args.repeats, "cases": []}
+
+    print(f"{'pipeline':>8} {'MP':>4} {'tile':>4} {'size':>4} {'rot':>4} {'space':>5} {'total ms':>9} "
+          f"{'peak MB':>8}  stages ms")
+    context = get_context("spawn")
+    for case in cases:
+        # New process for each case, ru_maxrss only grows
+        with context.Pool(1) as pool:
+            measurement = pool.apply(run_case, (case, args.repeats))
+        results["cases"].append({**case, **measurement})
+        stages = " ".join(f"{name} {ms:.1f}" for name, ms in measurement["stages_ms"].items())
+        print(f"{case['pipeline']:>8} {case['megapixels']:>4g} {case['tile']:>4} {case['size']:>4} "
+              f"{case['rotation']:>4} {case['spacing']:>5} {measurement['total_ms']:>9.1f} "
+              f"{measurement['peak_rss_mb']:>8.0f}  {stages}")
+    return results
+
+
+def compare(base_path, new_path):
+    """Prints total time and peak RSS of every case found in both results files"""
+    with open(base_path) as base_file, open(new_path) as new_file:
+        base, new = json.load(base_file), json.load(new_file)
+    print(f"base {base['environment']['commit']}, new {new['environment']['commit']}")
+    base_cases = {case_key(case): case for case in base["cases"]}
+
+    print(f"{'pipeline':>8} {'MP':>4} {'tile':>4} {'size':>4} {'rot':>4} {'space':>5} {'base ms':>9} {'new ms':>9} "
+          f"{'ratio':>6} {'base MB':>8} {'new MB':>8}")
+    ratios = []
+    for case in new["cases"]:
+        base_case = base_cases.get(case_key(case))
+        if base_case is None:
+            continue
+        ratio = case["total_ms"] / base_case["total_ms"]
+        ratios.append(ratio)
+        print(f"{case['pipeline']:>8} {case['megapixels']:>4g} {case['tile']:>4} {case['size']:>4} "
+              f"{case['rotation']:>4} {case['spacing']:>5} {base_case['total_ms']:>9.1f} {case['total_ms']:>9.1f} "
+              f"{ratio:>6.2f} {base_case['peak_rss_mb']:>8.0f} {case['peak_rss_mb']:>8.0f}")
+    if ratios:
+        # Geometric mean, so a case twice as fast and a case twice as slow cancel out
+        print(f"geometric mean of the time ratios over {len(ratios)} cases: "
+              f"{math.exp(sum(math.log(ratio) for ratio in ratios) / len(ratios)):.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Full resolution render over a matrix of inputs")
+    parser.add_argument("--pipelines", nargs="+", choices=PIPELINES, default=PIPELINES)
+    parser.add_argument("--megapixels", nargs="+", type=float, default=MEGAPIXELS)
+    parser.add_argument("--patterns", nargs="+", type=int, choices=PATTERNS, default=PATTERNS)
+    parser.add_argument("--sizes", nargs="+", type=int, default=SIZES, help="size slider values")
+    parser.add_argument("--rotations", nargs="+", type=int, default=ROTATIONS)
+    parser.add_argument("--spacings", nargs="+", type=int, default=SPACINGS, help="spacing slider values")
+    parser.add_argument("--repeats", type=int, default=REPEATS, help="renders of every case (default: %(default)s)")
+    parser.add_argument("--output", help="write the results as JSON into this file")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "NEW"), help="compare two results files")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return 0
+
+    results = run_matrix(args)
+    if args.output:
+        with open(args.output, "w") as results_file:
+            json.dump(results, results_file, indent=1)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+# Benchmark of the time from starting the program to the first paint of the main window. Run it from the project
+# directory:
+#
+#     python -m benchmarks.startup_benchmark [--runs N] [--max-ms MS]
+#
+# Every run starts a new Python process, so imports are measured cold the way the user starts the program. The time is
+# measured from just before the process is started to the end of the first paint event of MainWindow. The lazy run is
+# the program as it is, the eager run imports TextWidget and LogoWidget (and with them PIL, the colors and the fonts)
+# before creating the window, the way main_window did before. With --max-ms the benchmark exits with status 1 if the
+# best lazy time is above MS, so cold start regressions can be caught by a script. The window is drawn by the offscreen
+# Qt platform unless QT_QPA_PLATFORM is set
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+RUNS = 5
+# Modules whose presence at the first paint is reported
+LAZY_MODULES = ("PIL", "color_palette", "font_catalog", "add_text_properties", "add_logo_properties")
+
+
+def child(eager):
+    """Runs in the started process. Shows MainWindow and prints the monotonic time of the end of its first paint
+    followed by the LAZY_MODULES that were loaded by then"""
+    from PyQt5.QtCore import QObject, QEvent, QTimer
+    from PyQt5.QtWidgets import QApplication
+    if eager:
+        import add_text_properties
+        import add_logo_properties
+    from main_window import MainWindow
+
+    class FirstPaintFilter(QObject):
+        """Calls report right after the first paint event of the window has been handled"""
+
+        def __init__(self):
+            super().__init__()
+            self.painted = False
+
+        def eventFilter(self, watched, event):
+            if event.type() == QEvent.Paint and not self.painted:
+                self.painted = True
+                QTimer.singleShot(0, report)
+            return False
+
+    def report():
+        loaded = [name for name in LAZY_MODULES if name in sys.modules]
+        print(time.monotonic(), " ".join(loaded))
+        app.quit()
+
+    app = QApplication(sys.argv)
+    window = MainWindow()
+    paint_filter = FirstPaintFilter()
+    window.installEventFilter(paint_filter)
+    window.show()
+    app.exec_()
+
+
+def measure(eager):
+    """Starts the program in a new process. Returns (ms to the first paint, list of LAZY_MODULES loaded by then)"""
+    environment = {"QT_QPA_PLATFORM": "offscreen", **os.environ}
+    command = [sys.executable, "-m", "benchmarks.startup_benchmark", "--child"] + (["--eager"] if eager else [])
+    start = time.monotonic()
+    output = subprocess.run(command, env=environment, capture_output=True, text=True, check=True).stdout
+    painted_at, *loaded = output.split()
+    return (float(painted_at) - start) * 1000, loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time to the first paint of the main window")
+    parser.add_argument("--runs", type=int, default=RUNS, help="number of runs of each mode (default: %(default)s)")
+    parser.add_argument("--max-ms", type=float, help="exit with status 1 if the best lazy time is above this")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--eager", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.eager)
+        return 0
+
+    print(f"{'mode':>6} {'best ms':>8} {'median ms':>10}  loaded at first paint")
+    best_lazy_time = None
+    for eager in (False, True):
+        times = []
+        for _ in range(args.runs):
+            elapsed, loaded = measure(eager)
+            times.append(elapsed)
+        mode = "eager" if eager else "lazy"
+        print(f"{mode:>6} {min(times):>8.1f} {statistics.median(times):>10.1f}  {' '.join(loaded) or '-'}")
+        if not eager:
+            best_lazy_time = min(times)
+
+    if args.max_ms is not None and best_lazy_time > args.max_ms:
+        print(f"Time to first paint {best_lazy_time:.1f} ms is above {args.max_ms:g} ms", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,83 @@
+# Benchmark of peak memory of the streaming render compared to the full resolution render. Run it from the project
+# directory:
+#
+#     python -m benchmarks.streaming_benchmark
+#
+# Uncompressed RGB TIFF scans are generated into a temporary directory (they take 3 bytes per pixel on disk). The full
+# render decodes the scan, watermarks it with watermark_renderer.watermark_image and saves it, the streaming render
+# goes through streaming_renderer.render_streaming. Every measurement runs in its own process and peak RSS is reported
+# above the RSS of the process before the render
+import os
+import resource
+import tempfile
+import time
+from multiprocessing import get_context
+from PIL import Image, ImageDraw
+from streaming_renderer import TiffStripWriter, render_streaming, unlimited_image_pixels
+from tile_layout import ROMB_PATTERN
+from watermark_renderer import watermark_image
+from font_catalog import font_catalog
+
+IMAGE_SIZES = ((8000, 6000), (12000, 8000), (16000, 12000))
+GENERATOR_STRIP_ROWS = 256
+
+
+def make_scan(directory, size):
+    """Writes the uncompressed TIFF scan strip by strip, so the benchmark itself doesn't need the memory for it"""
+    path = os.path.join(directory, f"{size[0]}x{size[1]}.tif")
+    with TiffStripWriter(path, size, "RGB", GENERATOR_STRIP_ROWS) as writer:
+        for top in range(0, size[1], GENERATOR_STRIP_ROWS):
+            strip = Image.new("RGB", (size[0], min(GENERATOR_STRIP_ROWS, size[1] - top)), (90, 110, 130))
+            ImageDraw.Draw(strip).line((0, 0, size[0], strip.height), fill=(200, 180, 40), width=25)
+            writer.write(strip)
+    return path
+
+
+def text_settings():
+    """Returns settings of the romb text watermark"""
+    font = font_catalog.path("Roboto-Bold")
+    return {"font": font, "text": "Proof", "color": (255, 255, 255), "size": 30, "opacity": 128, "rotation": 30,
+            "spacing_x": 1, "spacing_y": 1, "tile": ROMB_PATTERN}
+
+
+def render_full(input_path, output_path):
+    """Watermarks the scan the way the batch command does it, with the whole image in memory"""
+    with unlimited_image_pixels(), Image.open(input_path) as image:
+        watermarked_image = watermark_image(image.convert("RGBA"), text_settings(), in_place=True)
+    watermarked_image.convert("RGB").save(output_path)
+
+
+def render_stream(input_path, output_path):
+    """Watermarks the scan strip by strip"""
+    render_streaming(input_path, output_path, text_settings())
+
+
+def measure(render_name, input_path, output_path):
+    """Runs in a new process. Returns (seconds, peak RSS in MB above the RSS before the render)"""
+    render = render_full if render_name == "full" else render_stream
+    base_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    render(input_path, output_path)
+    elapsed = time.perf_counter() - start
+    return elapsed, (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - base_rss) / 1024
+
+
+def main():
+    print(f"{'image':>12} {'MP':>5} {'render':>7} {'s':>7} {'peak RSS MB':>12}")
+    context = get_context("spawn")
+    with tempfile.TemporaryDirectory() as directory:
+        for size in IMAGE_SIZES:
+            input_path = make_scan(directory, size)
+            for render_name in ("full", "stream"):
+                output_path = os.path.join(directory, f"{render_name}.tif")
+                # New process for each measurement, ru_maxrss only grows
+                with context.Pool(1) as pool:
+                    seconds, peak_rss = pool.apply(measure, (render_name, input_path, output_path))
+                os.remove(output_path)
+                print(f"{size[0]}x{size[1]:<6} {size[0] * size[1] / 1e6:>5.0f} {render_name:>7} {seconds:>7.1f} "
+                      f"{peak_rss:>12.0f}")
+            os.remove(input_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+import threading
+import weakref
+from PIL import Image
+
+# Default memory budget of the free buffers kept in the pool in bytes. Preview buffers of a few MP fit many times, but
+# only one or two full resolution buffers of a big photo
+DEFAULT_BYTE_BUDGET = 256 * 1024 * 1024
+
+
+class BufferPool:
+    """Pool of the images the renders draw into, so that every slider move doesn't allocate a new image of the same size
+    as the previous render. Buffers are keyed by (mode, size). checkout returns a free buffer of that mode and size
+    cleared in place, or a new image if there is none, and release gives it back once it is no longer used. The least
+    recently released free buffers are dropped once the free buffers take more than byte_budget.
+    high_water_bytes is the most memory the buffers of the pool took at once, checked out and free together"""
+
+    def __init__(self, byte_budget=DEFAULT_BYTE_BUDGET):
+        self.byte_budget = byte_budget
+        # Free buffers in order of release. The least recently released buffer is always the first one
+        self.free_buffers = []
+        self.free_bytes = 0
+        # Buffers that are checked out, by their id. The buffer that is dropped without being released simply stops
+        # counting
+        self.checked_out = weakref.WeakValueDictionary()
+        self.high_water_bytes = 0
+        self.checkouts = 0
+        self.reuses = 0
+        self.lock = threading.Lock()
+
+    def checkout(self, mode, size, color=0):
+        """Returns the buffer of the given mode and size filled with color. If color is None the content of the buffer
+        is undefined and the caller has to overwrite all of it"""
+        size = tuple(size)
+        with self.lock:
+            self.checkouts += 1
+            buffer = None
+            # Search from the most recently released buffer, it is the most likely to be still in the CPU cache
+            for index in range(len(self.free_buffers) - 1, -1, -1):
+                if self.free_buffers[index].mode == mode and self.free_buffers[index].size == size:
+                    buffer = self.free_buffers.pop(index)
+                    self.free_bytes -= self.buffer_bytes(buffer)
+                    self.reuses += 1
+                    break
+
+        if buffer is None:
+            buffer = Image.new(mode, size, color)
+        elif color is not None:
+            # Clear the buffer in place instead of allocating new one
+            buffer.paste(color, (0, 0) + size)
+
+        with self.lock:
+            self.checked_out[id(buffer)] = buffer
+            self.high_water_bytes = max(self.high_water_bytes, self.used_bytes())
+        return buffer
+
+    def checkout_copy(self, image):
+        """Returns the buffer with the copy of the image"""
+        buffer = self.checkout(image.mode, image.size, None)
+        buffer.paste(image, (0, 0))
+        return buffer
+
+    def release(self, buffer):
+        """Gives the buffer back to the pool, it must not be used by the caller any more. None and the images that
+        weren't checked out from the pool are ignored, so the caller can release any image it got from the render.
+        Returns True if the buffer was returned to the pool"""
+        with self.lock:
+            if buffer is None or self.checked_out.get(id(buffer)) is not buffer:
+                return False
+            del self.checked_out[id(buffer)]
+            self.free_buffers.append(buffer)
+            self.free_bytes += self.buffer_bytes(buffer)
+            self.evict()
+            return True
+
+    def evict(self):
+        """Drops the least recently released free buffers until they fit into byte_budget"""
+        while self.free_bytes > self.byte_budget and self.free_buffers:
+            self.free_bytes -= self.buffer_bytes(self.free_buffers.pop(0))
+
+    def clear(self):
+        """Drops all the free buffers. Checked out buffers stay with their users"""
+        with self.lock:
+            self.free_buffers = []
+            self.free_bytes = 0
+
+    def used_bytes(self):
+        """Returns the number of bytes taken by the free and the checked out buffers"""
+        return self.free_bytes + sum(self.buffer_bytes(buffer) for buffer in self.checked_out.values())
+
+    def report(self):
+        """Returns one line summary of the pool with its high-water mark"""
+        with self.lock:
+            return (f"render buffers: high-water mark {self.high_water_bytes / 1024 / 1024:.1f} MB, "
+                    f"{len(self.checked_out)} checked out, {len(self.free_buffers)} free "
+                    f"({self.free_bytes / 1024 / 1024:.1f} MB), {self.reuses} of {self.checkouts} checkouts reused")
+
+    @staticmethod
+    def buffer_bytes(buffer):
+        """Returns the approximate number of bytes the buffer takes in memory"""
+        return buffer.width * buffer.height * len(buffer.getbands())
+
+
+# Shared pool used by overlay_builder and the widgets
+buffer_pool = BufferPool()
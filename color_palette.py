@@ -1,6 +1,98 @@
-from colordict import ColorDict
+import os
+import textwrap
+from collections.abc import Mapping
+from color_table import COLOR_NAMES, COLOR_VALUES
 
-# Creating dictionary of colors where key is name of color and value is hex, rgb values
-colors = ColorDict()
+# Colors are shipped as the generated color_table module, so the program doesn't build colordict's ColorDict every time
+# it starts. Run 'python -m color_palette' to generate color_table again from the installed colordict
+COLOR_TABLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "color_table.py")
+# Bytes per color in COLOR_VALUES: red, green, blue and alpha
+COLOR_BYTES = 4
 
 
+class ColorTable(Mapping):
+    """Frozen mapping from the color name to its (red, green, blue) tuple of ints. All the values are kept in one bytes
+    object, COLOR_BYTES bytes per color in the order of the names, and the names map to their index"""
+
+    def __init__(self, names, values):
+        if len(values) != len(names) * COLOR_BYTES:
+            raise ValueError(f"Color table has {len(names)} names but {len(values) // COLOR_BYTES} values")
+        self.names = tuple(names)
+        self.values = bytes(values)
+        self.indexes = {name: index * COLOR_BYTES for index, name in enumerate(self.names)}
+
+    def __getitem__(self, name):
+        offset = self.indexes[name]
+        return tuple(self.values[offset:offset + 3])
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self.indexes
+
+    def rgba(self, name):
+        """Returns (red, green, blue, alpha) tuple of the color"""
+        offset = self.indexes[name]
+        return tuple(self.values[offset:offset + COLOR_BYTES])
+
+
+# Dictionary of colors where key is name of color and value is its rgb values
+colors = ColorTable(COLOR_NAMES, COLOR_VALUES)
+
+
+def parse_color(color):
+    """Returns the color as (red, green, blue) tuple of ints. color is either the name of the color as shown in
+    TextWidget color combobox (e.g. 'white'), hex string ('#ff8000' or '#f80') or a list of red, green and blue values
+    from 0 to 255. Raises ValueError if it is none of them"""
+    if isinstance(color, str):
+        if color in colors:
+            return colors[color]
+        hex_digits = color[1:] if color.startswith("#") else ""
+        if len(hex_digits) == 3:
+            hex_digits = "".join(digit * 2 for digit in hex_digits)
+        if len(hex_digits) == 6:
+            try:
+                return tuple(bytes.fromhex(hex_digits))
+            except ValueError:
+                pass
+        raise ValueError(f"Unknown color {color!r}, use the name of the color, '#rrggbb' or [red, green, blue]")
+
+    if (isinstance(color, (list, tuple)) and len(color) == 3
+            and all(isinstance(value, int) and not isinstance(value, bool) and 0 <= value <= 255 for value in color)):
+        return tuple(color)
+    raise ValueError(f"Color must be the name of the color, '#rrggbb' or [red, green, blue] from 0 to 255, "
+                     f"got {color!r}")
+
+
+def color_to_hex(color):
+    """Returns the '#rrggbb' string of the (red, green, blue) color"""
+    return "#" + bytes(color[:3]).hex()
+
+
+def write_color_table(path=COLOR_TABLE_PATH):
+    """Generates the color_table module from colordict's ColorDict. colordict is only needed for this"""
+    from colordict import ColorDict
+    # Items of ColorDict are (name, (red, green, blue, alpha)) with float values
+    items = list(ColorDict().items())
+    names = [name for name, _ in items]
+    values = bytes(round(value) for _, rgba in items for value in rgba)
+    with open(path, "w") as table_file:
+        table_file.write("# Generated by 'python -m color_palette' from colordict's ColorDict, do not edit. "
+                         "COLOR_VALUES has red, green,\n# blue and alpha of every color in the order of COLOR_NAMES\n")
+        table_file.write("COLOR_NAMES = (\n")
+        for line in textwrap.wrap(" ".join(repr(name) + "," for name in names), 112, break_on_hyphens=False,
+                                  break_long_words=False):
+            table_file.write(f"    {line}\n")
+        table_file.write(")\n")
+        table_file.write("COLOR_VALUES = bytes.fromhex(\n")
+        for line in textwrap.wrap(values.hex(), 108):
+            table_file.write(f'    "{line}"\n')
+        table_file.write(")\n")
+
+
+if __name__ == "__main__":
+    write_color_table()
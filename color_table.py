@@ -0,0 +1,67 @@
+# Generated by 'python -m color_palette' from colordict's ColorDict, do not edit. COLOR_VALUES has red, green,
+# blue and alpha of every color in the order of COLOR_NAMES
+COLOR_NAMES = (
+    'alloyorange', "b'dazzledblue", "bigdipo'ruby", 'bittersweetshimmer', 'blastoffbronze', 'cybergrape',
+    'deepspacesparkle', 'goldfusion', 'illuminatingemerald', 'metallicseaweed', 'metallicsunburst', 'razzmicberry',
+    'sheengreen', 'shimmeringblush', 'sonicsilver', 'night', 'poison', 'antiqueruby', 'eaglegreen', 'copper',
+    'keylime', 'lichen', 'iris', 'brazil', 'colombia', 'argentina', 'palau', 'vanuatu', 'solomon', 'usa', 'bahamas',
+    'panama', 'ireland', 'belgium', 'latvia', 'india', 'macau', 'china', 'southafrica', 'madagascar', 'seychelles',
+    'aztecgold', 'burnishedbrown', 'ceruleanfrost', 'cinnamonsatin', 'copperpenny', 'cosmiccobalt', 'glossygrape',
+    'granitegray', 'greensheen', 'lilacluster', 'mistymoss', 'mysticmaroon', 'pearlypurple', 'pewterblue',
+    'polishedpine', 'quicksilver', 'rosedust', 'rustyred', 'shadowblue', 'shinyshamrock', 'steelteal', 'sugarplum',
+    'twilightlavender', 'wintergreendream', 'alienarmpit', 'bigfootfeet', 'boogerbuster', 'dingydungeon',
+    'gargoylegas', "giant'sclub", 'magicpotion', "mummy'stomb", 'ogreodor', 'pixiepowder', 'princessperfume',
+    'sasquatchsocks', 'seaserpent', 'smashedpumpkin', 'sunburntcyclops', 'winterwizard', 'babypowder', 'banana',
+    'blueberry', 'bubblegum', 'cedarchest', 'cherry', 'coconut', 'daffodil', 'dirt', 'eucalyptus', 'freshair',
+    'grape', 'jellybean', 'leatherjacket', 'lemon', 'licorice', 'lilac', 'lumber', 'newcar', 'peach', 'pine',
+    'rose', 'shampoo', 'smoke', 'soap', 'strawberry', 'tulip', 'orange', 'lime', 'chocolate', 'amethyst', 'citrine',
+    'emerald', 'jade', 'jasper', 'lapislazuli', 'malachite', 'moonstone', 'onyx', 'peridot', 'pinkpearl',
+    'rosequartz', 'ruby', 'sapphire', 'smokeytopaz', "tiger'seye", 'aliceblue', 'antiquewhite', 'aqua',
+    'aquamarine', 'azure', 'beige', 'bisque', 'black', 'blanchedalmond', 'blue', 'blueviolet', 'brown', 'burlywood',
+    'cadetblue', 'chartreuse', 'coral', 'cornflowerblue', 'cornsilk', 'crimson', 'cyan', 'darkblue', 'darkcyan',
+    'darkgoldenrod', 'darkgray', 'darkgreen', 'darkgrey', 'darkkhaki', 'darkmagenta', 'darkolivegreen',
+    'darkorange', 'darkorchid', 'darkred', 'darksalmon', 'darkseagreen', 'darkslateblue', 'darkslategray',
+    'darkslategrey', 'darkturquoise', 'darkviolet', 'deeppink', 'deepskyblue', 'dimgray', 'dimgrey', 'dodgerblue',
+    'firebrick', 'floralwhite', 'forestgreen', 'fuchsia', 'gainsboro', 'ghostwhite', 'goldenrod', 'gold', 'gray',
+    'green', 'greenyellow', 'grey', 'honeydew', 'hotpink', 'indianred', 'indigo', 'ivory', 'khaki', 'lavenderblush',
+    'lavender', 'lawngreen', 'lemonchiffon', 'lightblue', 'lightcoral', 'lightcyan', 'lightgoldenrodyellow',
+    'lightgray', 'lightgreen', 'lightgrey', 'lightpink', 'lightsalmon', 'lightseagreen', 'lightskyblue',
+    'lightslategray', 'lightslategrey', 'lightsteelblue', 'lightyellow', 'limegreen', 'linen', 'magenta', 'maroon',
+    'mediumaquamarine', 'mediumblue', 'mediumorchid', 'mediumpurple', 'mediumseagreen', 'mediumslateblue',
+    'mediumspringgreen', 'mediumturquoise', 'mediumvioletred', 'midnightblue', 'mintcream', 'mistyrose', 'moccasin',
+    'navajowhite', 'navy', 'oldlace', 'olive', 'olivedrab', 'orangered', 'orchid', 'palegoldenrod', 'palegreen',
+    'paleturquoise', 'palevioletred', 'papayawhip', 'peachpuff', 'peru', 'pink', 'plum', 'powderblue', 'purple',
+    'rebeccapurple', 'red', 'rosybrown', 'royalblue', 'saddlebrown', 'salmon', 'sandybrown', 'seagreen', 'seashell',
+    'sienna', 'silver', 'skyblue', 'slateblue', 'slategray', 'slategrey', 'snow', 'springgreen', 'steelblue', 'tan',
+    'teal', 'thistle', 'tomato', 'turquoise', 'violet', 'wheat', 'white', 'whitesmoke', 'yellow', 'yellowgreen',
+    'radicalred', 'wildwatermelon', 'outrageousorange', 'atomictangerine', 'neoncarrot', 'sunglow', 'laserlemon',
+    'electriclime', "screamin'green", 'magicmint', 'blizzardblue', 'shockingpink', 'razzledazzlerose', 'hotmagenta',
+    'sizzlingred', 'redsalsa', 'tartorange', 'orangesoda', 'brightyellow', 'yellowsunshine', 'slimygreen',
+    'greenlizard', 'denimblue', 'bluejeans', 'plumppurple', 'purpleplum', 'sweetbrown', 'brownsugar', 'eerieblack',
+    'blackshadows',
+)
+COLOR_VALUES = bytes.fromhex(
+    "c46210ff2e5894ff9c2542ffbf4f51ffa57164ff58427cff4a646cff85754eff319177ff0a7e8cff9c7c38ff8d4e85ff8fd400ffd986"
+    "95ff757575ff0b0033ff370031ff832232ff19535fffce8964ffeaf27cff71b48dff454adeff009b3afffcd116ff74acdfff0099ffff"
+    "d21034ff215b33ff3c3b6eff00778bffda121affff883efffae042ff9e3039ffff9a30ff0f7562ffde2910ff007749fffc3d32fffcd8"
+    "56ffc39953ffa17a74ff6d9bc3ffcd607effad6f69ff2e2d88ffab92b3ff676767ff6eaea1ffae98aaffbbb477ffad4379ffb768a2ff"
+    "8ba8b7ff5da493ffa6a6a6ff9e5e6fffda2c43ff778ba5ff5fa778ff5f8a8bff914e75ff8a496bff56887dff84de02ffe88e5affdde2"
+    "6affc53151ffffdf46ffb05c52ffff4466ff828e84fffd5240ff391285ffff85cfffff4681ff4bc7cfffff6d3affff404cffa0e6ffff"
+    "fefefaffffd12aff4f86f7ffffd3f8ffc95a49ffda2647fffefefeffffff31ffb76503ff44d7a8ffa6e7ffff6f2da8ffda614eff2535"
+    "29ffffff38ff1a1110ffdb91efffffe4cdff214fc6ffffd0b9ff45a27dffff5050ffffcff1ff738276ffcec8effffc5a8dffff878dff"
+    "ffa500ff00ff00ffd2691eff64609aff933709ff14a989ff469a84ffd05340ff436cb9ff469496ff3aa8c1ff353839ffabad48ffb070"
+    "80ffbd559cffaa4069ff2d5da1ff832a0dffb56917fff0f8fffffaebd7ff00ffffff7fffd4fff0fffffff5f5dcffffe4c4ff000000ff"
+    "ffebcdff0000ffff8a2be2ffa52a2affdeb887ff5f9ea0ff7fff00ffff7f50ff6495edfffff8dcffdc143cff00ffffff00008bff008b"
+    "8bffb8860bffa9a9a9ff006400ffa9a9a9ffbdb76bff8b008bff556b2fffff8c00ff9932ccff8b0000ffe9967aff8fbc8fff483d8bff"
+    "2f4f4fff2f4f4fff00ced1ff9400d3ffff1493ff00bfffff696969ff696969ff1e90ffffb22222fffffaf0ff228b22ffff00ffffdcdc"
+    "dcfff8f8ffffdaa520ffffd700ff808080ff008000ffadff2fff808080fff0fff0ffff69b4ffcd5c5cff4b0082fffffff0fff0e68cff"
+    "fff0f5ffe6e6faff7cfc00fffffacdffadd8e6fff08080ffe0fffffffafad2ffd3d3d3ff90ee90ffd3d3d3ffffb6c1ffffa07aff20b2"
+    "aaff87cefaff778899ff778899ffb0c4deffffffe0ff32cd32fffaf0e6ffff00ffff800000ff66cdaaff0000cdffba55d3ff9370dbff"
+    "3cb371ff7b68eeff00fa9aff48d1ccffc71585ff191970fff5fffaffffe4e1ffffe4b5ffffdeadff000080fffdf5e6ff808000ff6b8e"
+    "23ffff4500ffda70d6ffeee8aaff98fb98ffafeeeeffdb7093ffffefd5ffffdab9ffcd853fffffc0cbffdda0ddffb0e0e6ff800080ff"
+    "663399ffff0000ffbc8f8fff4169e1ff8b4513fffa8072fff4a460ff2e8b57fffff5eeffa0522dffc0c0c0ff87ceebff6a5acdff7080"
+    "90ff708090fffffafaff00ff7fff4682b4ffd2b48cff008080ffd8bfd8ffff6347ff40e0d0ffee82eefff5deb3fffffffffff5f5f5ff"
+    "ffff00ff9acd32ffff355efffd5b78ffff6037ffff9966ffff9933ffffcc33ffffff66ffccff00ff66ff66ffaaf0d1ff50bfe6ffff6e"
+    "ffffee34d2ffff00ccffff3855fffd3a4afffb4d46fffa5b3dffffaa1dfffff700ff299617ffa7f432ff2243b6ff5dadecff5946b2ff"
+    "9c51b6ffa83731ffaf6e4dff1b1b1bffbfafb2ff"
+)
@@ -0,0 +1,2 @@
+# Modules of the Watermarker are at the top level of the project. pytest puts the directory of this file on sys.path,
+# so the tests import them the same way main.py does, also when pytest is run without python -m
@@ -0,0 +1,120 @@
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+from PIL import Image
+
+# Default directory of the decoded images and its size limit in bytes. One 24 MP photo takes around 96 MB
+DEFAULT_CACHE_DIRECTORY = os.path.join(os.path.expanduser("~"), ".cache", "watermarker", "decoded")
+DEFAULT_MAX_BYTES = 4 * 1024 * 1024 * 1024
+
+# Cache file starts with the magic, the width and the height of the image, raw RGBA pixels follow
+CACHE_FILE_MAGIC = b"WMRGBA1\0"
+CACHE_FILE_HEADER = struct.Struct("<8sII")
+CACHE_FILE_EXTENSION = ".rgba"
+
+
+class DecodeCache:
+    """Directory of images decoded to raw RGBA files. The first get of a source decodes it and writes the pixels into
+    the cache file, every later get, in the same or in any other process, maps the file into memory instead of
+    decoding the source again. Cache files are keyed by the absolute path, size and modification time of the source.
+    Once the files take more than max_bytes, the least recently used ones are removed"""
+
+    def __init__(self, directory=DEFAULT_CACHE_DIRECTORY, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def cache_path(self, path):
+        """Returns the path of the cache file of the source at path"""
+        stat = os.stat(path)
+        key = f"{os.path.abspath(path)}\0{stat.st_size}\0{stat.st_mtime_ns}".encode("utf-8")
+        return os.path.join(self.directory, hashlib.sha1(key).hexdigest() + CACHE_FILE_EXTENSION)
+
+    def get(self, path):
+        """Returns the RGBA image of the source at path. Image mapped from the cache file is read-only and shares the
+        pages of the file with the other processes, so it must not be changed in place"""
+        cache_path = self.cache_path(path)
+        try:
+            image = self.map(cache_path)
+        except (OSError, ValueError):
+            image = None
+
+        if image is not None:
+            self.hits += 1
+            # Modification time of the cache file is the time of its last use, cleanup removes the oldest files first
+            try:
+                os.utime(cache_path)
+            except OSError:
+                # Cleanup of another process removed the file after it was mapped, the mapped pixels are still fine
+                pass
+            return image
+
+        self.misses += 1
+        with Image.open(path) as source:
+            image = source.convert("RGBA")
+        self.write(cache_path, image)
+        self.cleanup()
+        return image
+
+    @staticmethod
+    def map(cache_path):
+        """Returns the image mapped from the cache file, or None if there is no cache file. Raises ValueError if the
+        file is damaged"""
+        if not os.path.exists(cache_path):
+            return None
+        with open(cache_path, "rb") as file:
+            pixels = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, width, height = CACHE_FILE_HEADER.unpack_from(pixels)
+        if magic != CACHE_FILE_MAGIC or len(pixels) != CACHE_FILE_HEADER.size + width * height * 4:
+            raise ValueError(f"Damaged cache file {cache_path}")
+        # The image reads the pixels straight from the mapped file, the view keeps the mapping alive
+        view = memoryview(pixels)[CACHE_FILE_HEADER.size:]
+        return Image.frombuffer("RGBA", (width, height), view, "raw", "RGBA", 0, 1)
+
+    def write(self, cache_path, image):
+        """Writes the RGBA image into the cache file. The file is written under a temporary name and renamed, so the
+        other processes never map a half written file"""
+        file_descriptor, temporary_path = tempfile.mkstemp(suffix=".tmp", dir=self.directory)
+        try:
+            with os.fdopen(file_descriptor, "wb") as file:
+                file.write(CACHE_FILE_HEADER.pack(CACHE_FILE_MAGIC, image.width, image.height))
+                file.write(image.tobytes())
+            os.replace(temporary_path, cache_path)
+        except OSError:
+            # Full disk only means the image isn't cached
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+
+    def cleanup(self):
+        """Removes the least recently used cache files until all of them fit into max_bytes. Returns the number of
+        removed files"""
+        files = []
+        for filename in os.listdir(self.directory):
+            if filename.endswith(CACHE_FILE_EXTENSION):
+                try:
+                    stat = os.stat(os.path.join(self.directory, filename))
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, filename))
+
+        used_bytes = sum(size for _, size, _ in files)
+        removed = 0
+        for _, size, filename in sorted(files):
+            if used_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, filename))
+            except FileNotFoundError:
+                # Another process has already removed it
+                pass
+            except OSError:
+                # The file is still mapped on a system that doesn't allow removing it
+                continue
+            used_bytes -= size
+            removed += 1
+        return removed
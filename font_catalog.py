@@ -0,0 +1,225 @@
+import json
+import os
+import tempfile
+import threading
+
+# Fonts directory is looked up next to this file, so the fonts are found no matter from which directory the program runs
+FONTS_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Fonts")
+# Index of the fonts is kept between the runs of the program, so the font files are only parsed when they change
+DEFAULT_INDEX_PATH = os.path.join(os.path.expanduser("~"), ".cache", "watermarker", "fonts.json")
+INDEX_VERSION = 1
+
+FONT_EXTENSIONS = (".ttf", ".otf")
+
+# Weights of the style names as in the OpenType usWeightClass. Style names are compared in lower case without spaces
+STYLE_WEIGHTS = {
+    "thin": 100,
+    "extralight": 200,
+    "ultralight": 200,
+    "light": 300,
+    "regular": 400,
+    "normal": 400,
+    "book": 400,
+    "medium": 500,
+    "semibold": 600,
+    "demibold": 600,
+    "bold": 700,
+    "extrabold": 800,
+    "ultrabold": 800,
+    "black": 900,
+    "heavy": 900,
+}
+ITALIC_STYLES = ("italic", "oblique")
+DEFAULT_WEIGHT = 400
+
+
+def style_weight(style):
+    """Returns tuple (weight, italic) of the style name of the font, e.g. (800, True) for 'ExtraBold Italic'. Unknown
+    style names have the regular weight"""
+    name = style.lower().replace(" ", "").replace("-", "")
+    italic = any(italic_style in name for italic_style in ITALIC_STYLES)
+    for italic_style in ITALIC_STYLES:
+        name = name.replace(italic_style, "")
+    return STYLE_WEIGHTS.get(name, DEFAULT_WEIGHT), italic
+
+
+def read_font(path):
+    """Parses the font file and returns its catalog entry, a dictionary with the name (the filename without the
+    extension, e.g. 'Roboto-Bold'), family, style, weight, italic and path of the font. Variable fonts also have
+    weight_range, the minimum and maximum of their weight axis, and their weight is the default of that axis"""
+    # PIL is imported here, so the catalog loaded from the index doesn't need it
+    from PIL import ImageFont
+    font = ImageFont.truetype(path, 10)
+    family, style = font.getname()
+    weight, italic = style_weight(style)
+    entry = {
+        "name": os.path.splitext(os.path.basename(path))[0],
+        "family": family,
+        "style": style,
+        "weight": weight,
+        "italic": italic,
+        "path": path,
+        "variable": False,
+    }
+
+    try:
+        axes = font.get_variation_axes()
+    except OSError:
+        # Static font or FreeType without support of the variable fonts
+        axes = []
+    for axis in axes:
+        if axis["name"] in (b"Weight", "Weight"):
+            entry["variable"] = True
+            entry["weight"] = axis["default"]
+            entry["weight_range"] = [axis["minimum"], axis["maximum"]]
+    return entry
+
+
+def sort_key(entry):
+    """Orders the fonts by family, static before variable, upright before italic and from the thinnest to the boldest"""
+    return entry["family"].lower(), entry["variable"], entry["italic"], entry["weight"], entry["name"]
+
+
+class FontCatalog:
+    """Catalog of all the fonts in the fonts directory, static ones (e.g. Fonts/Roboto/static/Roboto-Bold.ttf) as well
+    as the variable ones (e.g. Fonts/Inter/Inter-VariableFont_slnt,wght.ttf). Parsed fonts are stored in the index file
+    together with the modification times of all the directories under the fonts directory. The index is used as long
+    as none of the directories changed, otherwise the fonts are parsed again and the index is rewritten. Once the
+    catalog is loaded, all the lookups are done in memory without touching the filesystem"""
+
+    def __init__(self, directory=FONTS_DIRECTORY, index_path=DEFAULT_INDEX_PATH):
+        self.directory = directory
+        self.index_path = index_path
+        self.lock = threading.Lock()
+        self.fonts = None
+        self.fonts_by_name = None
+        # True if the last load parsed the fonts instead of reading the index
+        self.rebuilt = False
+
+    def directory_mtimes(self):
+        """Returns dictionary of the modification times in ns of the fonts directory and all the directories under it,
+        keyed by their path relative to the fonts directory. Adding, removing or renaming a font changes the
+        modification time of its directory"""
+        mtimes = {}
+        for path, _, _ in os.walk(self.directory):
+            mtimes[os.path.relpath(path, self.directory)] = os.stat(path).st_mtime_ns
+        return mtimes
+
+    def font_paths(self):
+        """Returns sorted list of the paths of all the font files under the fonts directory"""
+        paths = []
+        for path, _, filenames in os.walk(self.directory):
+            paths.extend(os.path.join(path, filename) for filename in filenames
+                         if filename.lower().endswith(FONT_EXTENSIONS))
+        return sorted(paths)
+
+    def read_index(self, mtimes):
+        """Returns the fonts from the index file, or None if there is no index or it was made for different
+        directories"""
+        try:
+            with open(self.index_path, encoding="utf-8") as index_file:
+                index = json.load(index_file)
+        except (OSError, ValueError):
+            return None
+        if (not isinstance(index, dict) or index.get("version") != INDEX_VERSION
+                or index.get("directory") != self.directory or index.get("mtimes") != mtimes):
+            return None
+        return index["fonts"]
+
+    def write_index(self, mtimes, fonts):
+        """Writes the index file. The file is written under a temporary name and renamed, so the other instances of the
+        program never read a half written index"""
+        index = {"version": INDEX_VERSION, "directory": self.directory, "mtimes": mtimes, "fonts": fonts}
+        index_directory = os.path.dirname(self.index_path)
+        try:
+            os.makedirs(index_directory, exist_ok=True)
+            file_descriptor, temporary_path = tempfile.mkstemp(suffix=".tmp", dir=index_directory)
+        except OSError:
+            # Without the index the fonts are only parsed again on the next run
+            return
+        try:
+            with os.fdopen(file_descriptor, "w", encoding="utf-8") as index_file:
+                json.dump(index, index_file)
+            os.replace(temporary_path, self.index_path)
+        except OSError:
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+
+    def build(self):
+        """Parses all the font files and returns their sorted entries (see read_font). Files that can't be read as fonts
+        are skipped, and so is a font whose name was already taken by the font before it"""
+        fonts = []
+        names = set()
+        for path in self.font_paths():
+            try:
+                entry = read_font(path)
+            except OSError:
+                continue
+            if entry["name"] not in names:
+                names.add(entry["name"])
+                fonts.append(entry)
+        return sorted(fonts, key=sort_key)
+
+    def load(self):
+        """Returns the list of all the font entries. They are read from the index if the fonts directory didn't change
+        since it was written, otherwise the fonts are parsed and the index is rewritten. The entries stay loaded until
+        refresh is called"""
+        with self.lock:
+            if self.fonts is None:
+                mtimes = self.directory_mtimes() if os.path.isdir(self.directory) else {}
+                fonts = self.read_index(mtimes)
+                self.rebuilt = fonts is None
+                if fonts is None:
+                    fonts = self.build()
+                    self.write_index(mtimes, fonts)
+                self.fonts = fonts
+                self.fonts_by_name = {entry["name"]: entry for entry in fonts}
+            return self.fonts
+
+    def refresh(self):
+        """Forgets the loaded fonts, so the next lookup checks the fonts directory again"""
+        with self.lock:
+            self.fonts = None
+            self.fonts_by_name = None
+
+    def names(self):
+        """Returns the names of all the fonts in the catalog order, these are shown in the TextWidget font combobox"""
+        return [entry["name"] for entry in self.load()]
+
+    def families(self):
+        """Returns the sorted list of the font families"""
+        return sorted({entry["family"] for entry in self.load()}, key=str.lower)
+
+    def entry(self, name):
+        """Returns the entry of the font with the given name (e.g. 'Roboto-Bold'). Raises ValueError if there is no such
+        font"""
+        self.load()
+        if name not in self.fonts_by_name:
+            raise ValueError(f"Unknown font '{name}'")
+        return self.fonts_by_name[name]
+
+    def path(self, name):
+        """Returns the path of the font file of the font with the given name"""
+        return self.entry(name)["path"]
+
+    def find(self, family, weight=DEFAULT_WEIGHT, italic=False):
+        """Returns the entry of the font of the family whose weight is the closest to the given weight, preferring
+        the fonts with the same italic and then the static fonts. Variable fonts are rendered in their default weight,
+        so that is the weight they are compared by. Raises ValueError if there is no font of the family"""
+        candidates = [entry for entry in self.load() if entry["family"].lower() == family.lower()]
+        if not candidates:
+            raise ValueError(f"Unknown font family '{family}'")
+        return min(candidates, key=lambda entry: (entry["italic"] != italic, abs(entry["weight"] - weight),
+                                                  entry["variable"]))
+
+
+# Catalog of the fonts that come with the program
+font_catalog = FontCatalog()
+
+
+def resolve_font(font):
+    """Returns the path of the font. font is either the name of the font as shown in TextWidget font combobox (e.g.
+    'Roboto-Bold') or the path to a font file"""
+    if os.path.isfile(font):
+        return font
+    return font_catalog.path(font)
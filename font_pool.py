@@ -0,0 +1,56 @@
+import threading
+from collections import OrderedDict
+from PIL import ImageFont
+from render_trace import tracer
+
+# Maximum number of loaded fonts kept in the pool
+DEFAULT_MAX_FONTS = 32
+
+# Size slider values for which the default font is loaded when TextWidget opens. Text size in px is
+# round(70 * value / 10), see watermark_renderer.DEFAULT_TEXT_SIZE
+WARM_UP_SIZE_VALUES = (5, 10, 15, 20, 30)
+
+
+class FontPool:
+    """Keeps loaded ImageFont objects, so the TTF file isn't parsed again on every keystroke and every slider move.
+    Fonts are keyed by (path, size) and the least recently used font is dropped once there are more than max_fonts"""
+
+    def __init__(self, max_fonts=DEFAULT_MAX_FONTS):
+        self.max_fonts = max_fonts
+        self.fonts = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, path, size):
+        """Returns the font from path in the given size. The font file is loaded only if it isn't in the pool"""
+        key = (path, size)
+        with self.lock:
+            if key in self.fonts:
+                self.fonts.move_to_end(key)
+                return self.fonts[key]
+
+        with tracer.span("truetype", size=size):
+            font = ImageFont.truetype(path, size)
+
+        with self.lock:
+            self.fonts[key] = font
+            while len(self.fonts) > self.max_fonts:
+                self.fonts.popitem(last=False)
+        return font
+
+    def warm_up(self, path, sizes):
+        """Loads the font from path in all the given sizes"""
+        for size in sizes:
+            self.get(path, size)
+
+    def warm_up_in_background(self, path, sizes):
+        """Loads the font from path in all the given sizes on a background thread, so the caller doesn't wait for it"""
+        threading.Thread(target=self.warm_up, args=(path, sizes), daemon=True).start()
+
+    def clear(self):
+        """Removes all the fonts from the pool"""
+        with self.lock:
+            self.fonts.clear()
+
+
+# Shared pool used by watermark_renderer
+font_pool = FontPool()
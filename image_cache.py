@@ -0,0 +1,147 @@
+import os
+import threading
+from collections import OrderedDict
+from PIL import Image
+from render_trace import tracer
+
+# Default memory budget of the cache in bytes. One 40 MP photo decoded to RGBA takes around 160 MB
+DEFAULT_BYTE_BUDGET = 512 * 1024 * 1024
+
+
+class DecodedImageCache:
+    """Keeps decoded RGBA copies of opened images in memory, so that TextWidget and LogoWidget don't have to read and
+    decode the file from disk on every slider move. Entries are keyed by file path and modification time and the least
+    recently used entries are evicted once the total size of the cache goes over byte_budget. Besides the full
+    resolution images, the cache also keeps their downscaled copies used for the interactive preview. The full
+    resolution image is only decoded once a full resolution render asks for it. The cache is used from the GUI thread,
+    the render worker and the image saver, so the methods hold the lock while they look up or change the entries, but
+    the images are decoded and resized outside of it and one thread's decode doesn't block the others"""
+
+    def __init__(self, byte_budget=DEFAULT_BYTE_BUDGET):
+        self.byte_budget = byte_budget
+        # OrderedDict keeps the entries in order of use. The least recently used entry is always the first one
+        self.entries = OrderedDict()
+        self.used_bytes = 0
+        # Sizes of the images read from the headers of the files, keyed by file path and modification time
+        self.sizes = {}
+        # Events of the entries that are being decoded, keyed the same way as the entries
+        self.loading = {}
+        self.lock = threading.RLock()
+
+    def get(self, path):
+        """Returns decoded RGBA image for the given path. The file is decoded only if it isn't already in the cache or
+        if it was modified since it was cached. Returned image is shared, so it must not be changed in place"""
+        key = (path, os.path.getmtime(path), None)
+        return self.cached(key, lambda: self.decode(path))
+
+    def decode(self, path):
+        """Returns the full resolution RGBA image decoded from path"""
+        with Image.open(path) as image:
+            # The span takes the size the opened image already knows, so a disabled tracer costs nothing here
+            with tracer.span("decode", size=image.size):
+                return image.convert("RGBA")
+
+    def get_scaled(self, path, size):
+        """Returns decoded RGBA image for the given path resized to size (width, height). Scaled copies are cached as
+        well, so the preview doesn't resize the full resolution image on every slider move. JPEG files are decoded
+        directly at the reduced size (see decode_scaled), so the preview doesn't need the full resolution image at
+        all"""
+        size = tuple(size)
+        if self.image_size(path) == size:
+            return self.get(path)
+
+        key = (path, os.path.getmtime(path), size)
+        return self.cached(key, lambda: self.decode_scaled(path, size))
+
+    def cached(self, key, load):
+        """Returns the entry under key. If it isn't in the cache, it is created by load outside the lock, so a long
+        decode doesn't block the other threads using the cache. A thread asking for the entry another thread is loading
+        waits for that load instead of decoding the same image again"""
+        while True:
+            with self.lock:
+                if key in self.entries:
+                    self.entries.move_to_end(key)
+                    return self.entries[key]
+                loading = self.loading.get(key)
+                if loading is None:
+                    loading = self.loading[key] = threading.Event()
+                    # The file changed on disk, so the entries with the old modification time are stale. The entries
+                    # with the same modification time stay, they are still valid
+                    self.invalidate(key[0], keep_mtime=key[1])
+                    break
+            # Look again once the other thread is done, if its load failed this thread loads the entry itself
+            loading.wait()
+
+        try:
+            image = load()
+            self.add(key, image)
+            return image
+        finally:
+            with self.lock:
+                del self.loading[key]
+            loading.set()
+
+    def decode_scaled(self, path, size):
+        """Returns RGBA image from path resized to size. JPEG decoder can scale the image down by 2, 4 or 8 while
+        decoding it (draft mode), which is several times faster than decoding the full image and needs a fraction of
+        its memory. The image is decoded at the smallest such scale that is still bigger than size and then resized.
+        Other formats are resized from the full resolution image, which is decoded and cached by get"""
+        with Image.open(path) as image:
+            if image.format == "JPEG":
+                with tracer.span("decode", size=size):
+                    image.draft("RGB", size)
+                    decoded_image = image.convert("RGBA")
+                with tracer.span("resize", size=size):
+                    return decoded_image.resize(size, Image.BILINEAR, reducing_gap=2.0)
+        decoded_image = self.get(path)
+        with tracer.span("resize", size=size):
+            return decoded_image.resize(size, Image.BILINEAR, reducing_gap=2.0)
+
+    def image_size(self, path):
+        """Returns (width, height) of the image at path. Only the header of the file is read, so the size is known
+        before the image is decoded"""
+        key = (path, os.path.getmtime(path))
+        with self.lock:
+            size = self.sizes.get(key)
+        if size is None:
+            # The header is read outside the lock, reading it twice at the same time does no harm
+            with Image.open(path) as image:
+                size = image.size
+            with self.lock:
+                self.sizes[key] = size
+        return size
+
+    def add(self, key, image):
+        """Puts the image into the cache under the given key and evicts old entries if needed"""
+        with self.lock:
+            self.entries[key] = image
+            self.used_bytes += self.image_bytes(image)
+            self.evict()
+
+    def invalidate(self, path=None, keep_mtime=None):
+        """Removes all entries of the given path from the cache, except the ones with the modification time keep_mtime
+        if it is given. If path is None the whole cache is cleared"""
+        with self.lock:
+            for key in list(self.entries):
+                if path is None or (key[0] == path and key[1] != keep_mtime):
+                    self.used_bytes -= self.image_bytes(self.entries.pop(key))
+            for key in list(self.sizes):
+                if path is None or (key[0] == path and key[1] != keep_mtime):
+                    del self.sizes[key]
+
+    def evict(self):
+        """Removes the least recently used entries until the cache fits into byte_budget. The most recently used entry
+        is always kept, even if it is bigger than the whole budget"""
+        with self.lock:
+            while self.used_bytes > self.byte_budget and len(self.entries) > 1:
+                _, image = self.entries.popitem(last=False)
+                self.used_bytes -= self.image_bytes(image)
+
+    @staticmethod
+    def image_bytes(image):
+        """Returns the approximate number of bytes image takes in memory"""
+        return image.width * image.height * len(image.getbands())
+
+
+# Shared cache used by main_window, TextWidget and LogoWidget
+image_cache = DecodedImageCache()
@@ -0,0 +1,66 @@
+import os
+import time
+
+# Output formats by the extension of the file
+SAVE_FORMATS = {".jpg": "JPEG", ".jpeg": "JPEG", ".png": "PNG", ".webp": "WEBP"}
+# Extension given to the file that has none
+FORMAT_EXTENSIONS = {"JPEG": ".jpg", "PNG": ".png", "WEBP": ".webp"}
+DEFAULT_FORMAT = "JPEG"
+# Formats that keep the alpha channel, the images saved in them aren't converted to RGB
+ALPHA_FORMATS = {"PNG", "WEBP"}
+
+# Chroma subsampling of JPEG from the best to the smallest
+SUBSAMPLING_VALUES = ("4:4:4", "4:2:2", "4:2:0")
+# Default options are the same as PIL's defaults, so the files are the same as the ones saved before the options
+DEFAULT_ENCODE_OPTIONS = {"quality": 75, "optimize": False, "progressive": False, "subsampling": "4:2:0"}
+# WebP encoder method (0-6) used when optimize is on and off. Higher method is slower and gives smaller files
+WEBP_METHODS = {False: 4, True: 6}
+
+
+def output_format(path):
+    """Returns the PIL format name the image at path is saved in. Raises ValueError if the extension of the path isn't
+    one of SAVE_FORMATS"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in SAVE_FORMATS:
+        raise ValueError(f"Can't save {path}, supported extensions are {', '.join(SAVE_FORMATS)}")
+    return SAVE_FORMATS[extension]
+
+
+def with_extension(path, image_format=DEFAULT_FORMAT):
+    """Returns the path with the extension of image_format appended, unless it already ends with one of the supported
+    extensions"""
+    if os.path.splitext(path)[1].lower() in SAVE_FORMATS:
+        return path
+    return path + FORMAT_EXTENSIONS[image_format]
+
+
+def save_arguments(image_format, options=None):
+    """Returns keyword arguments of PIL's save for the image_format. options is a dictionary with any of the keys of
+    DEFAULT_ENCODE_OPTIONS, the missing ones are taken from it. Options a format doesn't have are left out: PNG is
+    lossless and only has optimize, WebP has no progressive mode and its lossy mode is always 4:2:0"""
+    options = {**DEFAULT_ENCODE_OPTIONS, **(options or {})}
+    if options["subsampling"] not in SUBSAMPLING_VALUES:
+        raise ValueError(f"Subsampling must be one of {', '.join(SUBSAMPLING_VALUES)}")
+
+    if image_format == "JPEG":
+        return {"quality": options["quality"], "optimize": options["optimize"],
+                "progressive": options["progressive"], "subsampling": options["subsampling"]}
+    if image_format == "PNG":
+        return {"optimize": options["optimize"]}
+    if image_format == "WEBP":
+        return {"quality": options["quality"], "method": WEBP_METHODS[bool(options["optimize"])]}
+    raise ValueError(f"Unsupported format {image_format}")
+
+
+def encode_image(image, path, options=None):
+    """Saves the image into the file at path in the format given by its extension (see SAVE_FORMATS) with the encoder
+    options (see save_arguments). The image is converted to RGB only for the formats without alpha channel. Returns
+    tuple (seconds the encoding took, size of the file in bytes)"""
+    image_format = output_format(path)
+    arguments = save_arguments(image_format, options)
+
+    start = time.perf_counter()
+    if image_format not in ALPHA_FORMATS and image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    image.save(path, image_format, **arguments)
+    return time.perf_counter() - start, os.path.getsize(path)
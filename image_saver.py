@@ -0,0 +1,152 @@
+import threading
+import time
+import traceback
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+from PyQt5.QtWidgets import QDialog, QFileDialog, QFormLayout, QSpinBox, QCheckBox, QComboBox, QDialogButtonBox
+from image_encoder import encode_image, output_format, with_extension, DEFAULT_ENCODE_OPTIONS, DEFAULT_FORMAT, \
+    SUBSAMPLING_VALUES
+from render_trace import tracer
+
+# Filters of the save dialog and the formats they stand for. The format of the chosen filter is used when the user
+# doesn't type any extension
+FILE_FILTERS = {"JPEG Files (*.jpg *.jpeg)": "JPEG", "PNG Files (*.png)": "PNG", "WebP Files (*.webp)": "WEBP"}
+
+
+class SaveRunnable(QRunnable):
+    """Runnable executed on the saver's thread pool. It renders the image and encodes it into the file"""
+
+    def __init__(self, saver, render_function, path, options):
+        super().__init__()
+        self.saver = saver
+        self.render_function = render_function
+        self.path = path
+        self.options = options
+
+    def run(self):
+        # buffer_pool loads PIL, which isn't needed before the first save
+        from buffer_pool import buffer_pool
+        image = None
+        try:
+            start = time.perf_counter()
+            with tracer.span("save_render"):
+                image = self.render_function()
+            render_seconds = time.perf_counter() - start
+            # The span takes the path the job already has, its extension tells the format
+            with tracer.span("encode", path=self.path):
+                encode_seconds, file_size = encode_image(image, self.path, self.options)
+        except Exception as error:
+            traceback.print_exc()
+            self.saver.job_finished()
+            self.saver.failed.emit(self.path, f"{type(error).__name__}: {error}")
+            return
+        finally:
+            # Give the full resolution render buffer back to the pool, the pixels are in the file now
+            buffer_pool.release(image)
+        self.saver.job_finished()
+        self.saver.saved.emit(self.path, render_seconds, encode_seconds, file_size)
+
+
+class ImageSaver(QObject):
+    """Renders the full resolution images and saves them off the GUI thread, so big files don't block the GUI. Unlike
+    the previews of the RenderScheduler, no save is ever dropped, the images are saved one after another in the order
+    they were submitted. options holds the encoder options of the last save, the save dialog starts with them"""
+
+    # Sends the path, the seconds the render and the encoding took and the size of the file in bytes
+    saved = pyqtSignal(str, float, float, int)
+    # Sends the path and the error message
+    failed = pyqtSignal(str, str)
+
+    def __init__(self):
+        super().__init__()
+        self.pool = QThreadPool()
+        self.pool.setMaxThreadCount(1)
+        self.lock = threading.Lock()
+        self.pending_jobs = 0
+        self.options = dict(DEFAULT_ENCODE_OPTIONS)
+
+    def save(self, render_function, path, options=None):
+        """Schedules render_function, which takes no arguments and returns the image, to be run on the worker thread and
+        its image to be saved at path with the encoder options (see image_encoder.save_arguments). render_function must
+        not touch any Qt widgets, so all the values it needs have to be collected before submitting"""
+        if options is not None:
+            self.options = dict(options)
+        with self.lock:
+            self.pending_jobs += 1
+        self.pool.start(SaveRunnable(self, render_function, path, dict(self.options)))
+
+    def job_finished(self):
+        """Updates the number of the jobs that aren't saved yet"""
+        with self.lock:
+            self.pending_jobs -= 1
+
+    def is_saving(self):
+        """Returns True if some image is still being saved or waits to be saved"""
+        with self.lock:
+            return self.pending_jobs > 0
+
+    def wait_for_done(self, timeout=-1):
+        """Blocks until all submitted images are saved. Returns False if timeout in milliseconds expired first"""
+        return self.pool.waitForDone(timeout)
+
+
+class SaveOptionsDialog(QDialog):
+    """Dialog with the encoder options of the image format. Only the options the format has are enabled"""
+
+    def __init__(self, parent, image_format, options):
+        super().__init__(parent)
+        self.setWindowTitle(f"{image_format} Options")
+        options = {**DEFAULT_ENCODE_OPTIONS, **options}
+
+        self.quality = QSpinBox()
+        self.quality.setRange(1, 100)
+        self.quality.setValue(options["quality"])
+        self.quality.setEnabled(image_format in ("JPEG", "WEBP"))
+
+        self.optimize = QCheckBox("Smaller file, slower save")
+        self.optimize.setChecked(options["optimize"])
+
+        self.progressive = QCheckBox("Progressive JPEG")
+        self.progressive.setChecked(options["progressive"])
+        self.progressive.setEnabled(image_format == "JPEG")
+
+        self.subsampling = QComboBox()
+        self.subsampling.addItems(SUBSAMPLING_VALUES)
+        self.subsampling.setCurrentText(options["subsampling"])
+        self.subsampling.setEnabled(image_format == "JPEG")
+
+        buttons = QDialogButtonBox(QDialogButtonBox.Save | QDialogButtonBox.Cancel)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+
+        layout = QFormLayout()
+        layout.addRow("Quality", self.quality)
+        layout.addRow("Optimize", self.optimize)
+        layout.addRow("Progressive", self.progressive)
+        layout.addRow("Chroma subsampling", self.subsampling)
+        layout.addRow(buttons)
+        self.setLayout(layout)
+
+    def options(self):
+        """Returns the chosen encoder options"""
+        return {
+            "quality": self.quality.value(),
+            "optimize": self.optimize.isChecked(),
+            "progressive": self.progressive.isChecked(),
+            "subsampling": self.subsampling.currentText(),
+        }
+
+
+def ask_save_target(parent, options):
+    """Displays the save dialog and then the encoder options of the chosen format, starting with options. If the user
+    doesn't type the extension, the one of the chosen filter is added. Returns tuple (path, options), or None if the
+    user cancelled either of the dialogs"""
+    file_name, selected_filter = QFileDialog.getSaveFileName(parent, "Save Image", filter=";;".join(FILE_FILTERS),
+                                                             options=QFileDialog.DontUseNativeDialog)
+    if not file_name:
+        return None
+
+    file_name = with_extension(file_name, FILE_FILTERS.get(selected_filter, DEFAULT_FORMAT))
+    dialog = SaveOptionsDialog(parent, output_format(file_name), options)
+    if dialog.exec_() != QDialog.Accepted:
+        return None
+    return file_name, dialog.options()
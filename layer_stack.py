@@ -0,0 +1,88 @@
+import threading
+from overlay_builder import composite_patterns
+from watermark_renderer import LAYER_GRAPHS
+
+
+class Layer:
+    """One watermark of the LayerStack. kind is "text" or "logo" and settings are the values of its widget (see
+    TextWidget.text_settings and LogoWidget.logo_settings). The layer keeps its own render graph and the pattern it
+    rendered last, which is reused as long as the layer isn't dirty"""
+
+    def __init__(self, kind, settings):
+        if kind not in LAYER_GRAPHS:
+            raise ValueError(f"Unknown layer kind '{kind}', use one of {', '.join(LAYER_GRAPHS)}")
+        self.kind = kind
+        self.settings = settings
+        make_graph, self.graph_values = LAYER_GRAPHS[kind]
+        self.graph = make_graph()
+        # True when the settings changed since the pattern was rendered
+        self.dirty = True
+        self.pattern = None
+        # (full_size, scale) the pattern was rendered for
+        self.rendered_for = None
+
+
+class LayerStack:
+    """Stack of any number of text and logo watermarks drawn over one image. The layers are drawn in the order they
+    were added, the last one on top. Widgets change the settings of their layer on the GUI thread and the stack is
+    rendered on the render worker. A render only renders the patterns of the dirty layers, through their render graphs,
+    and then composites the patterns of all the layers over the image in one pass. rendered_layers counts how many
+    times a layer pattern was rendered and last_rendered lists the ids of the layers rendered by the last render"""
+
+    def __init__(self):
+        self.layers = {}
+        self.next_layer_id = 1
+        self.rendered_layers = 0
+        self.last_rendered = []
+        self.lock = threading.Lock()
+
+    def add_layer(self, kind, settings):
+        """Adds the layer of the kind on top of the stack and returns its id"""
+        with self.lock:
+            layer_id = self.next_layer_id
+            self.next_layer_id += 1
+            self.layers[layer_id] = Layer(kind, settings)
+            return layer_id
+
+    def update_layer(self, layer_id, settings):
+        """Replaces the settings of the layer, it is rendered again by the next render"""
+        with self.lock:
+            layer = self.layers[layer_id]
+            layer.settings = settings
+            layer.dirty = True
+
+    def remove_layer(self, layer_id):
+        """Removes the layer from the stack. Removing the layer that isn't in the stack does nothing"""
+        with self.lock:
+            self.layers.pop(layer_id, None)
+
+    def layer_settings(self):
+        """Returns the list of (kind, settings) tuples of all the layers from the bottom to the top, the way
+        watermark_renderer.render_layers takes them"""
+        with self.lock:
+            return [(layer.kind, layer.settings) for layer in self.layers.values()]
+
+    def render(self, canvas, full_size, scale=1):
+        """Draws all the layers over canvas, the image of full_size scaled by scale, and returns the new image checked
+        out from buffer_pool. canvas is left unchanged. Only the dirty layers and the layers last rendered for
+        a different size are rendered again, the others reuse their patterns"""
+        # Take the layers and their settings, the widgets can change them while the stack is rendered
+        with self.lock:
+            layers = []
+            for layer_id, layer in self.layers.items():
+                layers.append((layer_id, layer, layer.settings, layer.dirty))
+
+        patterns = []
+        self.last_rendered = []
+        for layer_id, layer, settings, dirty in layers:
+            if dirty or layer.pattern is None or layer.rendered_for != (full_size, scale):
+                layer.pattern = layer.graph.run(layer.graph_values(settings, full_size, scale))
+                layer.rendered_for = (full_size, scale)
+                # Layer stays dirty if the graph raised, and also if its settings were replaced while it was rendered
+                with self.lock:
+                    if layer.settings is settings:
+                        layer.dirty = False
+                self.rendered_layers += 1
+                self.last_rendered.append(layer_id)
+            patterns.append(layer.pattern)
+        return composite_patterns(canvas, patterns)
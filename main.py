@@ -1,9 +1,21 @@
 from PyQt5 import QtWidgets
 from main_window import MainWindow
+from render_trace import tracer, TRACE_PATH_VARIABLE
+import os
 import sys
 
 if __name__ == "__main__":
+    # Render stages are traced only if the trace file is given, see render_trace
+    trace_path = os.environ.get(TRACE_PATH_VARIABLE)
+    if trace_path:
+        tracer.enable()
     app = QtWidgets.QApplication(sys.argv)
     window = MainWindow()
     window.show()
-    sys.exit(app.exec_())
+    exit_code = app.exec_()
+    if trace_path:
+        tracer.write(trace_path)
+        # Peak memory of the render buffers of the whole session, see buffer_pool
+        from buffer_pool import buffer_pool
+        print(buffer_pool.report())
+    sys.exit(exit_code)
@@ -1,10 +1,17 @@
+import os
+from functools import partial
 from PyQt5.QtWidgets import QMainWindow, QLabel, QPushButton, QWidget, QMessageBox, QGridLayout, QFileDialog
-from add_logo_properties import LogoWidget
 from PyQt5.QtGui import QPixmap, QImage
 from PyQt5.QtCore import Qt
 from image_changed_signal import ImageSignal
-from add_text_properties import TextWidget
+from image_saver import ImageSaver, ask_save_target
+from render_scheduler import RenderScheduler
+from render_trace import tracer, format_totals
+from tile_layout import preview_scale, scale_size
 
+# TextWidget, LogoWidget, the layer stack and the image cache are imported on their first use. Together they load PIL,
+# the colors and the fonts, which would otherwise all be loaded before the window is shown (see
+# benchmarks/startup_benchmark.py)
 
 class MainWindow(QMainWindow):
     # This is the signal that will be sent to logo and text widgets when we open the new photo in main_window
@@ -12,6 +19,17 @@ class MainWindow(QMainWindow):
 
     def __init__(self):
         super().__init__()
+        # Clear the decoded image cache whenever a new image is opened
+        self.image_changed.signal.connect(self.refresh_image_cache)
+        # Widgets render their images on the render_scheduler worker, and the rendered images are displayed here
+        self.render_scheduler = RenderScheduler()
+        self.render_scheduler.rendered.connect(self.update_image)
+        # Widgets save their full resolution images on the image_saver worker, the result is shown in the status bar
+        self.image_saver = ImageSaver()
+        self.image_saver.saved.connect(self.image_saved)
+        self.image_saver.failed.connect(self.image_save_failed)
+        # Watermarks of all the widgets are layers of one layer stack, which is created with the first layer
+        self.layer_stack = None
         # Initiating method that creates GUI
         self.initUi()
         # Creating file_path variable and setting it to empty string
@@ -58,17 +76,31 @@ class MainWindow(QMainWindow):
         self.file_path, _ = file_dialog.getOpenFileName(self, "Open Image", "", "Image Files (*.jpg *.jpeg *.png)")
 
         if self.file_path:
+            from image_cache import image_cache
             # Send signal when the image is open
             self.image_changed.signal.emit(self.file_path)
-            # Display image on preview label
-            pixmap = QPixmap(self.file_path)
-            self.preview.setPixmap(pixmap.scaled(self.preview.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation))
+            # Watermarks that are already there are drawn over the new image
+            if self.layer_stack is not None and self.layer_stack.layers:
+                self.render_layers()
+                return
+            # Display image on preview label. Image is decoded at the size of the label, the full resolution is decoded
+            # only when the watermarked image is saved. TextWidget and LogoWidget then read the preview from the cache
+            image_size = image_cache.image_size(self.file_path)
+            scale = preview_scale(image_size, self.preview_pixel_size())
+            self.update_image(image_cache.get_scaled(self.file_path, scale_size(image_size, scale)))
+
+    def refresh_image_cache(self, file_path):
+        """This method is called when image_changed.signal is sent. It removes previously opened images from the
+        image_cache since the widgets will from now on only work with the new image"""
+        from image_cache import image_cache
+        image_cache.invalidate()
 
     def add_text_widget(self):
         """This method instantiates TextWidget class"""
         if self.file_path != "":
+            from add_text_properties import TextWidget
             if TextWidget.instance_count < 1:
-                self.text_widget = TextWidget(self.file_path, main_window=self)
+                self.text_widget = TextWidget(main_window=self)
                 main_window_geometry = self.frameGeometry()
                 text_widget_x = main_window_geometry.x() + main_window_geometry.width()
                 text_widget_y = main_window_geometry.y()
@@ -80,8 +112,9 @@ class MainWindow(QMainWindow):
     def add_logo_widget(self):
         """This method instantiates LogoWidget class"""
         if self.file_path != "":
+            from add_logo_properties import LogoWidget
             if LogoWidget.instance_count < 1:
-                self.logo_widget = LogoWidget(self.file_path, main_window=self)
+                self.logo_widget = LogoWidget(main_window=self)
                 main_window_geometry = self.frameGeometry()
                 logo_widget_x = main_window_geometry.x() + main_window_geometry.width()
                 logo_widget_y = main_window_geometry.y()
@@ -90,12 +123,135 @@ class MainWindow(QMainWindow):
         else:
             self.no_image_dialog()
 
+    def set_layer(self, layer_id, kind, settings):
+        """Sets the settings of the watermark layer with layer_id and renders the preview with all the layers. If
+        layer_id is None a new layer of the kind ("text" or "logo") is added on top. Returns the id of the layer"""
+        if self.layer_stack is None:
+            from layer_stack import LayerStack
+            self.layer_stack = LayerStack()
+        if layer_id is None:
+            layer_id = self.layer_stack.add_layer(kind, settings)
+        else:
+            self.layer_stack.update_layer(layer_id, settings)
+        self.render_layers()
+        return layer_id
+
+    def remove_layer(self, layer_id):
+        """Removes the watermark layer with layer_id and renders the preview with the remaining layers"""
+        if self.layer_stack is not None and layer_id is not None:
+            self.layer_stack.remove_layer(layer_id)
+            self.render_layers()
+
+    def render_layers(self):
+        """Renders the preview of the image with all the watermark layers on the render_scheduler worker"""
+        if self.file_path:
+            # Values of the widgets are collected here, on the GUI thread
+            self.render_scheduler.submit(partial(self.render_preview, self.file_path, self.preview_pixel_size()))
+
+    def render_preview(self, file_path, preview_size):
+        """Returns the image from file_path with all the watermark layers, rendered at the size of the preview label.
+        It runs on the render worker, so it doesn't touch any widgets. Layers whose settings didn't change reuse their
+        patterns, see LayerStack"""
+        from image_cache import image_cache
+        image_size = image_cache.image_size(file_path)
+        scale = preview_scale(image_size, preview_size)
+        # Image is taken from the cache scaled to the preview label, the layers are drawn over its copy
+        canvas = image_cache.get_scaled(file_path, scale_size(image_size, scale))
+        return self.layer_stack.render(canvas, image_size, scale)
+
+    @staticmethod
+    def render_full_resolution(file_path, layers):
+        """Returns the image from file_path at full resolution with the watermark layers, list of (kind, settings)
+        tuples. It runs on the image_saver worker and doesn't keep anything of the full resolution render"""
+        from PIL import Image
+        from watermark_renderer import render_layers
+        # The image is decoded past image_cache, which would keep the full resolution image of a big photo in memory
+        # long after the save. The watermarks are drawn right onto it, nothing else uses it
+        with tracer.span("decode"):
+            image = Image.open(file_path).convert("RGBA")
+        return render_layers(image, layers, image.size, in_place=True)
+
+    def save_image(self, parent):
+        """Displays the save dialog over parent widget, followed by the options of the chosen format. If user doesn't
+        provide image format during the save it gets the extension of the chosen filter. The image with all the
+        watermark layers is rendered at full resolution and saved on the image_saver worker, so the GUI isn't blocked
+        by big files"""
+        target = ask_save_target(parent, self.image_saver.options)
+        if target is not None:
+            file_name, options = target
+            # Settings of the layers are collected here, on the GUI thread
+            save_job = partial(self.render_full_resolution, self.file_path, self.layer_stack.layer_settings())
+            self.image_saver.save(save_job, file_name, options)
+            self.statusBar().showMessage(f"Saving {file_name}...")
+
+    def preview_pixel_size(self):
+        """Returns the size of the preview label in device pixels. Widgets render their interactive preview at this
+        size instead of at the full resolution of the image"""
+        pixel_ratio = self.preview.devicePixelRatioF()
+        return round(self.preview.width() * pixel_ratio), round(self.preview.height() * pixel_ratio)
+
     def update_image(self, edited_image):
-        """This method updates the image in preview label. It gets image to display from TextWidget or LogoWidget"""
-        qimage = QImage(edited_image.tobytes(), edited_image.width, edited_image.height, QImage.Format_RGBA8888)
-        qpixmap = QPixmap.fromImage(qimage)
-        scaled_qpixmap = qpixmap.scaled(self.preview.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation)
-        self.preview.setPixmap(scaled_qpixmap)
+        """This method updates the image in preview label. It gets image to display from the layer stack through the
+        render_scheduler. Previews are already rendered at the size of the label, bigger images are
+        downscaled before they are handed to Qt, so only the pixels that are displayed are copied"""
+        # Images only come once PIL has already been loaded to decode them, so these imports are free
+        from PIL import Image
+        from buffer_pool import buffer_pool
+
+        # Size of the image fitted into the label in device pixels. Difference of 1 px comes from rounding of the
+        # preview size, such image is displayed as it is
+        label_width, label_height = self.preview_pixel_size()
+        fitted_size = scale_size(edited_image.size, min(label_width / edited_image.width,
+                                                        label_height / edited_image.height))
+        fits = abs(fitted_size[0] - edited_image.width) <= 1 and abs(fitted_size[1] - edited_image.height) <= 1
+
+        display_image = edited_image
+        if not fits and fitted_size[0] < edited_image.width:
+            with tracer.span("downscale"):
+                display_image = edited_image.resize(fitted_size, Image.BOX)
+
+        # QImage doesn't copy the pixels, it reads them from pixel_data, so pixel_data has to stay alive until the
+        # pixmap is created
+        with tracer.span("qpixmap"):
+            pixel_data = display_image.tobytes()
+            qimage = QImage(pixel_data, display_image.width, display_image.height, display_image.width * 4,
+                            QImage.Format_RGBA8888)
+            qpixmap = QPixmap.fromImage(qimage)
+            del qimage, pixel_data
+        # The pixmap has its own copy of the pixels, so the render buffer can be reused by the next render
+        buffer_pool.release(edited_image)
+
+        # Images smaller than the label are scaled up to fill it
+        if not fits and fitted_size[0] > display_image.width:
+            with tracer.span("qpixmap_scale"):
+                qpixmap = qpixmap.scaled(fitted_size[0], fitted_size[1], Qt.KeepAspectRatio, Qt.SmoothTransformation)
+        # Pixmap is in device pixels, so it is displayed sharp on high DPI screens
+        qpixmap.setDevicePixelRatio(self.preview.devicePixelRatioF())
+        self.preview.setPixmap(qpixmap)
+
+        # With tracing on, the status bar shows where the time of this frame went
+        if tracer.enabled:
+            self.show_frame_timings()
+
+    def show_frame_timings(self):
+        """Shows the time between submitting the last render and its end, followed by the ms of every traced stage since
+        the previous frame and the high-water mark of the render buffers, in the status bar (see render_trace)"""
+        # PIL is already loaded by the render, buffer_pool doesn't slow down the start
+        from buffer_pool import buffer_pool
+        latency = self.render_scheduler.last_latency or 0
+        self.statusBar().showMessage(f"Latency {latency:.1f} ms | {format_totals(tracer.take_totals())} | "
+                                     f"buffers {buffer_pool.high_water_bytes / 1024 / 1024:.0f} MB high-water")
+
+    def image_saved(self, path, render_seconds, encode_seconds, file_size):
+        """Shows the time the save took and the size of the saved file in the status bar"""
+        self.statusBar().showMessage(f"Saved {os.path.basename(path)}: {file_size / 1024 / 1024:.1f} MB, "
+                                     f"rendered in {render_seconds * 1000:.0f} ms, "
+                                     f"encoded in {encode_seconds * 1000:.0f} ms")
+
+    def image_save_failed(self, path, error):
+        """Informs the user that the image couldn't be saved"""
+        self.statusBar().clearMessage()
+        QMessageBox.warning(self, "Warning", f"Could not save {path}. {error}")
 
     def no_image_dialog(self):
         """This method informs the user that it needs to open an image in order to use program's functionalities"""
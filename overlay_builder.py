@@ -0,0 +1,240 @@
+from bisect import bisect_right
+from PIL import Image, ImageChops
+from buffer_pool import buffer_pool
+from render_trace import tracer
+
+# Patterns with fewer tiles than this are pasted one by one, building the strips wouldn't pay off
+MIN_TILES_FOR_STRIPS = 8
+# Number of pixels of the overlay band composited at once by composite_tiles (512 kB in RGBA). Small bands stay in the
+# CPU cache between pasting the tiles, cropping the image and compositing them
+BAND_PIXELS = 128 * 1024
+
+
+def paste_tiles_one_by_one(overlay, tile, positions):
+    """Pastes the tile onto the overlay on each of the positions (see tile_layout.tile_positions)"""
+    for position in positions:
+        overlay.paste(tile, position, mask=tile)
+
+
+def tile_mask(tile):
+    """Returns "L" image which is 255 where the tile is visible and 0 where it is fully transparent"""
+    return tile.getchannel("A").point(lambda alpha: 255 if alpha else 0)
+
+
+def masks_overlap(mask, offset_x, offset_y):
+    """Returns True if the visible pixels of mask overlap with the visible pixels of the same mask moved by
+    (offset_x, offset_y)"""
+    width, height = mask.size
+    if abs(offset_x) >= width or abs(offset_y) >= height:
+        return False
+    # Crop the part of the mask that is covered by the moved mask and the part of the moved mask that covers it
+    first = mask.crop((max(offset_x, 0), max(offset_y, 0), width + min(offset_x, 0), height + min(offset_y, 0)))
+    second = mask.crop((max(-offset_x, 0), max(-offset_y, 0), width - max(offset_x, 0), height - max(offset_y, 0)))
+    return ImageChops.multiply(first, second).getbbox() is not None
+
+
+def group_rows(positions):
+    """Groups positions by their y value. Returns the list of (y, xs) tuples in the order the rows first appear"""
+    rows = {}
+    for x, y in positions:
+        rows.setdefault(y, []).append(x)
+    return [(y, tuple(xs)) for y, xs in rows.items()]
+
+
+def rows_overlap(mask, rows):
+    """Returns True if the visible pixels of any two tiles placed on rows overlap. Overlap only depends on the
+    offset between two tiles, so each offset is checked once"""
+    checked_offsets = {}
+    checked_rows = set()
+    width, height = mask.size
+
+    for row_index, (y, xs) in enumerate(rows):
+        for other_y, other_xs in rows[row_index:]:
+            offset_y = other_y - y
+            # Rows with the same x values at the same distance overlap in the same way
+            if abs(offset_y) >= height or (xs, other_xs, offset_y) in checked_rows:
+                continue
+            checked_rows.add((xs, other_xs, offset_y))
+
+            for index, x in enumerate(xs):
+                # Within one row only the tiles after the current one are compared to it. Positions in a row are
+                # sorted, so only the tiles closer than the width of the tile are compared
+                start = index + 1 if offset_y == 0 else bisect_right(other_xs, x - width)
+                for other_x in other_xs[start:]:
+                    offset = (other_x - x, offset_y)
+                    if offset[0] >= width:
+                        break
+                    if offset not in checked_offsets:
+                        checked_offsets[offset] = masks_overlap(mask, *offset)
+                    if checked_offsets[offset]:
+                        return True
+    return False
+
+
+def min_distance(values):
+    """Returns the smallest distance between two neighbouring sorted values, or None if there is only one value"""
+    distances = [second - first for first, second in zip(values, values[1:])]
+    return min(distances) if distances else None
+
+
+class TiledOverlay:
+    """Tile pasted on a list of positions (see tile_layout.tile_positions). Instead of pasting every tile onto the
+    overlay, the tiles of one row are pasted onto a strip once, and the strip is then pasted onto the overlay for every
+    row with the same x positions. Checker pattern then needs one strip and romb pattern two. This is only exact if the
+    visible pixels of the tiles don't overlap, otherwise the tiles are pasted one by one.
+    The pattern can be pasted onto an overlay that only covers a part of the image, see paste. Rows are grouped, the
+    overlap is checked and the strips are built only once, so the pattern can be pasted band by band"""
+
+    def __init__(self, tile, positions):
+        self.tile = tile
+        self.positions = positions
+        self.rows = group_rows(positions)
+        self.one_by_one = len(positions) < MIN_TILES_FOR_STRIPS or len(self.rows) == len(positions)
+        self.strips = {}
+        self.pasted_tiles = {}
+        # Box (left, top, right, bottom) covered by all the tiles. bbox is called for every band, so it is only
+        # calculated once
+        self.extent = None
+        if positions:
+            self.extent = (min(x for x, y in positions), min(y for x, y in positions),
+                           max(x for x, y in positions) + tile.width, max(y for x, y in positions) + tile.height)
+
+        if not self.one_by_one:
+            # If the tiles are further apart than their size, the strips are simply copied. Otherwise they have to be
+            # pasted with the mask, and only if the visible pixels of the tiles don't overlap
+            row_distance = min_distance(sorted(y for y, xs in self.rows))
+            self.rows_apart = row_distance is None or row_distance >= tile.height
+            self.tiles_apart = all((min_distance(xs) or tile.width) >= tile.width for y, xs in self.rows)
+            self.mask = tile_mask(tile)
+            if not (self.rows_apart and self.tiles_apart) and rows_overlap(self.mask, self.rows):
+                self.one_by_one = True
+
+    def bbox(self, box):
+        """Returns the part of the box (left, top, right, bottom) covered by the tiles as (left, top, right, bottom),
+        or None if no tile lands in the box"""
+        if self.extent is None:
+            return None
+        left = max(self.extent[0], box[0])
+        top = max(self.extent[1], box[1])
+        right = min(self.extent[2], box[2])
+        bottom = min(self.extent[3], box[3])
+        if right <= left or bottom <= top:
+            return None
+        return left, top, right, bottom
+
+    def paste(self, overlay, origin=(0, 0)):
+        """Pastes the tiles onto the overlay, which covers the part of the image starting at origin. Only the tiles
+        that land on the overlay are pasted. Returns the number of pasted rows or tiles, 0 if nothing was pasted"""
+        tile = self.tile
+        origin_x, origin_y = origin
+
+        if self.one_by_one:
+            pasted = 0
+            for x, y in self.positions:
+                x, y = x - origin_x, y - origin_y
+                if -tile.width < x < overlay.width and -tile.height < y < overlay.height:
+                    overlay.paste(tile, (x, y), mask=tile)
+                    pasted += 1
+            return pasted
+
+        # Pasting the tile onto the empty overlay gives the same pixels no matter where it is pasted, so it is done
+        # once for every background. Where the tiles don't overlap, the overlay then only consists of these pixels and
+        # the background
+        background = overlay.getpixel((0, 0))
+        if background not in self.pasted_tiles:
+            pasted_tile = Image.new("RGBA", tile.size, background)
+            pasted_tile.paste(tile, (0, 0), mask=tile)
+            self.pasted_tiles[background] = pasted_tile
+        pasted_tile = self.pasted_tiles[background]
+
+        pasted = 0
+        for y, xs in self.rows:
+            y -= origin_y
+            if not -tile.height < y < overlay.height:
+                continue
+
+            # Strips depend on the part of the row that lands on the overlay, so they are reused by every overlay
+            # with the same horizontal position and width
+            key = (xs, background, origin_x, overlay.width)
+            if key not in self.strips:
+                # Strip is only as wide as the part of the row that lands on the overlay
+                strip_left = max(min(xs) - origin_x, 0)
+                strip_right = min(max(xs) - origin_x + tile.width, overlay.width)
+                if strip_right <= strip_left:
+                    self.strips[key] = None
+                    continue
+                strip = Image.new("RGBA", (strip_right - strip_left, tile.height), background)
+                # Mask of the strip is only needed if the strips have to be pasted with the mask
+                strip_mask = None if self.rows_apart else Image.new("L", strip.size, 0)
+                for x in xs:
+                    x -= origin_x + strip_left
+                    strip.paste(pasted_tile, (x, 0), mask=None if self.tiles_apart else self.mask)
+                    if strip_mask is not None:
+                        strip_mask.paste(self.mask, (x, 0), mask=self.mask)
+                self.strips[key] = (strip_left, strip, strip_mask)
+
+            if self.strips[key] is not None:
+                strip_left, strip, strip_mask = self.strips[key]
+                overlay.paste(strip, (strip_left, y), mask=strip_mask)
+                pasted += 1
+        return pasted
+
+
+def paste_tiles(overlay, tile, positions):
+    """Pastes the tile onto the overlay on each of the positions, with the same result as pasting the tiles one by one
+    (see TiledOverlay)"""
+    TiledOverlay(tile, positions).paste(overlay)
+
+
+def composite_pattern(image, pattern, background, origin=(0, 0), in_place=False):
+    """Composites the TiledOverlay pattern over the RGBA image and returns the result. image covers the part of the
+    pattern starting at origin, so a big image can be composited strip by strip. The result is the same as pasting the
+    tiles onto a transparent overlay of the image size filled with background and compositing the overlay over the
+    image, but the overlay is never allocated for the whole image. Only the box covered by the tiles is composited,
+    band by band, and the bands without any tile are skipped. If in_place is True the result is written into image,
+    otherwise into its copy checked out from buffer_pool. The caller can give the copy back to the pool with
+    buffer_pool.release once it is done with it"""
+    return composite_patterns(image, [(pattern, background)], origin, in_place)
+
+
+def composite_patterns(image, patterns, origin=(0, 0), in_place=False):
+    """Composites the list of (pattern, background) tuples over the RGBA image in one pass and returns the result, the
+    same as compositing them one after the other with composite_pattern, the last pattern on top. The image is copied
+    once and every band is composited with all the patterns while it is still in the CPU cache, instead of going over
+    the whole image once for every pattern"""
+    # Where the overlay is fully transparent alpha_composite leaves the image as it is, so the pixels outside of the
+    # box stay as they are
+    if in_place:
+        output = image
+    else:
+        with tracer.span("copy"):
+            output = buffer_pool.checkout_copy(image)
+    origin_x, origin_y = origin
+    image_box = (origin_x, origin_y, origin_x + image.width, origin_y + image.height)
+    boxes = [pattern.bbox(image_box) for pattern, _ in patterns]
+    boxes = [box for box in boxes if box is not None]
+    if not boxes:
+        return output
+
+    # Bands go over the box covered by the tiles of all the patterns
+    left = min(box[0] for box in boxes)
+    top = min(box[1] for box in boxes)
+    right = max(box[2] for box in boxes)
+    bottom = max(box[3] for box in boxes)
+    band_height = max(1, BAND_PIXELS // (right - left))
+    for band_top in range(top, bottom, band_height):
+        band_box = (left, band_top, right, min(band_top + band_height, bottom))
+        for pattern, background in patterns:
+            box = pattern.bbox(band_box)
+            if box is None:
+                continue
+            # Every band takes the same buffer from the pool, cleared to the background, only the last one can be
+            # lower
+            band = buffer_pool.checkout("RGBA", (box[2] - box[0], box[3] - box[1]), background)
+            with tracer.span("paste"):
+                pasted = pattern.paste(band, (box[0], box[1]))
+            if pasted:
+                with tracer.span("alpha_composite"):
+                    output.alpha_composite(band, (box[0] - origin_x, box[1] - origin_y))
+            buffer_pool.release(band)
+    return output
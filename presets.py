@@ -0,0 +1,142 @@
+import hashlib
+import json
+import os
+from color_palette import parse_color
+
+# Presets are JSON files which store the values of TextWidget and/or LogoWidget, so the watermark tuned in the GUI can
+# be loaded again or used by the batch command. Example of a preset file:
+#
+# {
+#   "version": 1,
+#   "text": {"text": "Your Text", "font": "Roboto-Regular", "color": "white", "size": 10, "opacity": 255,
+#            "rotation": 0, "spacing_x": 10, "spacing_y": 10, "tile": 1},
+#   "logo": {"path": "logo.png", "size": 10, "opacity": 255, "rotation": 0, "spacing_x": 10, "spacing_y": 10,
+#            "tile": 1}
+# }
+#
+# Both sections are optional, but at least one of them has to be present. Values that are missing are set to the
+# defaults below. Font and color are the names shown in the TextWidget comboboxes and the path of the logo is relative
+# to the preset file. Color can also be hex string ('#ff8000') or list of red, green and blue values ([255, 128, 0]).
+# Files without version (settings files of the first batch command) are read as version 1
+
+PRESET_VERSION = 1
+
+# Default values. These are the same as the default values of TextWidget and LogoWidget sliders
+DEFAULT_TEXT_PRESET = {
+    "text": "Your Text",
+    "font": "Roboto-Regular",
+    "color": "white",
+    "size": 10,
+    "opacity": 255,
+    "rotation": 0,
+    "spacing_x": 10,
+    "spacing_y": 10,
+    "tile": 1,
+}
+DEFAULT_LOGO_PRESET = {
+    "size": 10,
+    "opacity": 255,
+    "rotation": 0,
+    "spacing_x": 10,
+    "spacing_y": 10,
+    "tile": 1,
+}
+
+# Allowed ranges of the slider values, (min, max) inclusive
+VALUE_RANGES = {
+    "size": (1, 50),
+    "opacity": (0, 255),
+    "rotation": (0, 180),
+    "spacing_x": (0, 50),
+    "spacing_y": (0, 50),
+}
+TILES = (1, 4, 5)
+
+
+def validate_section(name, section):
+    """Checks the values of the 'text' or 'logo' section and raises ValueError if any of them is wrong"""
+    for key, (minimum, maximum) in VALUE_RANGES.items():
+        value = section[key]
+        # bool is a subclass of int, but true isn't a size
+        if isinstance(value, bool) or not isinstance(value, int) or not minimum <= value <= maximum:
+            raise ValueError(f"{name}.{key} must be whole number from {minimum} to {maximum}, got {value!r}")
+    # True == 1, so it would pass as one tile
+    if isinstance(section["tile"], bool) or section["tile"] not in TILES:
+        raise ValueError(f"{name}.tile must be one of {TILES}, got {section['tile']!r}")
+    if name == "text":
+        for key in ("text", "font"):
+            if not isinstance(section[key], str):
+                raise ValueError(f"text.{key} must be a string, got {section[key]!r}")
+        try:
+            parse_color(section["color"])
+        except ValueError as error:
+            raise ValueError(f"text.color: {error}")
+    if name == "logo" and not isinstance(section.get("path"), str):
+        raise ValueError("logo.path must be the path of the logo image")
+
+
+def normalize_preset(preset):
+    """Checks the version of the preset, fills in the default values and validates them. Returns the new preset. Raises
+    ValueError for anything that isn't a valid preset, also when it isn't a JSON object at all"""
+    if not isinstance(preset, dict):
+        raise ValueError("Preset must be a JSON object with 'text' and/or 'logo' section")
+    version = preset.get("version", PRESET_VERSION)
+    if version != PRESET_VERSION:
+        raise ValueError(f"Unsupported preset version {version}, this program reads version {PRESET_VERSION}")
+    if "text" not in preset and "logo" not in preset:
+        raise ValueError("Preset has neither 'text' nor 'logo' section")
+
+    normalized = {"version": PRESET_VERSION}
+    for name, defaults in (("text", DEFAULT_TEXT_PRESET), ("logo", DEFAULT_LOGO_PRESET)):
+        if name in preset:
+            if not isinstance(preset[name], dict):
+                raise ValueError(f"{name} section must be a JSON object, got {preset[name]!r}")
+            normalized[name] = {**defaults, **preset[name]}
+            validate_section(name, normalized[name])
+    return normalized
+
+
+def load_preset(path):
+    """Reads and normalizes the preset file. Path of the logo is returned relative to the current directory"""
+    with open(path) as preset_file:
+        preset = normalize_preset(json.load(preset_file))
+
+    if "logo" in preset:
+        preset["logo"]["path"] = os.path.join(os.path.dirname(os.path.abspath(path)), preset["logo"]["path"])
+    return preset
+
+
+def save_preset(path, text=None, logo=None):
+    """Saves the text and/or logo section into the preset file. If the file already exists, the section which isn't
+    given is kept, so the text and the logo can be saved into the same preset from their widgets. File that isn't a
+    valid preset is overwritten"""
+    preset = {}
+    if os.path.isfile(path):
+        try:
+            with open(path) as preset_file:
+                existing = json.load(preset_file)
+            normalize_preset(existing)
+            preset = existing
+        except (OSError, ValueError):
+            # Nothing worth keeping in it
+            pass
+
+    if text is not None:
+        preset["text"] = dict(text)
+    if logo is not None:
+        preset["logo"] = dict(logo)
+        # Store the path of the logo relative to the preset, so that both can be moved together
+        preset["logo"]["path"] = os.path.relpath(os.path.abspath(logo["path"]),
+                                                 os.path.dirname(os.path.abspath(path)))
+
+    preset["version"] = PRESET_VERSION
+    preset = normalize_preset(preset)
+    with open(path, "w") as preset_file:
+        json.dump(preset, preset_file, indent=2)
+
+
+def preset_hash(preset):
+    """Returns the hash of the normalized preset. Two presets that render the same watermark have the same hash, so it
+    can be used as the key of rendered results. Only the path of the logo is hashed, not the logo image"""
+    canonical = json.dumps(normalize_preset(preset), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
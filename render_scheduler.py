@@ -0,0 +1,89 @@
+import threading
+import time
+import traceback
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+from render_trace import tracer
+
+
+class RenderRunnable(QRunnable):
+    """Runnable executed on the scheduler's thread pool. It keeps taking the newest pending job from the scheduler
+    until there are no more jobs left"""
+
+    def __init__(self, scheduler):
+        super().__init__()
+        self.scheduler = scheduler
+
+    def run(self):
+        while True:
+            job = self.scheduler.take_pending_job()
+            if job is None:
+                return
+            render_function, submitted_at = job
+            try:
+                with tracer.span("render"):
+                    edited_image = render_function()
+            except Exception:
+                # Failed render must not stop the worker, otherwise no other job would ever be rendered
+                traceback.print_exc()
+                continue
+            self.scheduler.job_finished(edited_image, submitted_at)
+
+
+class RenderScheduler(QObject):
+    """Renders the images off the GUI thread. TextWidget and LogoWidget submit render jobs and the finished image is
+    sent with the rendered signal. Only one job is rendered at a time and only the newest job waits for its turn, every
+    older job that didn't start yet is dropped since its result would be overwritten anyway"""
+
+    # Sends the rendered image. Connections to the objects living on the GUI thread are queued by Qt
+    rendered = pyqtSignal(object)
+    # Sends the time in milliseconds between submitting the job and finishing its render
+    frame_latency = pyqtSignal(float)
+
+    def __init__(self):
+        super().__init__()
+        self.pool = QThreadPool()
+        self.pool.setMaxThreadCount(1)
+        self.lock = threading.Lock()
+        self.pending_job = None
+        self.running = False
+
+        # Statistics that can be read at any time
+        self.submitted_jobs = 0
+        self.finished_jobs = 0
+        self.dropped_jobs = 0
+        self.last_latency = None
+
+    def submit(self, render_function):
+        """Schedules render_function, which takes no arguments and returns image, to be run on the worker thread. It
+        must not touch any Qt widgets, so all the values it needs have to be collected before submitting"""
+        with self.lock:
+            self.submitted_jobs += 1
+            if self.pending_job is not None:
+                self.dropped_jobs += 1
+            self.pending_job = (render_function, time.perf_counter())
+            if not self.running:
+                self.running = True
+                self.pool.start(RenderRunnable(self))
+
+    def take_pending_job(self):
+        """Returns the newest pending job and removes it from the queue. Returns None and stops the worker if there
+        are no jobs left"""
+        with self.lock:
+            job = self.pending_job
+            self.pending_job = None
+            if job is None:
+                self.running = False
+            return job
+
+    def job_finished(self, edited_image, submitted_at):
+        """Updates statistics and sends the rendered image"""
+        latency = (time.perf_counter() - submitted_at) * 1000
+        with self.lock:
+            self.finished_jobs += 1
+            self.last_latency = latency
+        self.frame_latency.emit(latency)
+        self.rendered.emit(edited_image)
+
+    def wait_for_done(self, timeout=-1):
+        """Blocks until all submitted jobs are rendered. Returns False if timeout in milliseconds expired first"""
+        return self.pool.waitForDone(timeout)
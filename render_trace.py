@@ -0,0 +1,132 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+
+# Tracing is turned on by setting this environment variable to the path of the trace file, e.g.
+# WATERMARKER_TRACE=trace.json python main.py. The trace is written when the program exits and can be opened in
+# chrome://tracing or https://ui.perfetto.dev
+TRACE_PATH_VARIABLE = "WATERMARKER_TRACE"
+# Only the newest events are kept, so a long session doesn't fill the memory
+MAX_EVENTS = 200000
+
+
+class NullSpan:
+    """Span returned while tracing is disabled. Entering and leaving it does nothing"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+NULL_SPAN = NullSpan()
+
+
+class Span:
+    """Named span of time, recorded by the tracer when the with block is left"""
+    __slots__ = ("tracer", "name", "args", "start")
+
+    def __init__(self, tracer, name, args):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+        self.start = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.tracer.record(self.name, self.start, time.perf_counter_ns() - self.start, self.args)
+        return False
+
+
+class Tracer:
+    """Records named spans around the stages of the render, e.g. with tracer.span("rotate"): ... While the tracer is
+    disabled span returns NULL_SPAN, so the instrumented code only pays for one attribute check and a call. Spans can
+    be nested and can come from any thread. Recorded spans are kept as Chrome trace events (see write) and their total
+    time per name is summed up until take_totals is called, which MainWindow does after every displayed frame"""
+
+    def __init__(self):
+        self.enabled = False
+        self.events = deque(maxlen=MAX_EVENTS)
+        # Total ns and number of the spans of every name since the last take_totals
+        self.totals = {}
+        self.thread_names = {}
+        self.lock = threading.Lock()
+
+    def enable(self):
+        """Starts recording the spans"""
+        self.enabled = True
+
+    def disable(self):
+        """Stops recording the spans. The recorded ones are kept"""
+        self.enabled = False
+
+    def span(self, name, **args):
+        """Returns the span with the name to be used in the with statement. args are shown with the span in the
+        trace"""
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, name, args)
+
+    def record(self, name, start, duration, args=None):
+        """Records the span that started at start and took duration, both in ns of time.perf_counter_ns"""
+        thread_id = threading.get_ident()
+        # Ids of the finished threads are given to the new ones, so the thread keeps the name it had last
+        thread_name = threading.current_thread().name
+        with self.lock:
+            self.thread_names[thread_id] = thread_name
+            self.events.append((name, thread_id, start, duration, args))
+            total, count = self.totals.get(name, (0, 0))
+            self.totals[name] = (total + duration, count + 1)
+
+    def take_totals(self):
+        """Returns the dictionary of (ms, count) of every span name recorded since the last call, in the order the
+        names were first recorded, and starts summing up again"""
+        with self.lock:
+            totals, self.totals = self.totals, {}
+        return {name: (duration / 1e6, count) for name, (duration, count) in totals.items()}
+
+    def trace_events(self):
+        """Returns the recorded spans as the list of Chrome trace events, complete events with the times in
+        microseconds, preceded by the names of the threads"""
+        process_id = os.getpid()
+        with self.lock:
+            events = list(self.events)
+            thread_names = dict(self.thread_names)
+
+        trace_events = [{"name": "thread_name", "ph": "M", "pid": process_id, "tid": thread_id,
+                         "args": {"name": thread_name}} for thread_id, thread_name in thread_names.items()]
+        for name, thread_id, start, duration, args in events:
+            event = {"name": name, "cat": "render", "ph": "X", "ts": start / 1000, "dur": duration / 1000,
+                     "pid": process_id, "tid": thread_id}
+            if args:
+                event["args"] = args
+            trace_events.append(event)
+        return trace_events
+
+    def write(self, path):
+        """Writes the recorded spans into the JSON trace file in the Chrome trace event format"""
+        with open(path, "w") as trace_file:
+            json.dump({"traceEvents": self.trace_events(), "displayTimeUnit": "ms"}, trace_file)
+
+    def clear(self):
+        """Forgets all the recorded spans"""
+        with self.lock:
+            self.events.clear()
+            self.totals = {}
+
+
+def format_totals(totals):
+    """Returns one line summary of take_totals in ms, e.g. 'render 41.2, rotate 3.1, paste 8.0 (12x)'. Spans that were
+    recorded more than once show how many times"""
+    return ", ".join(f"{name} {duration:.1f}" + (f" ({count}x)" if count > 1 else "")
+                     for name, (duration, count) in totals.items())
+
+
+# Tracer of the whole program, see TRACE_PATH_VARIABLE
+tracer = Tracer()
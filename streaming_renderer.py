@@ -0,0 +1,247 @@
+import math
+import os
+import struct
+from contextlib import contextmanager
+from PIL import Image
+from overlay_builder import composite_patterns
+from watermark_renderer import text_pattern, logo_pattern
+
+# Number of pixels of the image rendered at once by render_streaming (64 MB in RGBA). Memory of the streaming render
+# depends on this and on the size of the watermark, not on the size of the image
+DEFAULT_STRIP_PIXELS = 16 * 1024 * 1024
+
+# Bands of the raw modes StripReader can read by rows. Each of them takes one byte per pixel
+STREAMABLE_RAW_BANDS = set("RGBAXLCMYKa")
+
+# TIFF field types and their struct formats
+TIFF_SHORT = 3
+TIFF_LONG = 4
+TIFF_LONG8 = 16
+TIFF_TYPE_FORMATS = {TIFF_SHORT: "H", TIFF_LONG: "I", TIFF_LONG8: "Q"}
+# Pixel data bigger than this is written as BigTIFF, the offsets of classic TIFF are 32-bit. Some space is left for
+# the header and the directory
+BIG_TIFF_DATA_LIMIT = 2 ** 32 - 2 ** 20
+
+
+@contextmanager
+def unlimited_image_pixels():
+    """Turns off PIL's decompression bomb check inside the with block. Scans the streaming render is made for are far
+    above its limit, and the streaming render doesn't decode them as a whole"""
+    max_image_pixels = Image.MAX_IMAGE_PIXELS
+    Image.MAX_IMAGE_PIXELS = None
+    try:
+        yield
+    finally:
+        Image.MAX_IMAGE_PIXELS = max_image_pixels
+
+
+class StripReader:
+    """Reads the image at path by horizontal strips of rows. Uncompressed images (e.g. uncompressed TIFF or PPM) are
+    read directly from the file, so only the rows of the strip are ever in memory. Other formats can't be decoded
+    partially with PIL, so they are decoded as a whole once and the strips are cropped from the decoded image. streamed
+    tells which of the two is used"""
+
+    def __init__(self, path):
+        self.path = path
+        self.image = None
+        with unlimited_image_pixels(), Image.open(path) as image:
+            self.size = image.size
+            self.mode = image.mode
+            self.has_alpha = "A" in image.getbands() or "transparency" in image.info
+            self.raw_layout = self.find_raw_layout(image)
+        self.streamed = self.raw_layout is not None
+
+    @staticmethod
+    def find_raw_layout(image):
+        """Returns (rawmode, stride, segments) of the pixel data of the uncompressed image, or None if the rows of the
+        image can't be read directly from the file. segments is the list of (top, bottom, offset) tuples, the rows from
+        top to bottom are stored one after another from offset in the file. TIFF has one segment for every strip"""
+        if not image.tile or image.mode == "P" or "transparency" in image.info:
+            return None
+
+        layout = None
+        segments = []
+        for codec_name, extents, offset, args in sorted(image.tile, key=lambda tile: tile[1][1]):
+            # Only the raw tiles spanning whole rows can be read by rows
+            if codec_name != "raw" or extents[0] != 0 or extents[2] != image.width:
+                return None
+
+            # Arguments of the raw decoder are rawmode, stride and orientation. Rows of the image that is stored bottom
+            # to top aren't read, neither are the raw modes with more or less than a byte per band
+            if isinstance(args, str):
+                args = (args,)
+            rawmode = args[0]
+            stride = (args[1] if len(args) > 1 else 0) or image.width * len(rawmode)
+            orientation = args[2] if len(args) > 2 else 1
+            if orientation != 1 or not set(rawmode) <= STREAMABLE_RAW_BANDS or layout not in (None, (rawmode, stride)):
+                return None
+            layout = (rawmode, stride)
+
+            # Segments have to cover all the rows of the image
+            if extents[1] != (segments[-1][1] if segments else 0):
+                return None
+            segments.append((extents[1], extents[3], offset))
+
+        if segments[-1][1] != image.height:
+            return None
+        return layout + (segments,)
+
+    def read(self, top, bottom):
+        """Returns the rows from top to bottom of the image as RGBA image"""
+        width = self.size[0]
+        if self.raw_layout is None:
+            if self.image is None:
+                with unlimited_image_pixels(), Image.open(self.path) as image:
+                    self.image = image.convert("RGBA")
+            return self.image.crop((0, top, width, bottom))
+
+        # Read the rows from all the segments the strip crosses
+        rawmode, stride, segments = self.raw_layout
+        data = []
+        with open(self.path, "rb") as file:
+            for segment_top, segment_bottom, offset in segments:
+                if segment_bottom <= top or segment_top >= bottom:
+                    continue
+                first_row = max(top, segment_top)
+                rows = min(bottom, segment_bottom) - first_row
+                file.seek(offset + (first_row - segment_top) * stride)
+                data.append(file.read(rows * stride))
+        data = b"".join(data)
+        if len(data) < (bottom - top) * stride:
+            raise ValueError(f"Image file {self.path} is truncated")
+        return Image.frombytes(self.mode, (width, bottom - top), data, "raw", rawmode, stride, 1).convert("RGBA")
+
+
+class TiffStripWriter:
+    """Writes uncompressed RGB or RGBA TIFF strip by strip, so the whole image is never in memory. Pixel data is
+    written right after the header as it comes and the directory with the strip offsets is written at the end by
+    close. Images with more than 4 GB of pixel data are written as BigTIFF. Use it as a context manager, the file that
+    wasn't finished because of an error is removed"""
+
+    def __init__(self, path, size, mode, rows_per_strip):
+        if mode not in ("RGB", "RGBA"):
+            raise ValueError(f"TIFF can be streamed only in RGB or RGBA mode, not {mode}")
+        self.path = path
+        self.size = size
+        self.mode = mode
+        self.rows_per_strip = min(rows_per_strip, size[1])
+        self.row_bytes = size[0] * len(mode)
+        self.big = self.row_bytes * size[1] > BIG_TIFF_DATA_LIMIT
+        self.written_rows = 0
+
+        self.file = open(path, "wb")
+        # The offset of the directory is written into the header once the directory is written
+        if self.big:
+            self.file.write(b"II" + struct.pack("<HHHQ", 43, 8, 0, 0))
+        else:
+            self.file.write(b"II" + struct.pack("<HI", 42, 0))
+        self.data_offset = self.file.tell()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exception_type, exception, traceback):
+        if exception_type is None:
+            self.close()
+        else:
+            self.file.close()
+            os.remove(self.path)
+
+    def write(self, strip):
+        """Appends the rows of the strip to the image. strip has to be as wide as the image and in its mode"""
+        if strip.mode != self.mode or strip.width != self.size[0]:
+            raise ValueError(f"Strip must be {self.mode} image {self.size[0]} px wide")
+        self.file.write(strip.tobytes())
+        self.written_rows += strip.height
+
+    def close(self):
+        """Writes the directory of the image and closes the file. All the rows of the image have to be written,
+        otherwise the unfinished file is removed"""
+        if self.written_rows != self.size[1]:
+            self.file.close()
+            os.remove(self.path)
+            raise ValueError(f"Only {self.written_rows} of {self.size[1]} rows were written")
+
+        width, height = self.size
+        bands = len(self.mode)
+        strips = math.ceil(height / self.rows_per_strip)
+        offsets = [self.data_offset + strip * self.rows_per_strip * self.row_bytes for strip in range(strips)]
+        byte_counts = [min(self.rows_per_strip, height - strip * self.rows_per_strip) * self.row_bytes
+                       for strip in range(strips)]
+        offset_type = TIFF_LONG8 if self.big else TIFF_LONG
+
+        # Entries of the directory as (tag, field type, values), sorted by tag
+        entries = [
+            (256, TIFF_LONG, [width]),  # ImageWidth
+            (257, TIFF_LONG, [height]),  # ImageLength
+            (258, TIFF_SHORT, [8] * bands),  # BitsPerSample
+            (259, TIFF_SHORT, [1]),  # Compression: none
+            (262, TIFF_SHORT, [2]),  # PhotometricInterpretation: RGB
+            (273, offset_type, offsets),  # StripOffsets
+            (277, TIFF_SHORT, [bands]),  # SamplesPerPixel
+            (278, TIFF_LONG, [self.rows_per_strip]),  # RowsPerStrip
+            (279, offset_type, byte_counts),  # StripByteCounts
+            (284, TIFF_SHORT, [1]),  # PlanarConfiguration: contiguous
+        ]
+        if bands == 4:
+            entries.append((338, TIFF_SHORT, [2]))  # ExtraSamples: unassociated alpha
+
+        # Directory starts on a word boundary
+        if self.file.tell() % 2:
+            self.file.write(b"\0")
+        directory_offset = self.file.tell()
+
+        # Classic TIFF and BigTIFF differ only in the size of the counts and offsets
+        offset_format = "<Q" if self.big else "<I"
+        value_size = 8 if self.big else 4
+        entry_size = 12 + (8 if self.big else 0)
+        directory_size = (8 if self.big else 2) + len(entries) * entry_size + value_size
+
+        # Values that don't fit into the entry are written after the directory
+        directory = bytearray(struct.pack("<Q" if self.big else "<H", len(entries)))
+        values = bytearray()
+        for tag, field_type, field_values in entries:
+            data = struct.pack(f"<{len(field_values)}{TIFF_TYPE_FORMATS[field_type]}", *field_values)
+            if len(data) <= value_size:
+                field = data.ljust(value_size, b"\0")
+            else:
+                field = struct.pack(offset_format, directory_offset + directory_size + len(values))
+                values += data + b"\0" * (len(data) % 2)
+            directory += struct.pack("<HHQ" if self.big else "<HHI", tag, field_type, len(field_values)) + field
+        # There is no next directory
+        directory += struct.pack(offset_format, 0)
+
+        self.file.write(directory + values)
+        self.file.seek(8 if self.big else 4)
+        self.file.write(struct.pack(offset_format, directory_offset))
+        self.file.close()
+
+
+def render_streaming(input_path, output_path, text_settings=None, logo_settings=None,
+                     strip_pixels=DEFAULT_STRIP_PIXELS):
+    """Watermarks the image at input_path strip by strip and writes it into the TIFF file output_path as it goes, so
+    that images much bigger than the memory can be watermarked. Settings are the same as for
+    watermark_renderer.watermark_image and the result is the same as its full resolution render. Returns True if the
+    image was also read strip by strip, False if its format had to be decoded as a whole (see StripReader)"""
+    if not output_path.lower().endswith((".tif", ".tiff")):
+        raise ValueError(f"Streaming render writes TIFF files only, {output_path} isn't .tif or .tiff")
+
+    reader = StripReader(input_path)
+    width, height = reader.size
+
+    # Patterns are calculated once for the whole image with the same math as the full render. Every strip then only
+    # gets the tiles that land on it
+    patterns = []
+    if text_settings is not None:
+        patterns.append(text_pattern(text_settings, reader.size))
+    if logo_settings is not None:
+        patterns.append(logo_pattern(logo_settings, reader.size))
+
+    output_mode = "RGBA" if reader.has_alpha else "RGB"
+    strip_height = max(1, strip_pixels // width)
+    with TiffStripWriter(output_path, reader.size, output_mode, strip_height) as writer:
+        for top in range(0, height, strip_height):
+            strip = reader.read(top, min(top + strip_height, height))
+            composite_patterns(strip, patterns, (0, top), in_place=True)
+            writer.write(strip if output_mode == "RGBA" else strip.convert("RGB"))
+    return reader.streamed
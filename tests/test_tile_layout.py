@@ -0,0 +1,72 @@
+import pytest
+from PIL import Image
+from tile_layout import ONE_TILE, CHECKER_PATTERN, ROMB_PATTERN, rotated_size, scale_positions, scale_size
+from watermark_renderer import logo_background, logo_layout, logo_tile, render_logo_watermark
+
+FULL_SIZE = (3000, 2000)
+SCALES = (0.5, 0.25, 0.2)
+LOGO_SIZE = (400, 200)
+
+
+def logo_settings(tile, rotation):
+    """Returns the settings of the opaque rectangular logo, so its tiles are easy to tell from the empty canvas"""
+    return {"logo": Image.new("RGBA", LOGO_SIZE, (200, 30, 30, 255)), "size": 5, "opacity": 255, "rotation": rotation,
+            "spacing_x": 10, "spacing_y": 10, "tile": tile}
+
+
+def render_alpha(settings, scale):
+    """Returns the alpha channel of the logo watermark rendered over the empty canvas of FULL_SIZE scaled by scale"""
+    canvas = Image.new("RGBA", scale_size(FULL_SIZE, scale), (0, 0, 0, 0))
+    return render_logo_watermark(canvas, settings, FULL_SIZE, scale).getchannel("A")
+
+
+def test_scale_positions():
+    positions = [(0, 0), (101, 55), (2999, 1999)]
+    assert scale_positions(positions, 1) is positions
+    assert scale_positions(positions, 0.5) == [(0, 0), (50, 28), (1500, 1000)]
+
+
+@pytest.mark.parametrize("tile", [ONE_TILE, CHECKER_PATTERN, ROMB_PATTERN])
+@pytest.mark.parametrize("rotation", [0, 30, 90])
+@pytest.mark.parametrize("scale", SCALES)
+def test_preview_layout_is_scaled_full_layout(tile, rotation, scale):
+    settings = logo_settings(tile, rotation)
+    full_logo_size = logo_tile(settings, scale).full_size
+    full_positions = logo_layout(full_logo_size, rotation, 10, 10, tile, FULL_SIZE, 1)
+    assert logo_layout(full_logo_size, rotation, 10, 10, tile, FULL_SIZE, scale) == \
+        scale_positions(full_positions, scale)
+
+
+@pytest.mark.parametrize("scale", SCALES)
+def test_preview_tile_is_where_scaled_full_tile_is(scale):
+    settings = logo_settings(ONE_TILE, 0)
+    full_box = render_alpha(settings, 1).getbbox()
+    preview_box = render_alpha(settings, scale).getbbox()
+    # The upper left corner is the rounded scaled position, the size of the scaled tile can be one pixel off
+    assert preview_box[:2] == tuple(round(coordinate * scale) for coordinate in full_box[:2])
+    for full_coordinate, preview_coordinate in zip(full_box[2:], preview_box[2:]):
+        assert abs(full_coordinate * scale - preview_coordinate) <= 1
+
+
+@pytest.mark.parametrize("tile", [ONE_TILE, CHECKER_PATTERN, ROMB_PATTERN])
+@pytest.mark.parametrize("rotation", [0, 30, 90])
+@pytest.mark.parametrize("scale", SCALES)
+def test_preview_render_pastes_tiles_at_scaled_full_positions(tile, rotation, scale):
+    settings = logo_settings(tile, rotation)
+    scaled_tile = logo_tile(settings, scale)
+    positions = scale_positions(logo_layout(scaled_tile.full_size, rotation, 10, 10, tile, FULL_SIZE, 1), scale)
+
+    # The preview the way it would look with every scaled tile pasted at the scaled full resolution position
+    canvas = Image.new("RGBA", scale_size(FULL_SIZE, scale), (0, 0, 0, 0))
+    overlay = Image.new("RGBA", canvas.size, logo_background(settings["opacity"]))
+    for position in positions:
+        overlay.paste(scaled_tile.image, position, scaled_tile.image)
+    expected = Image.alpha_composite(canvas, overlay)
+
+    assert render_logo_watermark(canvas, settings, FULL_SIZE, scale).tobytes() == expected.tobytes()
+
+
+@pytest.mark.parametrize("size", [(400, 200), (37, 91), (1, 1), (1280, 720)])
+@pytest.mark.parametrize("angle", list(range(0, 360, 7)) + [45, 90, 180, 270, 359, 12.5, -30, 400])
+def test_rotated_size_matches_pil(size, angle):
+    assert rotated_size(*size, angle) == Image.new("L", size).rotate(angle, expand=True).size
@@ -0,0 +1,68 @@
+import threading
+from collections import OrderedDict, namedtuple
+
+# Default memory budget of the cache in bytes
+DEFAULT_BYTE_BUDGET = 64 * 1024 * 1024
+
+# Rendered watermark tile. image is the rotated RGBA tile that is pasted onto the overlay, full_size is the (width,
+# height) of the tile before rotation at full resolution, which the pattern is calculated from, and source is the image
+# the tile was rendered from (the logo), kept so that its id in the cache key can't be reused by another image
+RenderedTile = namedtuple("RenderedTile", ["image", "full_size", "source"])
+
+
+class TileCache:
+    """LRU cache of the rendered watermark tiles. Building the tile (loading the font, measuring and drawing the text or
+    resizing the logo and rotating it) doesn't depend on spacing, pattern or the image, so the same tile is reused
+    until one of its own inputs changes. hits and misses count how often the tile was reused or rendered"""
+
+    def __init__(self, byte_budget=DEFAULT_BYTE_BUDGET):
+        self.byte_budget = byte_budget
+        self.entries = OrderedDict()
+        self.used_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key, render_function):
+        """Returns the RenderedTile cached under key. If there is none, render_function is called to render it and the
+        result is cached. key must contain every input the tile depends on"""
+        with self.lock:
+            if key in self.entries:
+                self.hits += 1
+                self.entries.move_to_end(key)
+                return self.entries[key]
+            self.misses += 1
+
+        # Tile is rendered outside the lock, so the other thread doesn't have to wait for it
+        tile = render_function()
+
+        with self.lock:
+            if key not in self.entries:
+                self.entries[key] = tile
+                self.used_bytes += self.tile_bytes(tile)
+                self.evict()
+        return tile
+
+    def evict(self):
+        """Removes the least recently used tiles until the cache fits into byte_budget. The newest tile is always
+        kept"""
+        while self.used_bytes > self.byte_budget and len(self.entries) > 1:
+            _, tile = self.entries.popitem(last=False)
+            self.used_bytes -= self.tile_bytes(tile)
+
+    def clear(self):
+        """Removes all the tiles and resets the counters"""
+        with self.lock:
+            self.entries.clear()
+            self.used_bytes = 0
+            self.hits = 0
+            self.misses = 0
+
+    @staticmethod
+    def tile_bytes(tile):
+        """Returns the approximate number of bytes the tile image takes in memory"""
+        return tile.image.width * tile.image.height * len(tile.image.getbands())
+
+
+# Shared cache used by watermark_renderer
+tile_cache = TileCache()
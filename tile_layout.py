@@ -0,0 +1,86 @@
+import math
+
+# These are the tile patterns user can choose with the tile buttons
+ONE_TILE = 1
+CHECKER_PATTERN = 4
+ROMB_PATTERN = 5
+
+
+def tile_gap(coeficient, tile_size):
+    """Takes spacing coeficient and the size of the tile on one axis and returns the gap between two tiles on that
+    axis. If coeficient is 0 tiles are placed right next to each other"""
+    if coeficient == 0:
+        return tile_size
+    return tile_size + round(tile_size * coeficient / 10)
+
+
+def number_of_repetitions(canvas_size, gap, tile_size):
+    """Calculates how many times the tile should be repeated across canvas on one axis"""
+    if gap != 0:
+        return round(canvas_size / gap)
+    return round(canvas_size / tile_size)
+
+
+def rotated_size(width, height, angle):
+    """Returns the size of the image with given width and height after Image.rotate(angle, expand=True) without having
+    to rotate the image. Calculation is the same one PIL uses when it expands the rotated image"""
+    angle = angle % 360.0
+    if angle in (0, 180):
+        return width, height
+    if angle in (90, 270):
+        return height, width
+
+    angle = -math.radians(angle)
+    a, b = round(math.cos(angle), 15), round(math.sin(angle), 15)
+    d, e = round(-math.sin(angle), 15), round(math.cos(angle), 15)
+    # Rotation happens around the center of the image, so the corners are translated accordingly
+    center_x, center_y = width / 2, height / 2
+    c = a * -center_x + b * -center_y + center_x
+    f = d * -center_x + e * -center_y + center_y
+
+    corners = ((0, 0), (width, 0), (width, height), (0, height))
+    xx = [a * x + b * y + c for x, y in corners]
+    yy = [d * x + e * y + f for x, y in corners]
+    return math.ceil(max(xx)) - math.floor(min(xx)), math.ceil(max(yy)) - math.floor(min(yy))
+
+
+def tile_positions(pattern, canvas_size, tile_size, gap_x, gap_y, horizontal_rep, vertical_rep):
+    """Returns the list of (x, y) upper left corners on which the tile has to be pasted for the chosen pattern.
+    canvas_size and tile_size are (width, height) tuples and tile_size is only needed to center the single tile"""
+    positions = []
+
+    if pattern == ONE_TILE:
+        # Calculate the center position of the tile on the canvas
+        positions.append((round(canvas_size[0] / 2) - round(tile_size[0] / 2),
+                          round(canvas_size[1] / 2) - round(tile_size[1] / 2)))
+    elif pattern == CHECKER_PATTERN:
+        for v_numb in range(vertical_rep + 1):
+            for numb in range(horizontal_rep + 1):
+                positions.append((numb * gap_x, v_numb * gap_y))
+    elif pattern == ROMB_PATTERN:
+        # Every other row, starting with the first one, is shifted by half of the gap, which creates romb-like pattern
+        displacement = round(gap_x / 2)
+        for v_numb in range(vertical_rep + 1):
+            shift = displacement if v_numb % 2 == 0 else 0
+            for numb in range(horizontal_rep + 1):
+                positions.append((shift + numb * gap_x, v_numb * gap_y))
+
+    return positions
+
+
+def preview_scale(image_size, preview_size):
+    """Returns the factor by which the image has to be scaled to fit into the preview. Images smaller than the preview
+    are never enlarged"""
+    return min(preview_size[0] / image_size[0], preview_size[1] / image_size[1], 1.0)
+
+
+def scale_size(size, scale):
+    """Scales (width, height) tuple by scale. Neither side is allowed to drop below 1 px"""
+    return max(1, round(size[0] * scale)), max(1, round(size[1] * scale))
+
+
+def scale_positions(positions, scale):
+    """Maps tile positions calculated on the full resolution image onto the image scaled by scale"""
+    if scale == 1:
+        return positions
+    return [(round(x * scale), round(y * scale)) for x, y in positions]
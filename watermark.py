@@ -0,0 +1,112 @@
+import argparse
+import sys
+from batch_manifest import MANIFEST_FILENAME
+from batch_pipeline import DEFAULT_READERS, DEFAULT_RENDERERS, DEFAULT_WRITERS, DEFAULT_QUEUE_SIZE
+from batch_processing import run_batch, load_settings
+from decode_cache import DEFAULT_CACHE_DIRECTORY, DEFAULT_MAX_BYTES
+from image_encoder import DEFAULT_ENCODE_OPTIONS, FORMAT_EXTENSIONS, SUBSAMPLING_VALUES
+from streaming_renderer import render_streaming, DEFAULT_STRIP_PIXELS
+
+
+def positive_int(value):
+    """Returns the command line value as int, used as the argparse type of the values that must be at least 1"""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, not {number}")
+    return number
+
+
+def quality(value):
+    """Returns the command line value as int, used as the argparse type of the JPEG and WebP quality"""
+    number = int(value)
+    if not 1 <= number <= 100:
+        raise argparse.ArgumentTypeError(f"must be from 1 to 100, not {number}")
+    return number
+
+
+def main(argv=None):
+    """Command line interface of the Watermarker. Run 'python -m watermark batch --help' or 'python -m watermark stream
+    --help' for the details"""
+    parser = argparse.ArgumentParser(prog="python -m watermark", description="Watermarker without the GUI")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    batch_parser = subparsers.add_parser("batch", help="watermark all the images in a directory")
+    batch_parser.add_argument("input", help="directory with the images or glob pattern, e.g. 'photos/**/*.jpg'")
+    batch_parser.add_argument("settings", help="preset file with the text and/or logo watermark settings")
+    batch_parser.add_argument("output", help="directory in which the watermarked images are saved, in the same "
+                                             "subfolders as they are in the input")
+    batch_parser.add_argument("-j", "--jobs", type=int, default=1,
+                              help="number of worker processes, 0 for one per CPU (default: 1)")
+    batch_parser.add_argument("--readers", type=positive_int, default=DEFAULT_READERS,
+                              help="threads decoding the images while the others are rendered, only with one job "
+                                   "(default: %(default)s)")
+    batch_parser.add_argument("--renderers", type=positive_int, default=DEFAULT_RENDERERS,
+                              help="threads drawing the watermarks, only with one job (default: %(default)s)")
+    batch_parser.add_argument("--writers", type=positive_int, default=DEFAULT_WRITERS,
+                              help="threads encoding and saving the images, only with one job (default: %(default)s)")
+    batch_parser.add_argument("--queue-size", type=positive_int, default=DEFAULT_QUEUE_SIZE,
+                              help="decoded or rendered images waiting for the next stage, each one holds its pixels "
+                                   "(default: %(default)s)")
+    batch_parser.add_argument("--decode-cache", nargs="?", const=DEFAULT_CACHE_DIRECTORY, metavar="DIR",
+                              help="keep the decoded images in DIR, so the next batch over the same images doesn't "
+                                   f"decode them again (default DIR: {DEFAULT_CACHE_DIRECTORY})")
+    batch_parser.add_argument("--decode-cache-size", type=float, default=DEFAULT_MAX_BYTES / 1024 ** 3, metavar="GB",
+                              help="size limit of the decode cache, the least recently used images are removed "
+                                   "(default: %(default)g)")
+    batch_parser.add_argument("--format", choices=[image_format.lower() for image_format in FORMAT_EXTENSIONS],
+                              help="format of the saved images (default: the format of each input image)")
+    batch_parser.add_argument("--quality", type=quality, default=DEFAULT_ENCODE_OPTIONS["quality"],
+                              help="JPEG and WebP quality, 1-100 (default: %(default)s)")
+    batch_parser.add_argument("--optimize", action="store_true",
+                              help="spend more time on the encoding to get smaller files")
+    batch_parser.add_argument("--progressive", action="store_true", help="save progressive JPEG")
+    batch_parser.add_argument("--subsampling", choices=SUBSAMPLING_VALUES,
+                              default=DEFAULT_ENCODE_OPTIONS["subsampling"],
+                              help="JPEG chroma subsampling (default: %(default)s)")
+    batch_parser.add_argument("--force", action="store_true",
+                              help="watermark all the images again, also the ones the manifest of the output "
+                                   f"directory ({MANIFEST_FILENAME}) lists as already watermarked from the same source "
+                                   "with the same settings")
+
+    stream_parser = subparsers.add_parser("stream", help="watermark one very large image strip by strip into TIFF")
+    stream_parser.add_argument("input", help="image to watermark, uncompressed TIFF or PPM is read strip by strip")
+    stream_parser.add_argument("settings", help="preset file with the text and/or logo watermark settings")
+    stream_parser.add_argument("output", help="TIFF file in which the watermarked image is saved")
+    stream_parser.add_argument("--strip-megapixels", type=float, default=DEFAULT_STRIP_PIXELS / 1024 / 1024,
+                               help="size of the strip rendered at once in MP, memory use depends on it "
+                                    "(default: %(default)g)")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "batch":
+        encode_options = {"quality": args.quality, "optimize": args.optimize, "progressive": args.progressive,
+                          "subsampling": args.subsampling}
+        try:
+            processed, skipped, failed, seconds = run_batch(
+                args.input, args.settings, args.output, jobs=args.jobs, decode_cache_dir=args.decode_cache,
+                decode_cache_bytes=round(args.decode_cache_size * 1024 ** 3),
+                output_format=args.format.upper() if args.format else None, encode_options=encode_options,
+                readers=args.readers, renderers=args.renderers, writers=args.writers, queue_size=args.queue_size,
+                force=args.force)
+        except (OSError, ValueError) as error:
+            # Wrong preset or output directory, nothing was watermarked
+            parser.exit(2, f"error: {error}\n")
+        print(f"Watermarked {processed} images, {len(failed)} failed, {skipped} unchanged in {seconds:.1f} s "
+              f"({(processed + len(failed)) / seconds:.2f} images/s)")
+        return 1 if failed else 0
+
+    if args.command == "stream":
+        try:
+            text_settings, logo_settings = load_settings(args.settings)
+            streamed = render_streaming(args.input, args.output, text_settings, logo_settings,
+                                        strip_pixels=max(1, round(args.strip_megapixels * 1024 * 1024)))
+        except (OSError, ValueError) as error:
+            parser.exit(2, f"error: {error}\n")
+        if not streamed:
+            print(f"{args.input} can't be read strip by strip, it was decoded as a whole", file=sys.stderr)
+        print(f"Watermarked {args.input} into {args.output}")
+        return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,381 @@
+from PIL import Image, ImageDraw
+from font_pool import font_pool
+from overlay_builder import TiledOverlay, composite_pattern, composite_patterns
+from render_graph import RenderGraph
+from render_trace import tracer
+from tile_cache import tile_cache, RenderedTile
+from tile_layout import tile_gap, number_of_repetitions, rotated_size, tile_positions, scale_positions, scale_size
+
+# This module renders the watermarks without any Qt widgets, so the same code is used by TextWidget, LogoWidget and the
+# batch command. Settings are dictionaries with the values of the widgets, see TextWidget.text_settings and
+# LogoWidget.logo_settings
+
+# Size of the text in px when the size slider is set to 1.0x
+DEFAULT_TEXT_SIZE = 70
+# Space in px left free on the right and bottom side of the image when the text is written in checker and romb pattern
+TEXT_MARGIN = 50
+# Color of the transparent overlay the text is pasted onto. Pasting blends the edges of the text with it, so it changes
+# the look of the watermark even though it is transparent itself
+TEXT_BACKGROUND = (255, 255, 255, 0)
+
+
+def filter_coeficient(coeficient_x, coeficient_y, txt_mask_width, txt_mask_height):
+    """ This function takes four arguments: coeficient_x (spacing_x slider value), coeficient_y
+    (spacing_y slider value), txt_mask_width and txt_mask_height. It then determines the space between text on x
+    and y-axis and returns those two values"""
+    word_gap_x = tile_gap(coeficient_x, txt_mask_width)
+    word_gap_y = tile_gap(coeficient_y, txt_mask_height)
+    return word_gap_x, word_gap_y
+
+
+def calculate_numb_text_repetitions(word_space_x, word_space_y, canvas_width, canvas_height, mask_width, mask_height):
+    """This function takes six arguments: word_space_x (space between text x-axis),
+     word_space_y (space between text y-axis),  canvas_width (width of image), canvas_height (height of image)
+     mask_width (width of text) mask_height (height of text). It then calculates how many times should the text
+     be repeated across the image on x and y-axis and returns those two values"""
+    number_of_horizontal_repetitions = number_of_repetitions(canvas_width, word_space_x, mask_width)
+    number_of_vertical_repetitions = number_of_repetitions(canvas_height, word_space_y, mask_height)
+
+    return number_of_horizontal_repetitions, number_of_vertical_repetitions
+
+
+def text_font_sizes(settings, scale=1):
+    """Returns tuple (size, mask_size) of the font in px for the text settings. size is the font size at full resolution
+    and mask_size the size of the font the text is drawn with on the image scaled by scale"""
+    size = round(DEFAULT_TEXT_SIZE * settings["size"] / 10)
+    # The text drawn on the scaled image needs a font scaled by the same value
+    mask_size = size if scale == 1 else max(1, round(size * scale))
+    return size, mask_size
+
+
+def text_fill(settings):
+    """Returns the RGBA color the text is drawn with. Colors come from color_palette.parse_color as ints already"""
+    color = settings["color"]
+    return color[0], color[1], color[2], int(settings["opacity"])
+
+
+def draw_text_mask(font_path, text_to_write, size, mask_size, fill):
+    """Draws the text with the font from font_path in mask_size px and returns it as RenderedTile, whose full_size is
+    the size of the text drawn in size px"""
+    # Get font object from the pool of loaded fonts
+    font = font_pool.get(font_path, size)
+
+    # Get width and length of text
+    txt_img = Image.new("RGB", (1, 1))
+    txt_draw = ImageDraw.Draw(txt_img)
+    text_bbox = txt_draw.textbbox((0, 0), text=text_to_write, font=font)
+    text_width = text_bbox[2] - text_bbox[0]
+    text_height = text_bbox[3] - text_bbox[1]
+
+    if mask_size != size:
+        font = font_pool.get(font_path, mask_size)
+        text_bbox = txt_draw.textbbox((0, 0), text=text_to_write, font=font)
+
+    # Create text mask
+    with tracer.span("draw_text"):
+        text_mask = Image.new("RGBA", (text_bbox[2] - text_bbox[0], text_bbox[3] - text_bbox[1]), (0, 0, 0, 0))
+        text_mask_draw = ImageDraw.Draw(text_mask)
+        text_mask_draw.text((0, 0), text=text_to_write, fill=fill, font=font, anchor='lt')
+    return RenderedTile(text_mask, (text_width, text_height), None)
+
+
+def rotate_tile(tile, rotation):
+    """Returns the RenderedTile rotated by rotation degrees. Its full_size stays the size before the rotation"""
+    with tracer.span("rotate"):
+        return RenderedTile(tile.image.rotate(rotation, expand=True), tile.full_size, tile.source)
+
+
+def text_tile(settings, scale=1):
+    """Returns RenderedTile with the rotated text mask for the text settings. The mask is drawn with the font scaled by
+    scale, and full_size of the tile is the size of the text at full resolution. Tiles are cached in tile_cache, so the
+    font is loaded and the text is drawn and rotated again only when the text, font, size, color, opacity or rotation
+    change"""
+    # Collect data from settings
+    font_path = settings["font"]
+    text_to_write = settings["text"]
+    size, mask_size = text_font_sizes(settings, scale)
+    rotation = int(settings["rotation"])
+    fill = text_fill(settings)
+
+    def render():
+        return rotate_tile(draw_text_mask(font_path, text_to_write, size, mask_size, fill), rotation)
+
+    return tile_cache.get(("text", font_path, text_to_write, size, mask_size, fill, rotation), render)
+
+
+def text_layout(text_size, rotation, spacing_x, spacing_y, tile_sig, full_size, scale=1):
+    """Returns the positions of the text on the image of full_size scaled by scale. text_size is the full_size of the
+    text tile, rotation, spacing_x, spacing_y and tile_sig are the values of the widgets. Positions are always
+    calculated for the original image, so the scaled render matches the full resolution one"""
+    text_width, text_height = text_size
+    spacing_coeficient_x = float(spacing_x)
+    spacing_coeficient_y = float(spacing_y)
+
+    # Determine the area in which the checker and romb pattern text will be written. We leave 50px free
+    target_width = full_size[0] - TEXT_MARGIN
+    target_height = full_size[1] - TEXT_MARGIN
+
+    # Determine the value of gap between text in checker and romb pattern. We take the size of the text before
+    # rotation as the size of the text
+    word_spacing_x_axis, word_spacing_y_axis = filter_coeficient(spacing_coeficient_x, spacing_coeficient_y,
+                                                                 text_width, text_height)
+
+    # Determine how many times the text will be written over the image both vertically and horizontally
+    horizontal_repetitions, vertical_repetitions = calculate_numb_text_repetitions(word_spacing_x_axis,
+                                                                                   word_spacing_y_axis,
+                                                                                   target_width, target_height,
+                                                                                   text_width, text_height)
+
+    # Determine in which pattern the text will be displayed on the image
+    positions = tile_positions(tile_sig, full_size, rotated_size(text_width, text_height, int(rotation)),
+                               word_spacing_x_axis, word_spacing_y_axis, horizontal_repetitions, vertical_repetitions)
+    return scale_positions(positions, scale)
+
+
+def text_pattern(settings, full_size, scale=1):
+    """Returns tuple (pattern, background) for the text watermark described by settings on the image of full_size
+    scaled by scale. pattern is overlay_builder.TiledOverlay with the text placed on the scaled image and background is
+    the color of the transparent overlay the text is pasted onto"""
+    # Get the rotated text mask and the size of the text at full resolution
+    tile = text_tile(settings, scale)
+    positions = text_layout(tile.full_size, settings["rotation"], settings["spacing_x"], settings["spacing_y"],
+                            settings["tile"], full_size, scale)
+    return TiledOverlay(tile.image, positions), TEXT_BACKGROUND
+
+
+def render_text_watermark(canvas, settings, full_size=None, scale=1, in_place=False):
+    """Draws the text watermark described by settings over canvas and returns the new image. canvas can be the original
+    image or its copy scaled by scale, in which case full_size is the size of the original image. If in_place is True
+    the text is drawn directly onto canvas and canvas is returned, otherwise the new image is checked out from
+    buffer_pool (see overlay_builder.composite_pattern)"""
+    if full_size is None:
+        full_size = canvas.size
+
+    # Composite the text over the part of the canvas it covers
+    pattern, background = text_pattern(settings, full_size, scale)
+    return composite_pattern(canvas, pattern, background, in_place=in_place)
+
+
+def logo_sizes(settings, scale=1):
+    """Returns tuple (full_logo_size, scaled_logo_size) of the resized logo at full resolution and on the image scaled
+    by scale"""
+    # Once we get size value we can change the width and the size of the logo. The logo is resized once more by the
+    # scale of the render
+    logo_image = settings["logo"]
+    logo_size = settings["size"] / 10
+    full_logo_size = (int(logo_image.width * logo_size), int(logo_image.height * logo_size))
+    return full_logo_size, scale_size(full_logo_size, scale)
+
+
+def apply_logo_opacity(logo_image, logo_opacity):
+    """Returns the RGBA logo with its alpha replaced by logo_opacity"""
+    with tracer.span("logo_opacity"):
+        # Create new RGBA image with same dimensions as logo_image
+        logo_image_alpha = Image.new("RGBA", logo_image.size)
+
+        # Paste logo_image onto logo_image_alpha
+        logo_image_alpha.paste(logo_image, (0, 0), mask=logo_image)
+
+        # Apply opacity to logo_image_alpha
+        logo_image_alpha.putalpha(logo_opacity)
+    return logo_image_alpha
+
+
+def resize_logo(logo_image, source, full_logo_size, scaled_logo_size):
+    """Resizes the logo with applied opacity to scaled_logo_size and returns it as RenderedTile. source is the logo
+    the tile comes from"""
+    with tracer.span("resize_logo"):
+        return RenderedTile(logo_image.resize(scaled_logo_size), full_logo_size, source)
+
+
+def logo_tile(settings, scale=1):
+    """Returns RenderedTile with the logo from settings with applied opacity, resized and rotated. full_size of the tile
+    is the size of the resized logo at full resolution. Tiles are cached in tile_cache, so the logo is resized and
+    rotated again only when the logo, its size, opacity or rotation change"""
+    # Set logo img
+    logo_image = settings["logo"]
+
+    # Get opacity, size and rotation values
+    logo_opacity = int(settings["opacity"])
+    logo_rotation = int(settings["rotation"])
+    full_logo_size, scaled_logo_size = logo_sizes(settings, scale)
+
+    def render():
+        # Apply the opacity, then resize and rotate the logo
+        resized_logo = resize_logo(apply_logo_opacity(logo_image, logo_opacity), logo_image, full_logo_size,
+                                   scaled_logo_size)
+        return rotate_tile(resized_logo, logo_rotation)
+
+    # The logo is identified by its id. The cached tile keeps the logo alive, so the id can't belong to other image
+    return tile_cache.get(("logo", id(logo_image), full_logo_size, scaled_logo_size, logo_opacity, logo_rotation),
+                          render)
+
+
+def logo_background(logo_opacity):
+    """Returns the color of the transparent overlay the logo is pasted onto. It is white scaled by the opacity, the way
+    the overlay used to be darkened with point(lambda p: p * logo_opacity // 255)"""
+    logo_opacity = int(logo_opacity)
+    return logo_opacity, logo_opacity, logo_opacity, 0
+
+
+def logo_layout(logo_size, rotation, spacing_x, spacing_y, tile_signal, full_size, scale=1):
+    """Returns the positions of the logo on the image of full_size scaled by scale. logo_size is the full_size of the
+    logo tile, see text_layout"""
+    # Get horizontal and vertical spacing coefficient between logos
+    logo_spacing_x = float(spacing_x / 10)
+    logo_spacing_y = float(spacing_y / 10)
+
+    # Size of the rotated logo at full resolution. Pattern is always calculated at full resolution and then scaled,
+    # so that the preview matches the saved image
+    rotated_logo_size = rotated_size(logo_size[0], logo_size[1], int(rotation))
+
+    # Get the values of horizontal and vertical spacing between logos
+    gap_x = tile_gap(logo_spacing_x, rotated_logo_size[0])
+    gap_y = tile_gap(logo_spacing_y, rotated_logo_size[1])
+
+    # Get the number of horizontal and vertical repetitions of logo
+    horizontal_rep = number_of_repetitions(full_size[0], gap_x, rotated_logo_size[0])
+    vertical_rep = number_of_repetitions(full_size[1], gap_y, rotated_logo_size[1])
+
+    # Determine the pattern in which the logo is displayed
+    positions = tile_positions(tile_signal, full_size, rotated_logo_size, gap_x, gap_y, horizontal_rep, vertical_rep)
+    return scale_positions(positions, scale)
+
+
+def logo_pattern(settings, full_size, scale=1):
+    """Returns tuple (pattern, background) for the logo watermark described by settings on the image of full_size
+    scaled by scale, see text_pattern. settings["logo"] is the RGBA logo image"""
+    # Get the resized and rotated logo and the size of the resized logo at full resolution
+    tile = logo_tile(settings, scale)
+    positions = logo_layout(tile.full_size, settings["rotation"], settings["spacing_x"], settings["spacing_y"],
+                            settings["tile"], full_size, scale)
+    return TiledOverlay(tile.image, positions), logo_background(settings["opacity"])
+
+
+def render_logo_watermark(canvas, settings, full_size=None, scale=1, in_place=False):
+    """Draws the logo watermark described by settings over canvas and returns the new image. settings["logo"] is the
+    RGBA logo image. canvas can be the original image or its copy scaled by scale, in which case full_size is the size
+    of the original image. If in_place is True the logo is drawn directly onto canvas and canvas is returned, otherwise
+    the new image is checked out from buffer_pool (see overlay_builder.composite_pattern)"""
+    if full_size is None:
+        full_size = canvas.size
+
+    # Composite the logos over the part of the canvas they cover
+    pattern, background = logo_pattern(settings, full_size, scale)
+    return composite_pattern(canvas, pattern, background, in_place=in_place)
+
+
+def render_layers(canvas, layers, full_size=None, scale=1, in_place=False):
+    """Draws the watermark layers over canvas in one pass and returns the new image. layers is the list of
+    (kind, settings) tuples, where kind is "text" or "logo" and settings are the settings of render_text_watermark or
+    render_logo_watermark, drawn in the order of the list, the last layer on top. canvas, full_size, scale and in_place
+    are the same as for render_text_watermark"""
+    if full_size is None:
+        full_size = canvas.size
+
+    # Patterns of all the layers are composited band by band together, see overlay_builder.composite_patterns
+    patterns = [LAYER_PATTERNS[kind](settings, full_size, scale) for kind, settings in layers]
+    return composite_patterns(canvas, patterns, in_place=in_place)
+
+
+def watermark_image(image, text_settings=None, logo_settings=None, in_place=False):
+    """Applies the text and/or the logo watermark to the RGBA image at full resolution and returns the watermarked
+    image. The logo is drawn over the text. If in_place is True both watermarks are drawn directly onto image, otherwise
+    image is left unchanged"""
+    layers = []
+    if text_settings is not None:
+        layers.append(("text", text_settings))
+    if logo_settings is not None:
+        layers.append(("logo", logo_settings))
+    return render_layers(image, layers, in_place=in_place)
+
+
+def tile_full_size(tile):
+    """Returns the full_size of the RenderedTile. The layout only depends on it, so e.g. a new color of the text doesn't
+    change the layout"""
+    return tile.full_size
+
+
+def tiled_overlay(tile, positions):
+    """Returns TiledOverlay of the RenderedTile on the positions"""
+    return TiledOverlay(tile.image, positions)
+
+
+def layer_pattern(overlay, background):
+    """Returns tuple (pattern, background) of the layer, the same as text_pattern and logo_pattern"""
+    return overlay, background
+
+
+def text_layer_graph():
+    """Returns RenderGraph of the text layer with the stages glyph_mask (font load, measure and draw), rotated_tile,
+    text_size, layout, tiled_overlay and pattern. The graph is run with text_layer_values and returns the same
+    (pattern, background) tuple as text_pattern, but changing e.g. the spacing only recomputes the layout, the tiled
+    overlay and the pattern"""
+    graph = RenderGraph()
+    graph.add_stage("glyph_mask", draw_text_mask, ["font", "text", "font_size", "mask_font_size", "fill"])
+    graph.add_stage("rotated_tile", rotate_tile, ["glyph_mask", "rotation"])
+    graph.add_stage("text_size", tile_full_size, ["glyph_mask"])
+    graph.add_stage("layout", text_layout, ["text_size", "rotation", "spacing_x", "spacing_y", "tile", "full_size",
+                                            "scale"])
+    graph.add_stage("tiled_overlay", tiled_overlay, ["rotated_tile", "layout"])
+    graph.add_stage("pattern", layer_pattern, ["tiled_overlay", "background"])
+    return graph
+
+
+def text_layer_values(settings, full_size, scale=1):
+    """Returns the input values of text_layer_graph for the text settings (see TextWidget.text_settings) on the image
+    of full_size rendered scaled by scale"""
+    size, mask_size = text_font_sizes(settings, scale)
+    return {
+        "font": settings["font"],
+        "text": settings["text"],
+        "font_size": size,
+        "mask_font_size": mask_size,
+        "fill": text_fill(settings),
+        "rotation": int(settings["rotation"]),
+        "spacing_x": settings["spacing_x"],
+        "spacing_y": settings["spacing_y"],
+        "tile": settings["tile"],
+        "full_size": full_size,
+        "scale": scale,
+        "background": TEXT_BACKGROUND,
+    }
+
+
+def logo_layer_graph():
+    """Returns RenderGraph of the logo layer with the stages opacity, resize, rotated_tile, layout, tiled_overlay and
+    pattern, see text_layer_graph. The opacity is applied before the resize, because PIL resizes RGBA images with
+    premultiplied alpha and the result would differ from render_logo_watermark"""
+    graph = RenderGraph()
+    graph.add_stage("opacity", apply_logo_opacity, ["logo", "opacity"])
+    graph.add_stage("resize", resize_logo, ["opacity", "logo", "full_logo_size", "scaled_logo_size"])
+    graph.add_stage("rotated_tile", rotate_tile, ["resize", "rotation"])
+    graph.add_stage("layout", logo_layout, ["full_logo_size", "rotation", "spacing_x", "spacing_y", "tile",
+                                            "full_size", "scale"])
+    graph.add_stage("tiled_overlay", tiled_overlay, ["rotated_tile", "layout"])
+    graph.add_stage("pattern", layer_pattern, ["tiled_overlay", "background"])
+    return graph
+
+
+def logo_layer_values(settings, full_size, scale=1):
+    """Returns the input values of logo_layer_graph for the logo settings (see LogoWidget.logo_settings)"""
+    full_logo_size, scaled_logo_size = logo_sizes(settings, scale)
+    return {
+        "logo": settings["logo"],
+        "opacity": int(settings["opacity"]),
+        "full_logo_size": full_logo_size,
+        "scaled_logo_size": scaled_logo_size,
+        "rotation": int(settings["rotation"]),
+        "spacing_x": settings["spacing_x"],
+        "spacing_y": settings["spacing_y"],
+        "tile": settings["tile"],
+        "full_size": full_size,
+        "scale": scale,
+        "background": logo_background(settings["opacity"]),
+    }
+
+
+# Functions of every kind of layer: pattern for the stateless render, and the render graph with its input values for
+# the incremental render of layer_stack.LayerStack
+LAYER_PATTERNS = {"text": text_pattern, "logo": logo_pattern}
+LAYER_GRAPHS = {"text": (text_layer_graph, text_layer_values), "logo": (logo_layer_graph, logo_layer_values)}